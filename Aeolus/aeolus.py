@@ -13,115 +13,84 @@ import ipywidgets as widgets
 import xarray as xr
 import numpy as np
 import os
+from Aeolus.aeolus_qc import get_qc_masks
+from Aeolus.aeolus_transport import VirESTransport, request_aeolus_dataset, AEOLUS_OBSERVATION_FIELDS, \
+    AEOLUS_SCA_FIELDS
 
 class GetAeolusFromVirES():
+    """
+    L2A SCA data of a time range. The products are only requested when first needed: the L2A product with
+    ds_sca and the L1B product (SNR) with ds_L1B, see Aeolus.aeolus_transport for the transport and the cache.
+    """
 
-    def __init__(self, measurement_start, measurement_stop, DATA_PRODUCT, save_dir='./', save_data = './'):
+    def __init__(self, measurement_start, measurement_stop, DATA_PRODUCT, save_dir='./', save_data=None,
+                 transport=None, cache_dir=None, offline=False):
         super().__init__()
 
         self.measurement_start = measurement_start
         self.measurement_stop = measurement_stop
         self.DATA_PRODUCT = DATA_PRODUCT
         self.save_dir = save_dir
+        self.cache_dir = cache_dir
+        self.transport = None if offline else (VirESTransport() if transport is None else transport)
 
         (self.parameter_observation, self.parameter_sca) = self.set_fields()
-        ds_sca_preliminary = self.request_VRE_server()
-        self.ds_L1B = self.request_L1B()
-        self.ds_sca = self.remove_duplicate(ds_sca_preliminary)
+        self._ds_sca = None
+        self._ds_L1B = None
 
         # self.plot_overview_map()
-        self.add_datetime_to_dataset()
         # self.add_QC_flag()
-        self.add_mid_bin_geolocation()
-        self.add_mid_bin_altitude()
         # self.add_lidar_ratio()
         # self.add_l1b_snr_to_sca()
-        self.ds_sca.to_file(save_data, overwrite=True)
+        if save_data is not None:
+            self.ds_sca.to_netcdf(save_data)
+
+    @property
+    def ds_sca(self):
+        # the L2A product is requested the first time the SCA data are needed
+        if self._ds_sca is None:
+            self._ds_sca = self.remove_duplicate(self.request_VRE_server())
+            self.add_datetime_to_dataset()
+            self.add_mid_bin_geolocation()
+            self.add_mid_bin_altitude()
+
+        return self._ds_sca
+
+    @property
+    def ds_L1B(self):
+        # the L1B product is only requested for the SNR, see add_l1b_snr_to_sca
+        if self._ds_L1B is None:
+            from netCDF4 import num2date
+
+            self._ds_L1B = self.request_L1B()
+            self._ds_L1B["datetime"] = (
+                ("observation"),
+                num2date(self._ds_L1B["time"], units="s since 2000-01-01", only_use_cftime_datetimes=False),
+            )
+
+        return self._ds_L1B
 
     def set_fields(self):
-        parameter_observation = [
-            "L1B_start_time_obs",
-            "L1B_centroid_time_obs",
-            "longitude_of_DEM_intersection_obs",
-            "latitude_of_DEM_intersection_obs",
-            "altitude_of_DEM_intersection_obs",
-            "rayleigh_altitude_obs",
-            "sca_mask",
-        ]
-
-        parameter_sca = [
-            "SCA_time_obs",
-            "SCA_middle_bin_altitude_obs",
-            "SCA_QC_flag",
-            "SCA_processing_qc_flag",
-            "SCA_middle_bin_processing_qc_flag",
-            "SCA_extinction",
-            "SCA_extinction_variance",
-            "SCA_backscatter",
-            "SCA_backscatter_variance",
-            "SCA_LOD",
-            "SCA_LOD_variance",
-            "SCA_middle_bin_extinction",
-            "SCA_middle_bin_extinction_variance",
-            "SCA_middle_bin_backscatter",
-            "SCA_middle_bin_backscatter_variance",
-            "SCA_middle_bin_LOD",
-            "SCA_middle_bin_LOD_variance",
-            "SCA_middle_bin_BER",
-            "SCA_middle_bin_BER_variance",
-            "SCA_SR",
-        ]
-
-        return parameter_observation, parameter_sca
+        # fields of the L2A product, see Aeolus.aeolus_transport
+        return list(AEOLUS_OBSERVATION_FIELDS), list(AEOLUS_SCA_FIELDS)
 
     def request_VRE_server(self):
 
-        # Data request for SCA aerosol product
-        request = AeolusRequest()
-
-        request.set_collection(self.DATA_PRODUCT)
-
-        # set observation fields
-        request.set_fields(observation_fields = self.parameter_observation)
-
-        # set SCA fields
-        request.set_fields(sca_fields = self.parameter_sca)
-        request.set_fields(sca_fields=self.parameter_sca)
-        print(self.parameter_sca)
-        # set start and end time and request data
-        data_sca = request.get_between(
-            start_time = self.measurement_start,
-            end_time = self.measurement_stop,
-            filetype="nc",
-            asynchronous=True)
-
-        data_sca.to_file("./retrieved_data.nc", overwrite=True)
-
-        # Save data as xarray data set
-        ds_sca_preliminary = data_sca.as_xarray()
-
-        return ds_sca_preliminary
+        # Data request for SCA aerosol product, observation and SCA fields
+        return request_aeolus_dataset(self.DATA_PRODUCT,
+                                      {'observation_fields': self.parameter_observation,
+                                       'sca_fields': self.parameter_sca},
+                                      self.measurement_start, self.measurement_stop,
+                                      transport=self.transport, cache_dir=self.cache_dir)
 
     def request_L1B(self):
-        # Data request for SCA aerosol product
-        request = AeolusRequest()
-
-        request.set_collection("ALD_U_N_1B")
-
-        # set observation fields
-        request.set_fields(observation_fields=["rayleigh_SNR", "mie_SNR", "rayleigh_altitude", "mie_altitude", "time"])
-
-        # set start and end time and request data
-        data_L1B = request.get_between(
-            start_time = self.measurement_start,
-            end_time = self.measurement_stop,
-            filetype="nc",
-            asynchronous=True)
-
-        # Save data as xarray data set
-        ds_L1B = data_L1B.as_xarray()
 
-        return ds_L1B
+        # Data request for the L1B SNR
+        return request_aeolus_dataset("ALD_U_N_1B",
+                                      {'observation_fields': ["rayleigh_SNR", "mie_SNR", "rayleigh_altitude",
+                                                              "mie_altitude", "time"]},
+                                      self.measurement_start, self.measurement_stop,
+                                      transport=self.transport, cache_dir=self.cache_dir)
 
     def remove_duplicate(self, ds_sca_preliminary):
 
@@ -163,24 +132,13 @@ class GetAeolusFromVirES():
             ),
         )
 
-        self.ds_L1B["datetime"] = (
-            ("observation"),
-            num2date(self.ds_L1B["time"], units="s since 2000-01-01", only_use_cftime_datetimes=False),
-        )
-
     def add_QC_flag(self):
-        self.ds_sca["SCA_validity_flags"] = (
-            ("sca_dim", "array_24", "array_8"),
-            np.unpackbits(
-                self.ds_sca["SCA_processing_qc_flag"][:, :].values.view(np.uint8), bitorder="little"
-            ).reshape([-1, 24, 8]),
-        )
-        self.ds_sca["SCA_middle_bin_validity_flags"] = (
-            ("sca_dim", "array_23", "array_8"),
-            np.unpackbits(
-                self.ds_sca["SCA_middle_bin_processing_qc_flag"][:, :].values.view(np.uint8), bitorder="little"
-            ).reshape([-1, 23, 8]),
-        )
+
+        # named validity masks (e.g. SCA_backscatter_valid) decoded from the QC bytes, see Aeolus.aeolus_qc
+        for (prefix, dimensions) in (("SCA", ("sca_dim", "array_24")), ("SCA_middle_bin", ("sca_dim", "array_23"))):
+            qc_masks = get_qc_masks(self.ds_sca["%s_processing_qc_flag" % prefix][:, :].values.view(np.uint8))
+            for (name, valid_mask) in qc_masks.items():
+                self.ds_sca["%s_%s_valid" % (prefix, name)] = (dimensions, valid_mask)
 
     def add_mid_bin_geolocation(self):
 
@@ -336,12 +294,12 @@ class PlotData():
         else:
             self.product = parameter.split("_")[0]
 
-    def select_validity_flag(self):
-        """Select the corresponding validity flag for the product"""
+    def select_validity_flag(self, name):
+        """Select the validity mask (extinction, backscatter or ber, see add_QC_flag) for the product"""
         if self.product == "SCA_middle_bin":
-            validity_flag = self.ds["SCA_middle_bin_validity_flags"]
+            validity_flag = self.ds["SCA_middle_bin_%s_valid" % name]
         elif self.product == "SCA":
-            validity_flag = self.ds["SCA_validity_flags"]
+            validity_flag = self.ds["SCA_%s_valid" % name]
         return validity_flag.data
 
     def select_SNR_parameter(self):
@@ -357,16 +315,15 @@ class PlotData():
     def apply_QC_filter(self):
         """Applies the QC filter depending on validity flag and QC_flag for
         first matching bin"""
-        validity_flag = self.select_validity_flag()
         # filter extinction and LOD for extinction flag
         if any(i in self.parameter for i in ["extinction", "LOD"]):
-            self.parameter_data[validity_flag[:, :, 0] == 0] = np.nan
+            self.parameter_data[~self.select_validity_flag("extinction")] = np.nan
         # filter backscatter and SR for backscatter flag
         elif any(i in self.parameter for i in ["backscatter", "SR"]):
-            self.parameter_data[validity_flag[:, :, 1] == 0] = np.nan
+            self.parameter_data[~self.select_validity_flag("backscatter")] = np.nan
         # filter BER and lidar ratio for backscatter and extinction flag
         elif any(i in self.parameter for i in ["BER", "lidar_ratio"]):
-            self.parameter_data[np.any(validity_flag[:, :, 0:2] == 0, axis=2)] = np.nan
+            self.parameter_data[~self.select_validity_flag("ber")] = np.nan
 
         # filter for first matching bin is clear or not
         self.parameter_data[self.ds["SCA_QC_flag"] == 0] = np.nan
@@ -639,40 +596,8 @@ class SaveVirESNetcdf():
         self.save_netCDF()
 
     def set_fields(self):
-        parameter_observation = [
-            "L1B_start_time_obs",
-            "L1B_centroid_time_obs",
-            "longitude_of_DEM_intersection_obs",
-            "latitude_of_DEM_intersection_obs",
-            "altitude_of_DEM_intersection_obs",
-            "rayleigh_altitude_obs",
-            "sca_mask",
-        ]
-
-        parameter_sca = [
-            "SCA_time_obs",
-            "SCA_middle_bin_altitude_obs",
-            "SCA_QC_flag",
-            "SCA_processing_qc_flag",
-            "SCA_middle_bin_processing_qc_flag",
-            "SCA_extinction",
-            "SCA_extinction_variance",
-            "SCA_backscatter",
-            "SCA_backscatter_variance",
-            "SCA_LOD",
-            "SCA_LOD_variance",
-            "SCA_middle_bin_extinction",
-            "SCA_middle_bin_extinction_variance",
-            "SCA_middle_bin_backscatter",
-            "SCA_middle_bin_backscatter_variance",
-            "SCA_middle_bin_LOD",
-            "SCA_middle_bin_LOD_variance",
-            "SCA_middle_bin_BER",
-            "SCA_middle_bin_BER_variance",
-            "SCA_SR",
-        ]
-
-        return parameter_observation, parameter_sca
+        # fields of the L2A product, see Aeolus.aeolus_transport
+        return list(AEOLUS_OBSERVATION_FIELDS), list(AEOLUS_SCA_FIELDS)
 
     def save_netCDF(self):
 
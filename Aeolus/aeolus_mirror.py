@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    aeolus_mirror.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 20:10
+
+"""
+Incremental mirror of the daily Aeolus L2A netcdf files, <save_dir>/<year>-<month>/<year>-<month>-<day>.nc.
+
+The existing daily files are checked first (see check_daily_file) and only the missing or corrupt (unreadable,
+or without the required variables) days are fetched, over a bounded thread pool with retries and exponential
+backoff. The files are written to a temporary file, checked and then renamed, an interrupted download never
+leaves a partial daily file behind. A readable day with a data gap at the edges of the day (an outage of the
+instrument or of the processing) is kept as it is, as 'partial', and not fetched again unless forced.
+
+The days are requested with request_aeolus_dataset, through the same transport object as GetAeolusFromVirES
+(VirESTransport by default, see Aeolus.aeolus_transport), so the mirror can be run against any other source,
+e.g. a local fake server. The daily files keep the netcdf groups of the files of the VirES server.
+"""
+
+from Aeolus.aeolus_transport import VirESTransport, request_aeolus_dataset, save_aeolus_dataset, \
+    AEOLUS_L2A_FIELD_GROUPS
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from netCDF4 import Dataset
+import numpy as np
+import threading
+import pathlib
+import time
+import os
+
+# variables (group, name) required in a daily file, see getColocationData/get_aeolus.py
+AEOLUS_REQUIRED_VARIABLES = (('observations', 'latitude_of_DEM_intersection_obs'),
+                             ('observations', 'longitude_of_DEM_intersection_obs'),
+                             ('sca', 'SCA_time_obs'),
+                             ('sca', 'SCA_middle_bin_altitude_obs'),
+                             ('sca', 'SCA_middle_bin_backscatter'),
+                             ('sca', 'SCA_middle_bin_extinction'),
+                             ('sca', 'SCA_middle_bin_processing_qc_flag'),
+                             ('sca', 'SCA_middle_bin_BER'),
+                             ('sca', 'SCA_middle_bin_LOD'))
+
+# smallest size of a complete daily file, unit -> bytes
+AEOLUS_MIN_FILE_SIZE = 1024 * 1024
+
+# largest gap between the start (end) of the day and the first (last) profile of a complete daily file, unit -> hours
+AEOLUS_MAX_EDGE_GAP = 3.
+
+# the HDF5 library under netCDF4 is not thread safe: the daily files are written and checked one at a time, only
+# the requests run concurrently
+NETCDF_LOCK = threading.Lock()
+
+
+def get_mirror_daily_file(save_dir, date):
+    """Daily file of the mirror, <save_dir>/<year>-<month>/<year>-<month>-<day>.nc"""
+    return save_dir + '/%s/%s.nc' % (date.strftime('%Y-%m'), date.strftime('%Y-%m-%d'))
+
+
+def check_daily_file(filename, date, min_size=AEOLUS_MIN_FILE_SIZE, max_edge_gap=AEOLUS_MAX_EDGE_GAP):
+    """
+    Check a daily Aeolus file: readable with the required variables, then size and time coverage of the day.
+    Only the unreadable files and the files without the required variables are corrupt, a small file or a time
+    coverage with gaps at the day edges is the data of a day with an outage.
+
+    Parameters:
+        filename: string, daily netcdf file.
+        date: datetime, day of the file.
+        min_size: int, smallest complete file size, unit -> bytes.
+        max_edge_gap: float, largest gap between the day edges and the first/last profile of a complete day,
+        unit -> hours.
+
+    Returns:
+        status: string, 'valid', 'partial' (readable, but small or with gaps), 'missing' or 'corrupt'.
+        message: string, reason of a failed check or of a partial day.
+    """
+    if not os.path.exists(filename):
+        return 'missing', 'no file'
+
+    try:
+        with Dataset(filename, 'r') as nc_data:
+            nc_data.set_auto_mask(False)
+
+            for (group, name) in AEOLUS_REQUIRED_VARIABLES:
+                if (group not in nc_data.groups) or (name not in nc_data[group].variables):
+                    return 'corrupt', 'no variable %s/%s' % (group, name)
+
+            sca_time = nc_data['sca']['SCA_time_obs'][:]
+
+    except (OSError, RuntimeError) as error:
+        return 'corrupt', 'unreadable file: %s' % error
+
+    if np.size(sca_time) == 0:
+        return 'partial', 'no profile'
+
+    # SCA time in seconds since 2000-01-01
+    day_start = (datetime(date.year, date.month, date.day) - datetime(2000, 1, 1)).total_seconds()
+    first_gap = (np.nanmin(sca_time) - day_start) / 3600.
+    last_gap = (day_start + 86400. - np.nanmax(sca_time)) / 3600.
+
+    if (first_gap < -max_edge_gap) or (last_gap < -max_edge_gap):
+        return 'partial', 'profiles outside the day'
+    if (first_gap > max_edge_gap) or (last_gap > max_edge_gap):
+        return 'partial', 'time coverage %.1f-%.1f h' % (first_gap, 24. - last_gap)
+    if os.path.getsize(filename) < min_size:
+        return 'partial', 'file size %d bytes' % os.path.getsize(filename)
+
+    return 'valid', ''
+
+
+def fetch_daily_file(transport, date, save_filename, logger, data_product="ALD_U_N_2A", retries=3, backoff=30.,
+                     **check_options):
+    """
+    Fetch one day of the L2A fields (AEOLUS_L2A_FIELD_GROUPS) of data_product through the transport, written to
+    a temporary file renamed once checked. A failed fetch (error, unreadable file or missing variables) is retried
+    after backoff, 2 x backoff, 4 x backoff... seconds, a partial day (see check_daily_file) is saved as it is.
+
+    Returns:
+        status: string, 'downloaded', 'partial' or 'failed'.
+    """
+    pathlib.Path(os.path.dirname(save_filename)).mkdir(parents=True, exist_ok=True)
+    # the temporary file keeps the .nc extension of the daily files
+    tmp_filename = os.path.splitext(save_filename)[0] + '.tmp.nc'
+
+    for attempt in range(retries + 1):
+
+        if attempt > 0:
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+        try:
+            ds = request_aeolus_dataset(data_product, AEOLUS_L2A_FIELD_GROUPS, date, date + timedelta(days=1),
+                                        transport=transport)
+            with NETCDF_LOCK:
+                save_aeolus_dataset(ds, AEOLUS_L2A_FIELD_GROUPS, tmp_filename)
+                (status, message) = check_daily_file(tmp_filename, date, **check_options)
+        except Exception as error:
+            (status, message) = ('failed', '%s: %s' % (type(error).__name__, error))
+
+        if status in ('valid', 'partial'):
+            os.replace(tmp_filename, save_filename)
+            logger.info('Success: saved netCDF for %s' % date.strftime('%Y-%m-%d'))
+            if status == 'partial':
+                logger.warning('Partial day %s (%s)' % (date.strftime('%Y-%m-%d'), message))
+                return 'partial'
+            return 'downloaded'
+
+        logger.warning('Fetch of %s failed (%s), attempt %d/%d'
+                       % (date.strftime('%Y-%m-%d'), message, attempt + 1, retries + 1))
+
+    if os.path.exists(tmp_filename):
+        os.remove(tmp_filename)
+    logger.error('Failed: saved netCDF for %s' % date.strftime('%Y-%m-%d'))
+
+    return 'failed'
+
+
+def mirror_aeolus_archive(save_dir, start_date, end_date, logger, transport=None, data_product="ALD_U_N_2A",
+                          workers=4, retries=3, backoff=30., force=False, **check_options):
+    """
+    Mirror the daily Aeolus files between start_date and end_date (included).
+
+    Parameters:
+        save_dir: string, root directory of the mirror.
+        start_date, end_date: datetime, first and last day.
+        logger: logging object.
+        transport: object with the request method of VirESTransport, VirESTransport() by default.
+        data_product: string, Aeolus L2A product.
+        workers: int, number of days fetched concurrently.
+        retries: int, number of retries of a failed day.
+        backoff: float, delay before the first retry, doubled at each retry, unit -> seconds.
+        force: bool, fetch again the valid and partial existing days.
+        check_options: min_size and max_edge_gap of check_daily_file.
+
+    Returns:
+        coverage: dict, day (datetime) -> 'existing', 'downloaded', 'partial' (existing or downloaded day with
+        gaps) or 'failed'.
+    """
+    if transport is None:
+        transport = VirESTransport()
+
+    date_list = [datetime(start_date.year, start_date.month, start_date.day) + timedelta(days=i)
+                 for i in range((end_date - start_date).days + 1)]
+
+    coverage = {}
+    fetch_list = []
+    for date in date_list:
+        save_filename = get_mirror_daily_file(save_dir, date)
+        (status, message) = check_daily_file(save_filename, date, **check_options)
+
+        if (status in ('valid', 'partial')) and (not force):
+            coverage[date] = 'existing' if status == 'valid' else 'partial'
+        else:
+            if status == 'corrupt':
+                logger.warning('Existing file %s is corrupt (%s), fetched again' % (save_filename, message))
+            fetch_list.append((date, save_filename))
+
+    logger.info('%d days in the mirror, %d days to fetch' % (len(coverage), len(fetch_list)))
+
+    # the fetches are network bound, a few threads are enough
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_daily_file, transport, date, save_filename, logger,
+                                   data_product=data_product, retries=retries, backoff=backoff,
+                                   **check_options): date
+                   for (date, save_filename) in fetch_list}
+        for (future, date) in futures.items():
+            coverage[date] = future.result()
+
+    log_coverage_report(coverage, logger)
+
+    return dict(sorted(coverage.items()))
+
+
+def log_coverage_report(coverage, logger):
+    """Log the number of days of each status of every month, and the partial and failed days"""
+    for month in sorted(set(date.strftime('%Y-%m') for date in coverage)):
+        month_status = [status for (date, status) in coverage.items() if date.strftime('%Y-%m') == month]
+        logger.info('Coverage %s: %d existing, %d downloaded, %d partial, %d failed' %
+                    (month, month_status.count('existing'), month_status.count('downloaded'),
+                     month_status.count('partial'), month_status.count('failed')))
+
+    partial_days = sorted(date.strftime('%Y-%m-%d') for (date, status) in coverage.items() if status == 'partial')
+    if len(partial_days) > 0:
+        logger.warning('Partial days: %s' % ', '.join(partial_days))
+
+    failed_days = sorted(date.strftime('%Y-%m-%d') for (date, status) in coverage.items() if status == 'failed')
+    if len(failed_days) > 0:
+        logger.warning('Missing days: %s' % ', '.join(failed_days))
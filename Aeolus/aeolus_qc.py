@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    aeolus_qc.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 19:45
+
+"""
+Decoding of the Aeolus L2A SCA (middle bin) processing QC flags.
+
+The flags are one byte per range bin, the validity of the extinction and backscatter is one bit of the byte
+(bit 0 being the least significant bit):
+
+    bit 0: extinction valid
+    bit 1: backscatter valid
+
+The quantities derived from both, the backscatter-to-extinction ratio (BER) and the lidar ratio, are valid where
+both bits are set (mask 'ber', as GetAeolusFromVirES.apply_QC_filter). The validity masks are computed with a
+shift and a mask directly on the uint8 flags, without unpacking the 8 bits of every byte:
+
+    qc_masks = get_qc_masks(qc_aeolus)
+    beta_aeolus_valid = np.where(qc_masks['backscatter'], beta_aeolus, np.nan)
+"""
+
+import numpy as np
+
+# bit of the validity of each quantity in the QC byte
+QC_BITS = {'extinction': 0, 'backscatter': 1}
+
+# quantities valid where all the bits of QC_BITS of the names are set
+QC_COMBINED_MASKS = {'ber': ('extinction', 'backscatter')}
+
+# names of all the validity masks
+QC_MASK_NAMES = tuple(QC_BITS) + tuple(QC_COMBINED_MASKS)
+
+# variables of the colocation data (see read_colocation_nc) invalidated by each mask
+QC_FILTERED_KEYS = {'extinction': ('alpha_aeolus',), 'backscatter': ('beta_aeolus',), 'ber': ('ber_aeolus',)}
+
+
+def get_qc_uint8(qc_array):
+    """
+    QC flags as a uint8 array. The masked values (numpy masked arrays, or the '--' strings of the masked
+    values converted to lists/object arrays) are set to 0, i.e. all the quantities invalid.
+    """
+    if np.ma.isMaskedArray(qc_array):
+        return np.ma.filled(qc_array, 0).astype(np.uint8)
+
+    qc_array = np.asarray(qc_array)
+
+    if qc_array.dtype.kind == 'O':
+        qc_array = np.where(qc_array == '--', 0, qc_array)
+    elif qc_array.dtype.kind == 'U':
+        qc_array = np.where(qc_array == '--', '0', qc_array)
+
+    return qc_array.astype(np.uint8)
+
+
+def get_qc_bit(qc_array, bit):
+    """Boolean array, True where the bit of the QC flag is set"""
+    return (get_qc_uint8(qc_array) >> np.uint8(bit)) & np.uint8(1) != 0
+
+
+def get_qc_masks(qc_array, names=QC_MASK_NAMES):
+    """
+    Validity masks of the QC flags.
+
+    Parameters:
+        qc_array: numpy array (possibly masked), QC flags of any shape.
+        names: names of the masks, see QC_BITS and QC_COMBINED_MASKS.
+
+    Returns:
+        qc_masks: dict, name -> boolean numpy array with the shape of qc_array, True where valid.
+    """
+    qc_uint8 = get_qc_uint8(qc_array)
+    qc_masks = {}
+
+    for name in names:
+        # all the bits of the mask in one byte, valid where they are all set
+        bit_mask = np.uint8(sum(1 << QC_BITS[bit_name] for bit_name in QC_COMBINED_MASKS.get(name, (name,))))
+        qc_masks[name] = (qc_uint8 & bit_mask) == bit_mask
+
+    return qc_masks
+
+
+def apply_qc_filter(colocation_data, qc_filter, qc_key='qc_aeolus'):
+    """
+    Set the invalid Aeolus values of the colocation data to NaN, in place.
+
+    Parameters:
+        colocation_data: dict of numpy arrays, see read_colocation_nc.
+        qc_filter: names of the QC masks to apply, see QC_FILTERED_KEYS, e.g. ('backscatter', 'ber').
+        qc_key: key of the QC flags in colocation_data.
+
+    Returns:
+        colocation_data: dict of numpy arrays.
+    """
+    qc_masks = get_qc_masks(colocation_data[qc_key], names=qc_filter)
+
+    for (name, valid_mask) in qc_masks.items():
+        for key in QC_FILTERED_KEYS[name]:
+            colocation_data[key] = np.where(valid_mask, colocation_data[key], np.nan)
+
+    return colocation_data
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    aeolus_transport.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 23:10
+
+"""
+Requests of the Aeolus products, shared by GetAeolusFromVirES (Aeolus/aeolus.py) and the daily archive mirror
+(Aeolus/aeolus_mirror.py).
+
+The VirES service is only called through a transport object with a single method
+
+    ds = transport.request(collection, field_groups, measurement_start, measurement_stop)
+
+which returns the requested fields as an xarray dataset (VirESTransport by default), so the case studies and
+the mirror can be run against any other source, e.g. a local fake server, or offline from the request cache
+(see request_aeolus_dataset).
+"""
+
+from getColocationData.get_file_cache import save_file_atomic
+import xarray as xr
+import pathlib
+import hashlib
+import json
+import os
+
+# observation and SCA fields of the L2A product, see GetAeolusFromVirES and the daily files of the mirror
+AEOLUS_OBSERVATION_FIELDS = (
+    "L1B_start_time_obs",
+    "L1B_centroid_time_obs",
+    "longitude_of_DEM_intersection_obs",
+    "latitude_of_DEM_intersection_obs",
+    "altitude_of_DEM_intersection_obs",
+    "rayleigh_altitude_obs",
+    "sca_mask",
+)
+
+AEOLUS_SCA_FIELDS = (
+    "SCA_time_obs",
+    "SCA_middle_bin_altitude_obs",
+    "SCA_QC_flag",
+    "SCA_processing_qc_flag",
+    "SCA_middle_bin_processing_qc_flag",
+    "SCA_extinction",
+    "SCA_extinction_variance",
+    "SCA_backscatter",
+    "SCA_backscatter_variance",
+    "SCA_LOD",
+    "SCA_LOD_variance",
+    "SCA_middle_bin_extinction",
+    "SCA_middle_bin_extinction_variance",
+    "SCA_middle_bin_backscatter",
+    "SCA_middle_bin_backscatter_variance",
+    "SCA_middle_bin_LOD",
+    "SCA_middle_bin_LOD_variance",
+    "SCA_middle_bin_BER",
+    "SCA_middle_bin_BER_variance",
+    "SCA_SR",
+)
+
+AEOLUS_L2A_FIELD_GROUPS = {'observation_fields': list(AEOLUS_OBSERVATION_FIELDS),
+                           'sca_fields': list(AEOLUS_SCA_FIELDS)}
+
+# netcdf group of each field group in the files of the VirES server
+AEOLUS_NC_GROUPS = {'observation_fields': 'observations', 'sca_fields': 'sca'}
+
+
+class VirESTransport():
+    """Request the fields of an Aeolus product from the VirES server"""
+
+    def request(self, collection, field_groups, measurement_start, measurement_stop):
+        """
+        Parameters:
+            collection: string, Aeolus product, e.g. ALD_U_N_2A.
+            field_groups: dict, keyword arguments of AeolusRequest.set_fields, e.g. {'sca_fields': [...]}.
+            measurement_start, measurement_stop: datetime, time range of the request.
+
+        Returns:
+            xarray dataset of the requested fields.
+        """
+        # viresclient is only imported when the server is actually requested
+        from viresclient import AeolusRequest
+
+        request = AeolusRequest()
+        request.set_collection(collection)
+        request.set_fields(**field_groups)
+
+        data = request.get_between(
+            start_time=measurement_start,
+            end_time=measurement_stop,
+            filetype="nc",
+            asynchronous=True)
+
+        return data.as_xarray()
+
+
+def get_request_cache_file(cache_dir, collection, field_groups, measurement_start, measurement_stop):
+    """Cached dataset of a request, keyed by the product, the fields and the time range"""
+    request_key = json.dumps([collection, sorted((group, list(fields)) for (group, fields) in field_groups.items()),
+                              str(measurement_start), str(measurement_stop)])
+
+    return os.path.join(cache_dir, '%s_%s_%s_%s.nc' % (collection, measurement_start.strftime('%Y%m%dT%H%M%S'),
+                                                       measurement_stop.strftime('%Y%m%dT%H%M%S'),
+                                                       hashlib.sha1(request_key.encode()).hexdigest()[:12]))
+
+
+def request_aeolus_dataset(collection, field_groups, measurement_start, measurement_stop, transport=None,
+                           cache_dir=None):
+    """
+    Dataset of a request, read from the cache if the same request was already done.
+
+    Parameters:
+        collection, field_groups, measurement_start, measurement_stop: see VirESTransport.request.
+        transport: object with the request method of VirESTransport, None to only use the cache (offline).
+        cache_dir: string, directory of the cached requests, no cache if None.
+
+    Returns:
+        xarray dataset of the requested fields.
+    """
+    if cache_dir is None:
+        if transport is None:
+            raise ValueError('No transport and no cache directory for the %s request' % collection)
+        return transport.request(collection, field_groups, measurement_start, measurement_stop)
+
+    cache_file = get_request_cache_file(cache_dir, collection, field_groups, measurement_start, measurement_stop)
+
+    if not os.path.exists(cache_file):
+        if transport is None:
+            raise FileNotFoundError('No cached %s request %s, offline' % (collection, cache_file))
+
+        ds = transport.request(collection, field_groups, measurement_start, measurement_stop)
+
+        pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        save_file_atomic(cache_file, ds.to_netcdf, tmp_filename=os.path.splitext(cache_file)[0] + '.tmp.nc')
+
+    with xr.open_dataset(cache_file) as ds:
+        return ds.load()
+
+
+def save_aeolus_dataset(ds, field_groups, save_filename):
+    """
+    Save a requested dataset with the layout of the files of the VirES server, the fields of each field group
+    in their netcdf group (see AEOLUS_NC_GROUPS), e.g. the daily files of the mirror.
+    """
+    mode = 'w'
+
+    for (field_group, fields) in field_groups.items():
+        ds[list(fields)].to_netcdf(save_filename, mode=mode, group=AEOLUS_NC_GROUPS[field_group])
+        mode = 'a'
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    ash_csv_loader.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 21:55
+
+"""
+Bulk loader of the ash layer CSV files (thickness_extraction.py, save_data_filter.py) of a directory.
+
+The files are read over a thread pool, only the requested columns, with the numeric columns converted as
+pd.to_numeric(..., errors='coerce') (the comma-joined multi-layer values become NaN) and the time column
+parsed with its format, then concatenated once. The combined frame is cached in Parquet, in
+<data_dir>/cache/<columns key>_<key>.parquet, keyed by the names, modification times and sizes of the CSV files
+and by the columns: running a plot script again starts from the cache, until a CSV file is added or modified.
+A new cache replaces the former caches of the same columns, only one cache is kept per set of columns.
+
+    all_data = load_csv_files(variable_file_location, ['utc_time', 'thickness', 'latitude', 'ash_height'])
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+import pathlib
+import os
+import sys
+sys.path.append('../../')
+from getColocationData.get_file_cache import get_files_cache_key, save_parquet_atomic
+
+# format of utc_time in the thickness CSVs, '%Y-%m-%d %H:%M:%S' in the filtered CSVs (save_data_filter.py)
+THICKNESS_TIME_FORMAT = '%Y-%m-%dT%H-%M-%S'
+FILTERED_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def get_csv_files(data_dir, suffix='.csv'):
+    """CSV files of the directory (not its sub-directories), sorted by name"""
+    return [os.path.join(data_dir, file) for file in sorted(os.listdir(data_dir)) if file.endswith(suffix)]
+
+
+def get_csv_cache_prefix(columns, time_key, time_format):
+    """Prefix of the cached frames of a set of columns, shared by the caches of all the versions of the CSV files"""
+    return get_files_cache_key([], config=(list(columns), time_key, time_format))[:12]
+
+
+def get_csv_cache_key(csv_files, columns, time_key, time_format):
+    """Key of the cached frame, any new, removed or modified CSV file or other columns change the key"""
+    return get_files_cache_key(csv_files, config=(list(columns), time_key, time_format))
+
+
+def read_csv_columns(csv_file, columns, time_key='utc_time', time_format=THICKNESS_TIME_FORMAT):
+    """
+    Read the columns of one CSV file, all the columns but time_key as float64 (NaN if not a single number).
+
+    Returns:
+        data: pandas DataFrame with the columns.
+    """
+    data = pd.read_csv(csv_file, usecols=columns, dtype={column: str for column in columns})
+
+    for column in columns:
+        if column == time_key:
+            data[column] = pd.to_datetime(data[column], format=time_format)
+        else:
+            data[column] = pd.to_numeric(data[column], errors='coerce').astype(np.float64)
+
+    return data[columns]
+
+
+def load_csv_files(data_dir, columns, time_key='utc_time', time_format=THICKNESS_TIME_FORMAT, csv_files=None,
+                   workers=8, cache=True):
+    """
+    Read and concatenate the columns of all the CSV files of a directory, see read_csv_columns.
+
+    Parameters:
+        data_dir: string, directory of the CSV files.
+        columns: list of strings, columns to read.
+        time_key: string, time column parsed with time_format, ignored if not in columns.
+        time_format: string, format of the time column, THICKNESS_TIME_FORMAT or FILTERED_TIME_FORMAT.
+        csv_files: list of strings, CSV files to read, all the CSV files of data_dir by default.
+        workers: int, number of files read concurrently.
+        cache: bool, read (write) the combined frame from (to) <data_dir>/cache, removing the former caches of
+               the same columns.
+
+    Returns:
+        all_data: pandas DataFrame, the rows of all the files, in the order of the files.
+    """
+    columns = list(columns)
+    if csv_files is None:
+        csv_files = get_csv_files(data_dir)
+
+    cache_prefix = get_csv_cache_prefix(columns, time_key, time_format)
+    cache_file = os.path.join(data_dir, 'cache', '%s_%s.parquet' % (
+        cache_prefix, get_csv_cache_key(csv_files, columns, time_key, time_format)))
+    if cache and os.path.exists(cache_file):
+        print(f"Reading cached data {cache_file}")
+        return pd.read_parquet(cache_file, engine='pyarrow')
+
+    def read_file(csv_file):
+        print(f"Processing file {os.path.basename(csv_file)}")
+        return read_csv_columns(csv_file, columns, time_key=time_key, time_format=time_format)
+
+    # the parsing releases the GIL, a few threads read the files concurrently
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        data_list = list(executor.map(read_file, csv_files))
+
+    if len(data_list) > 0:
+        all_data = pd.concat(data_list, ignore_index=True)
+    else:
+        all_data = pd.DataFrame({column: pd.Series(dtype='datetime64[ns]' if column == time_key else np.float64)
+                                 for column in columns})
+
+    if cache:
+        pathlib.Path(os.path.dirname(cache_file)).mkdir(parents=True, exist_ok=True)
+        save_parquet_atomic(all_data, cache_file)
+
+        # the caches of the former CSV files with the same columns are never read again
+        for former_cache_file in pathlib.Path(os.path.dirname(cache_file)).glob(cache_prefix + '_*.parquet'):
+            if former_cache_file.name != os.path.basename(cache_file):
+                former_cache_file.unlink()
+
+    return all_data
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    ash_layer_table.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 21:05
+
+"""
+Long-format table of the CALIOP ash layers, one row per layer with typed columns (see LAYER_TABLE_COLUMNS),
+instead of the comma-joined layer lists of the thickness CSVs.
+
+The table is saved as Parquet partitioned by month, <save_dir>/year=<year>/month=<month>/<name>.parquet, each
+file sorted by time, and read back with predicate pushdown: only the months of the time range are opened and
+only the row groups overlapping the time and latitude ranges are read.
+
+    save_layer_table(layer_table, save_dir, year)
+    layer_table = read_layer_table(save_dir, start_time='2019-06-22', end_time='2019-10-25',
+                                   lat_bottom=40, lat_top=85)
+"""
+
+import pandas as pd
+import numpy as np
+import pathlib
+import os
+import sys
+sys.path.append('../../')
+from getColocationData.get_file_cache import save_parquet_atomic
+
+# columns of the layer table
+LAYER_TABLE_COLUMNS = (('time', 'datetime64[ns]'),
+                       ('granule_id', 'str'),
+                       ('profile_id', np.int32),
+                       ('latitude', np.float32),
+                       ('longitude', np.float32),
+                       ('tropopause_altitude', np.float32),
+                       ('thickness', np.float32),
+                       ('ash_height', np.float32),
+                       ('extinction', np.float32))
+
+# rows per Parquet row group, the unit of the time and latitude pushdown
+LAYER_TABLE_ROW_GROUP_SIZE = 100000
+
+
+def get_granule_id(filename):
+    """Granule id from the CALIOP file name, e.g. 2019-06-22T00-31-44ZN"""
+    return os.path.splitext(os.path.basename(filename))[0][35:]
+
+
+def _empty_layer_table():
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for (column, dtype) in LAYER_TABLE_COLUMNS})
+
+
+def get_granule_layer_table(layers, granule_id, utc_time, latitude, longitude, tropopause_altitude):
+    """
+    Layer table of one granule.
+
+    Parameters:
+        layers: dict of numpy arrays, see Caliop.SOVCC.ash_layers.get_ash_layers.
+        granule_id: string, see get_granule_id.
+        utc_time: string, time of the granule, '%Y-%m-%dT%H-%M-%S'.
+        latitude, longitude: numpy array with shape (profiles,), unit -> degree.
+        tropopause_altitude: numpy array with shape (profiles,), unit -> km.
+
+    Returns:
+        layer_table: pandas DataFrame, see LAYER_TABLE_COLUMNS.
+    """
+    profile_index = layers['profile_index']
+    n_layers = np.size(profile_index)
+
+    layer_table = pd.DataFrame({
+        'time': np.full(n_layers, pd.to_datetime(utc_time, format='%Y-%m-%dT%H-%M-%S').to_datetime64()),
+        'granule_id': np.full(n_layers, granule_id, dtype=object),
+        'profile_id': profile_index,
+        'latitude': np.asarray(latitude)[profile_index],
+        'longitude': np.asarray(longitude)[profile_index],
+        'tropopause_altitude': np.asarray(tropopause_altitude)[profile_index],
+        'thickness': layers['thickness'],
+        'ash_height': layers['ash_height'],
+        'extinction': layers['extinction'] if 'extinction' in layers else np.full(n_layers, np.nan)})
+
+    return layer_table.astype(dict(LAYER_TABLE_COLUMNS))
+
+
+def concat_layer_tables(layer_table_list):
+    """Concatenate the layer tables, an empty typed table if there is no table"""
+    return pd.concat([_empty_layer_table()] + list(layer_table_list), ignore_index=True) \
+        .astype(dict(LAYER_TABLE_COLUMNS))
+
+
+def save_layer_table(layer_table, save_dir, name):
+    """
+    Save the layer table, partitioned by month: <save_dir>/year=<year>/month=<month>/<name>.parquet.
+    An existing partition file with the same name is replaced.
+
+    Parameters:
+        layer_table: pandas DataFrame, see LAYER_TABLE_COLUMNS.
+        save_dir: string, root directory of the table.
+        name: string, name of the partition files, e.g. the year of the extraction.
+    """
+    layer_table = layer_table.sort_values(['time', 'granule_id', 'profile_id'], kind='stable')
+
+    for ((year, month), month_table) in layer_table.groupby([layer_table['time'].dt.year,
+                                                             layer_table['time'].dt.month]):
+        partition_dir = os.path.join(save_dir, 'year=%d' % year, 'month=%d' % month)
+        pathlib.Path(partition_dir).mkdir(parents=True, exist_ok=True)
+
+        save_parquet_atomic(month_table, os.path.join(partition_dir, '%s.parquet' % name),
+                            row_group_size=LAYER_TABLE_ROW_GROUP_SIZE)
+
+
+def get_layer_table_filters(start_time=None, end_time=None, lat_bottom=None, lat_top=None):
+    """
+    Parquet filters of the time and latitude ranges (included), with the year partitions of the time range.
+
+    Returns:
+        filters: list of (column, operator, value) tuples, None if there is no range.
+    """
+    filters = []
+
+    if start_time is not None:
+        start_time = pd.Timestamp(start_time)
+        filters += [('year', '>=', start_time.year), ('time', '>=', start_time)]
+    if end_time is not None:
+        end_time = pd.Timestamp(end_time)
+        filters += [('year', '<=', end_time.year), ('time', '<=', end_time)]
+    if lat_bottom is not None:
+        filters.append(('latitude', '>=', lat_bottom))
+    if lat_top is not None:
+        filters.append(('latitude', '<=', lat_top))
+
+    return filters if len(filters) > 0 else None
+
+
+def read_layer_table(save_dir, start_time=None, end_time=None, lat_bottom=None, lat_top=None, columns=None):
+    """
+    Read the layers within the time and latitude ranges (included) from the partitioned layer table.
+
+    Parameters:
+        save_dir: string, root directory of the table, see save_layer_table.
+        start_time, end_time: string or datetime, time range, e.g. '2019-06-22'.
+        lat_bottom, lat_top: float, latitude range, unit -> degree.
+        columns: list of strings, columns to read, all the columns by default.
+
+    Returns:
+        layer_table: pandas DataFrame, see LAYER_TABLE_COLUMNS, sorted by time.
+    """
+    if columns is None:
+        columns = [column for (column, dtype) in LAYER_TABLE_COLUMNS]
+
+    if not any(pathlib.Path(save_dir).glob('year=*/month=*/*.parquet')):
+        return _empty_layer_table()[columns]
+
+    layer_table = pd.read_parquet(save_dir, engine='pyarrow', columns=columns,
+                                  filters=get_layer_table_filters(start_time, end_time, lat_bottom, lat_top))
+
+    layer_table = layer_table.astype({column: dtype for (column, dtype) in LAYER_TABLE_COLUMNS if column in columns})
+    if 'time' in columns:
+        layer_table = layer_table.sort_values('time', kind='stable', ignore_index=True)
+
+    return layer_table
+
+
+def convert_thickness_csv(csv_file):
+    """
+    Layer table from a former thickness CSV (see thickness_extraction.py), one row per layer of the
+    comma-joined 'thickness' (or 'ash_thickness'), 'ash_height' and 'extinction' lists. The profile indices
+    are not in the CSVs, profile_id is -1.
+
+    Returns:
+        layer_table: pandas DataFrame, see LAYER_TABLE_COLUMNS.
+    """
+    data = pd.read_csv(csv_file, dtype={'thickness': str, 'ash_thickness': str, 'ash_height': str, 'extinction': str})
+    # ash_thickness in the CSVs of ash_thickness_extraction_v1.py
+    data = data.rename(columns={'ash_thickness': 'thickness'}).dropna(subset=['thickness'])
+
+    layer_columns = [column for column in ('thickness', 'ash_height', 'extinction') if column in data.columns]
+    for column in layer_columns:
+        data[column] = data[column].str.split(',')
+    data = data.explode(layer_columns, ignore_index=True)
+
+    layer_table = pd.DataFrame({
+        'time': pd.to_datetime(data['utc_time'], format='%Y-%m-%dT%H-%M-%S'),
+        'granule_id': data['utc_time'],
+        'profile_id': -1,
+        'latitude': data['latitude'],
+        'longitude': data['longitude'],
+        'tropopause_altitude': data['tropopause_altitude'],
+        'thickness': pd.to_numeric(data['thickness']),
+        'ash_height': pd.to_numeric(data['ash_height']),
+        'extinction': pd.to_numeric(data['extinction']) if 'extinction' in data.columns else np.nan})
+
+    return layer_table.astype(dict(LAYER_TABLE_COLUMNS))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    ash_layers.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 20:40
+
+"""
+Ash layers of all the profiles of a CALIOP granule at once.
+
+The layers are the runs of ash bins of the mask (levels, profiles), found with a diff of the zero-padded mask,
+and their thickness, mid-height and extinction-weighted mean are computed with np.add.reduceat over the runs,
+without any loop over the profiles:
+
+    layers = get_ash_layers(ash_mask, altitude, extinction)
+    layers['profile_index'], layers['thickness'], layers['ash_height'], layers['extinction']
+
+The altitude is descending (first level at the top of the profile), as orbit_l2_altitude.
+"""
+
+import numpy as np
+
+# a layer is a run of at least MIN_LAYER_BINS ash bins
+MIN_LAYER_BINS = 2
+
+
+def get_ash_layer_runs(ash_mask, min_bins=MIN_LAYER_BINS):
+    """
+    Runs of ash bins of every profile.
+
+    Parameters:
+        ash_mask: numpy array with shape (levels, profiles), 1 (or True) for the ash bins.
+        min_bins: int, shortest run kept as a layer.
+
+    Returns:
+        profile_index: numpy array, profile of each run.
+        top_index: numpy array, first (top) level of each run.
+        bottom_index: numpy array, last (bottom) level of each run.
+    """
+    ash_mask = np.asarray(ash_mask) == 1
+    if ash_mask.ndim == 1:
+        ash_mask = ash_mask[:, np.newaxis]
+
+    # one row per profile, padded with a clear bin on both sides: +1 at the start of a run, -1 after its end
+    padded_mask = np.pad(ash_mask.T.astype(np.int8), ((0, 0), (1, 1)))
+    mask_diff = np.diff(padded_mask, axis=1)
+
+    # row-major order, the starts and ends of every profile come in the same order
+    (profile_index, top_index) = np.nonzero(mask_diff == 1)
+    bottom_index = np.nonzero(mask_diff == -1)[1] - 1
+
+    layer_mask = (bottom_index - top_index + 1) >= min_bins
+
+    return profile_index[layer_mask], top_index[layer_mask], bottom_index[layer_mask]
+
+
+def get_ash_layers(ash_mask, altitude, extinction=None, min_bins=MIN_LAYER_BINS):
+    """
+    Flat table of the ash layers of all the profiles of a granule.
+
+    The top (bottom) of a layer is half-way between its first (last) bin and the bin above (below), or the bin
+    itself at the edge of the profile. The weighted extinction is the sum of the extinction of the layer bins
+    times their height, divided by the thickness.
+
+    Parameters:
+        ash_mask: numpy array with shape (levels, profiles), 1 (or True) for the ash bins.
+        altitude: numpy array with shape (levels,), descending altitude of the bins, unit -> km.
+        extinction: numpy array with shape (levels, profiles), extinction coefficient, unit -> km-1.
+        min_bins: int, shortest run of ash bins kept as a layer, at least 2.
+
+    Returns:
+        layers: dict of numpy arrays, one record per layer, sorted by profile and top level:
+            profile_index, top_index, bottom_index, thickness (km), ash_height (km), and extinction (km-1)
+            if extinction is given.
+    """
+    altitude = np.asarray(altitude, dtype=np.float64)
+    n_levels = np.size(altitude)
+
+    (profile_index, top_index, bottom_index) = get_ash_layer_runs(ash_mask, min_bins=min_bins)
+
+    # bin heights: altitude[k] - altitude[k + 1], 0 for the last level
+    bin_height = np.zeros(n_levels)
+    bin_height[:-1] = -np.diff(altitude)
+
+    # half-way edges between the levels, the edge levels of the profile are their own edges
+    top_edge = np.copy(altitude)
+    top_edge[1:] += 0.5 * bin_height[:-1]
+    bottom_edge = np.copy(altitude)
+    bottom_edge[:-1] -= 0.5 * bin_height[:-1]
+
+    max_altitude = top_edge[top_index]
+    min_altitude = bottom_edge[bottom_index]
+    thickness = max_altitude - min_altitude
+
+    layers = {'profile_index': profile_index,
+              'top_index': top_index,
+              'bottom_index': bottom_index,
+              'thickness': thickness,
+              'ash_height': (max_altitude + min_altitude) / 2.}
+
+    if extinction is not None:
+        extinction = np.asarray(extinction, dtype=np.float64)
+        if extinction.ndim == 1:
+            extinction = extinction[:, np.newaxis]
+
+        # flat profile-major products, a trailing 0 keeps the reduceat indices within the array
+        weighted_bins = np.append((extinction * bin_height[:, np.newaxis]).T.ravel(), 0.)
+        flat_top = profile_index * n_levels + top_index
+        flat_bottom = profile_index * n_levels + bottom_index
+
+        # sum over the layer bins above the bottom one, the bottom bin takes the height of the bin above it
+        layer_sum = np.add.reduceat(weighted_bins, np.ravel(np.column_stack((flat_top, flat_bottom))))[::2] \
+            if np.size(flat_top) > 0 else np.zeros(0)
+        layer_sum = layer_sum + extinction[bottom_index, profile_index] * bin_height[bottom_index - 1]
+
+        layers['extinction'] = layer_sum / thickness
+
+    return layers
+
+
+def split_layers_by_profile(layers, key, profile_list):
+    """
+    Values of the layers of each profile of profile_list, e.g. the thicknesses of each profile.
+
+    Parameters:
+        layers: dict of numpy arrays, see get_ash_layers.
+        key: string, layer variable.
+        profile_list: numpy array, sorted profile indices.
+
+    Returns:
+        values: list of numpy arrays, one per profile of profile_list (empty if the profile has no layer).
+    """
+    layer_start = np.searchsorted(layers['profile_index'], profile_list, side='left')
+    layer_end = np.searchsorted(layers['profile_index'], profile_list, side='right')
+
+    return [layers[key][start:end] for (start, end) in zip(layer_start, layer_end)]
@@ -9,6 +9,8 @@ import sys
 sys.path.append('../../')
 
 from Caliop.caliop import Caliop_hdf_reader
+from Caliop.SOVCC.ash_layers import get_ash_layers, split_layers_by_profile
+from Caliop.SOVCC.ash_layer_table import get_granule_id, get_granule_layer_table, concat_layer_tables, save_layer_table
 import pandas as pd
 import numpy as np
 import sys
@@ -27,64 +29,10 @@ try:
 except:
     os.mkdir(save_location)
 
-def calculate_ash_mask_thickness(ash_mask, altitude, extinction):
-    """
-    Calculates thickness of ash mask based on altitude.
-
-    Args:
-        ash_mask: List of int
-        altitude: List of float
-
-    Returns:
-        thicknesses: List of float
-    """
-    thicknesses = []  # Initialize thicknesses list
-    weighted_extinctions = []  # Initialize weighted extinction list
-    mean_heights = []
-    # Convert ash_mask and altitude to numpy arrays
-    ash_mask = np.array(ash_mask)
-    altitude = np.array(altitude)
-    extinction = np.array(extinction)
-
-    # Find indices of 1s
-    one_indices = np.where(ash_mask == 1)[0]
-
-    if len(one_indices) > 0:
-        # Find all sequences of 1s
-        sequences = np.split(one_indices, np.where(np.diff(one_indices) != 1)[0] + 1)
-
-        for seq in sequences:
-            # If the sequence has more than one element
-            if len(seq) > 1:
-                # Calculate thickness based on corresponding altitude
-                min_index = seq[0]
-                max_index = seq[-1]
-
-                if min_index > 0:
-                    max_altitude = altitude[min_index] + 0.5 * (altitude[min_index - 1] - altitude[min_index])
-                else:
-                    max_altitude = altitude[min_index]
-
-                if max_index < len(altitude) - 1:
-                    min_altitude = altitude[max_index] - 0.5 * (altitude[max_index] - altitude[max_index + 1])
-                else:
-                    min_altitude = altitude[max_index]
-
-                thickness = max_altitude - min_altitude
-                thicknesses.append(thickness)
-                extinction_mask = extinction[seq]
-                altitude_mask = altitude[seq]
-                altitude_diff = -np.diff(altitude_mask)
-                altitude_diff = np.append(altitude_diff, altitude_diff[-1])
-
-                weighted_extinctions.append(np.sum(altitude_diff * extinction_mask) / thickness)
-                mean_heights.append(np.mean([max_altitude, min_altitude]))
-
-    return thicknesses, mean_heights, weighted_extinctions
-#
-
 # loop through all the sub year folder in caliop_location
 filename_all = []
+# one layer table per granule
+layer_table_list = []
 # location parameter
 utc_time_all = []
 latitude_all = []
@@ -130,28 +78,27 @@ for caliop_sub_folder in os.listdir(caliop_extracted_location + '/' + year):
             ash_mask = np.zeros((aerosol_type.shape))
             ash_mask[(feature_type == 4) & (aerosol_type == 2)] = 1
 
-            for i in range(ash_mask.shape[1]):
-                if np.sum(ash_mask[:, i]) > 1:
-
-                    thickness_i, ash_height_i, extinction_i = calculate_ash_mask_thickness(ash_mask[:, i], altitude, extinction[:, i])
-                    utc_time_all.append(utc_time)
-                    latitude_i = latitude[i]
-                    longitude_i = longitude[i]
-                    altitude_i = np.copy(altitude)
-                    tropopause_altitude_i = tropopause_altitude[i]
-
-                    filename_all.append(file)
-                    latitude_all.append(latitude_i)
-                    longitude_all.append(longitude_i)
-                    altitude_all.append(altitude_i)
-                    thickness_all.append(thickness_i)
-                    ash_height_all.append(ash_height_i)
-                    troppause_altitude_all.append(tropopause_altitude_i)
-                    # extinction_all.append(extinction[:, i])
-                    # backscatter_all.append(backscatter[:, i])
-                    # depolarisation_all.append(depolarisation[:, i])
-                    # aerosol_type_all.append(aerosol_type[:, i])
-                    # feature_type_all.append(feature_type[:, i])
+            # all the ash layers of the granule at once, one row per profile with more than one ash bin
+            layers = get_ash_layers(ash_mask, altitude, extinction)
+            profile_list = np.nonzero(np.sum(ash_mask, axis=0) > 1)[0]
+
+            layer_table_list.append(get_granule_layer_table(layers, get_granule_id(file), utc_time, latitude, longitude,
+                                                            tropopause_altitude))
+
+            utc_time_all.extend([utc_time] * len(profile_list))
+            filename_all.extend([file] * len(profile_list))
+            latitude_all.extend(latitude[profile_list])
+            longitude_all.extend(longitude[profile_list])
+            altitude_all.extend([np.copy(altitude) for i in profile_list])
+            thickness_all.extend(split_layers_by_profile(layers, 'thickness', profile_list))
+            ash_height_all.extend(split_layers_by_profile(layers, 'ash_height', profile_list))
+            troppause_altitude_all.extend(tropopause_altitude[profile_list])
+            # for i in profile_list:
+            #     extinction_all.append(extinction[:, i])
+            #     backscatter_all.append(backscatter[:, i])
+            #     depolarisation_all.append(depolarisation[:, i])
+            #     aerosol_type_all.append(aerosol_type[:, i])
+            #     feature_type_all.append(feature_type[:, i])
 
 
 df = pd.DataFrame({
@@ -172,5 +119,8 @@ df = pd.DataFrame({
 
 df.to_csv(save_location + '/' + year + '_ash_thickness.csv', index=False)
 
+# long-format layer table, one row per layer, partitioned by month
+save_layer_table(concat_layer_tables(layer_table_list), save_location + '/layer_table', year)
+
 
 
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    caliop_ash_extraction.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 23:55
+
+"""
+Yearly ash pre-extraction of the CALIOP APro5km granules, stored as sparse, compressed netcdf files.
+
+Only the profiles with a candidate feature (stratospheric features, see CANDIDATE_FEATURE_TYPES, the volcanic
+ash being a stratospheric feature subtype) are kept, and only their candidate bins. The granules of a day are
+saved in one file <save_location>/<year>/<day folder>.nc as contiguous ragged arrays (CF-1.8):
+
+    granule dimension: granule_name, granule_profiles (profiles of the granule), profile_count and the
+                       altitudes of the range bins (granule, level)
+    profile dimension: profile_index (in the granule), latitude, longitude, tropopause_height, bin_count
+    bin dimension:     level_index, feature_type, aerosol_type, extinction
+
+the profiles of the n-th granule following the profiles of the granules before it, and the same for the bins
+of the profiles. The variables are zlib compressed and chunked along their dimension.
+
+The extracted granules are recorded in the manifest of the year (see EXTRACTION_MANIFEST_FIELDS) with the stamp
+of their HDF file and the extraction version, a rerun only extracts the new, modified or failed granules and
+rewrites the files of their days.
+
+    granule_list = get_year_granules(caliop_location, year)
+    ...
+    for (granule_name, dataset) in iterate_extracted_granules(save_location, year):
+        dataset['feature_type'], dataset['caliop_v4_aerosol_type'], dataset['extinction'], ...
+
+iterate_extracted_granules gives back the (levels, profiles) arrays of the former per-granule npz files, the
+bins and profiles which were not kept being filled (see EXTRACTION_FILL_VALUES).
+"""
+
+from netCDF4 import Dataset
+import numpy as np
+import csv
+import os
+import sys
+sys.path.append('../../')
+from getColocationData.get_file_cache import save_file_atomic
+
+# version of the extraction, increase it when a change affects the extracted files, the granules extracted with
+# another version are extracted again
+EXTRACTION_VERSION = '1.0'
+
+# feature types of the kept bins: 4 -> stratospheric feature (aerosol subtype 2 -> volcanic ash)
+CANDIDATE_FEATURE_TYPES = (4,)
+
+EXTRACTION_MANIFEST_FIELDS = ('granule_name', 'day', 'code_version', 'caliop_stamp', 'status', 'profiles')
+
+# values of the bins and profiles not kept by the extraction, in the arrays of iterate_extracted_granules
+EXTRACTION_FILL_VALUES = {'feature_type': 0,
+                          'caliop_v4_aerosol_type': 0,
+                          'extinction': -9999.,
+                          'orbit_l2_latitude': np.nan,
+                          'orbit_l2_longitude': np.nan,
+                          'orbit_l2_tropopause_height': np.nan}
+
+# variables of the extraction files: (name, dimension, dtype)
+EXTRACTION_PROFILE_VARIABLES = (('profile_index', 'profile', 'i4'),
+                                ('latitude', 'profile', 'f4'),
+                                ('longitude', 'profile', 'f4'),
+                                ('tropopause_height', 'profile', 'f4'),
+                                ('bin_count', 'profile', 'i2'),
+                                ('level_index', 'bin', 'i2'),
+                                ('feature_type', 'bin', 'i1'),
+                                ('aerosol_type', 'bin', 'i1'),
+                                ('extinction', 'bin', 'f4'))
+
+
+def get_year_granules(caliop_location, year):
+    """
+    APro5km granules of a year, sorted by day folder and name.
+
+    Returns:
+        granule_list: list of (day folder, granule name, HDF file), the granule name being the HDF file name, e.g.
+        CAL_LID_L2_05kmAPro-Standard-V4-20.2019-06-22T00-31-44ZN.hdf.
+    """
+    granule_list = []
+
+    for caliop_sub_folder in sorted(os.listdir(caliop_location + '/' + year)):
+        for file in sorted(os.listdir(caliop_location + '/' + year + '/' + caliop_sub_folder)):
+            if file.endswith('.hdf'):
+                granule_list.append((caliop_sub_folder, file,
+                                     caliop_location + '/' + year + '/' + caliop_sub_folder + '/' + file))
+
+    return granule_list
+
+
+def get_extraction_file(save_location, year, day):
+    """Extraction file of a day folder, <save_location>/<year>/<day>.nc"""
+    return save_location + '/' + year + '/' + day + '.nc'
+
+
+def get_candidate_bins(feature_type, feature_types=CANDIDATE_FEATURE_TYPES):
+    """Mask (levels, profiles) of the candidate bins, the bins of the kept feature types"""
+    return np.isin(feature_type, feature_types)
+
+
+def extract_granule(caliop_file, granule_name, feature_types=CANDIDATE_FEATURE_TYPES):
+    """
+    Sparse candidate bins of a granule, run in the workers.
+
+    Parameters:
+        caliop_file: string, APro5km HDF file.
+        granule_name: string, HDF file name, see get_year_granules.
+        feature_types: tuple of int, feature types of the kept bins.
+
+    Returns:
+        granule: dict, granule_name, granule_profiles, altitude (levels,), the profile variables of the kept
+        profiles and the bin variables of their candidate bins (see EXTRACTION_PROFILE_VARIABLES), the bins being
+        sorted by profile and level.
+    """
+    # the HDF reader is only needed by the extraction, not by the readers of the extracted files
+    from Caliop.caliop import Caliop_hdf_reader
+
+    request = Caliop_hdf_reader()
+    (caliop_v4_aerosol_type, feature_type) = request._get_feature_classification(filename=caliop_file,
+                                                                                 variable='Atmospheric_Volume_Description')
+    extinction = request._get_calipso_data(filename=caliop_file, variable='Extinction_Coefficient_532')
+    orbit_l2_altitude = request.get_altitudes(filename=caliop_file)
+    orbit_l2_latitude = request._get_latitude(filename=caliop_file)
+    orbit_l2_longitude = request._get_longitude(filename=caliop_file)
+    orbit_l2_tropopause_height = request._get_tropopause_height(filename=caliop_file)
+
+    candidate_bins = get_candidate_bins(feature_type, feature_types)
+    profile_list = np.nonzero(np.any(candidate_bins, axis=0))[0]
+
+    # profile-major order: the bins of each profile are contiguous, from the top level
+    (profile_bin, level_index) = np.nonzero(candidate_bins[:, profile_list].T)
+    profile_bin = profile_list[profile_bin]
+
+    return {'granule_name': granule_name,
+            'granule_profiles': np.shape(feature_type)[1],
+            'altitude': np.asarray(orbit_l2_altitude, dtype=np.float32),
+            'profile_index': profile_list.astype(np.int32),
+            'latitude': np.asarray(orbit_l2_latitude, dtype=np.float32)[profile_list],
+            'longitude': np.asarray(orbit_l2_longitude, dtype=np.float32)[profile_list],
+            'tropopause_height': np.asarray(orbit_l2_tropopause_height, dtype=np.float32)[profile_list],
+            'bin_count': np.sum(candidate_bins[:, profile_list], axis=0).astype(np.int16),
+            'level_index': level_index.astype(np.int16),
+            'feature_type': np.asarray(feature_type)[level_index, profile_bin].astype(np.int8),
+            'aerosol_type': np.asarray(caliop_v4_aerosol_type)[level_index, profile_bin].astype(np.int8),
+            'extinction': np.asarray(extinction, dtype=np.float32)[level_index, profile_bin]}
+
+
+def save_extraction_file(save_filename, granules, chunk_size=65536, complevel=4):
+    """
+    Save the extracted granules of a day in one netcdf file, through a temporary file.
+
+    Parameters:
+        save_filename: string, see get_extraction_file.
+        granules: list of dict, see extract_granule.
+        chunk_size: int, chunk size along the profile and bin dimensions.
+        complevel: int, zlib compression level.
+    """
+    n_levels = np.size(granules[0]['altitude']) if granules else 0
+
+    def write_extraction_file(tmp_filename):
+        with Dataset(tmp_filename, mode='w', format='NETCDF4') as ncfile:
+            ncfile.Conventions = 'CF-1.8'
+            ncfile.extraction_version = EXTRACTION_VERSION
+            ncfile.candidate_feature_types = list(CANDIDATE_FEATURE_TYPES)
+
+            ncfile.createDimension('granule', len(granules))
+            ncfile.createDimension('level', n_levels)
+            ncfile.createDimension('profile', sum(np.size(granule['profile_index']) for granule in granules))
+            ncfile.createDimension('bin', sum(np.size(granule['level_index']) for granule in granules))
+
+            ncfile.createVariable('granule_name', str, ('granule',))
+            for (index, granule) in enumerate(granules):
+                ncfile['granule_name'][index] = granule['granule_name']
+
+            ncfile.createVariable('granule_profiles', 'i4', ('granule',))
+            ncfile['granule_profiles'][:] = [granule['granule_profiles'] for granule in granules]
+
+            ncfile.createVariable('profile_count', 'i4', ('granule',))
+            ncfile['profile_count'].sample_dimension = 'profile'
+            ncfile['profile_count'][:] = [np.size(granule['profile_index']) for granule in granules]
+
+            ncfile.createVariable('altitude', 'f4', ('granule', 'level'), zlib=True, complevel=complevel)
+            ncfile['altitude'].units = 'km'
+            if granules:
+                ncfile['altitude'][:] = np.stack([granule['altitude'] for granule in granules])
+
+            for (name, dimension, dtype) in EXTRACTION_PROFILE_VARIABLES:
+                ncvariable = ncfile.createVariable(name, dtype, (dimension,), zlib=True, complevel=complevel,
+                                                   shuffle=True,
+                                                   chunksizes=(max(1, min(chunk_size,
+                                                                          ncfile.dimensions[dimension].size)),))
+                if granules:
+                    ncvariable[:] = np.concatenate([granule[name] for granule in granules])
+
+            ncfile['bin_count'].sample_dimension = 'bin'
+            ncfile['extinction'].units = 'km-1'
+            ncfile['tropopause_height'].units = 'km'
+
+    save_file_atomic(save_filename, write_extraction_file,
+                     tmp_filename=os.path.splitext(save_filename)[0] + '.tmp.nc')
+
+
+def read_extraction_file(save_filename):
+    """
+    Extracted granules of a day.
+
+    Returns:
+        granules: list of dict, see extract_granule.
+    """
+    with Dataset(save_filename, mode='r') as ncfile:
+        ncfile.set_auto_mask(False)
+        granule_names = list(ncfile['granule_name'][:])
+        granule_profiles = ncfile['granule_profiles'][:]
+        profile_count = ncfile['profile_count'][:]
+        altitude = ncfile['altitude'][:]
+        data = {name: ncfile[name][:] for (name, dimension, dtype) in EXTRACTION_PROFILE_VARIABLES}
+
+    # offsets of the granules along the profile dimension, and of the profiles along the bin dimension
+    profile_start = np.concatenate(([0], np.cumsum(profile_count)))
+    bin_start = np.concatenate(([0], np.cumsum(data['bin_count'], dtype=np.int64)))
+
+    granules = []
+    for (index, granule_name) in enumerate(granule_names):
+        (first_profile, last_profile) = (profile_start[index], profile_start[index + 1])
+        (first_bin, last_bin) = (bin_start[first_profile], bin_start[last_profile])
+
+        granule = {'granule_name': granule_name,
+                   'granule_profiles': int(granule_profiles[index]),
+                   'altitude': altitude[index]}
+        for (name, dimension, dtype) in EXTRACTION_PROFILE_VARIABLES:
+            granule[name] = data[name][first_profile:last_profile] if dimension == 'profile' \
+                else data[name][first_bin:last_bin]
+        granules.append(granule)
+
+    return granules
+
+
+def get_granule_arrays(granule):
+    """
+    Arrays of a granule with the layout of the former per-granule npz files, the bins and profiles which were not
+    kept being filled with EXTRACTION_FILL_VALUES.
+
+    Returns:
+        dataset: dict of numpy arrays, caliop_v4_aerosol_type, feature_type, extinction (levels, profiles),
+        orbit_l2_altitude (levels,), orbit_l2_latitude, orbit_l2_longitude, orbit_l2_tropopause_height (profiles,).
+    """
+    shape = (np.size(granule['altitude']), granule['granule_profiles'])
+    profile_bin = np.repeat(granule['profile_index'], granule['bin_count'])
+
+    dataset = {'orbit_l2_altitude': granule['altitude']}
+
+    for (key, name, dtype) in (('caliop_v4_aerosol_type', 'aerosol_type', np.int8),
+                               ('feature_type', 'feature_type', np.int8),
+                               ('extinction', 'extinction', np.float32)):
+        dataset[key] = np.full(shape, EXTRACTION_FILL_VALUES[key], dtype=dtype)
+        dataset[key][granule['level_index'], profile_bin] = granule[name]
+
+    for (key, name) in (('orbit_l2_latitude', 'latitude'),
+                        ('orbit_l2_longitude', 'longitude'),
+                        ('orbit_l2_tropopause_height', 'tropopause_height')):
+        dataset[key] = np.full(shape[1], EXTRACTION_FILL_VALUES[key], dtype=np.float32)
+        dataset[key][granule['profile_index']] = granule[name]
+
+    return dataset
+
+
+def iterate_extracted_granules(save_location, year):
+    """Yield (granule name, dataset) for the extracted granules of a year, see get_granule_arrays"""
+    for file in sorted(os.listdir(save_location + '/' + year)):
+        if file.endswith('.nc') & (not file.endswith('.tmp.nc')):
+            for granule in read_extraction_file(save_location + '/' + year + '/' + file):
+                yield granule['granule_name'], get_granule_arrays(granule)
+
+
+def get_extraction_manifest_file(save_location, year):
+    """Manifest of the extracted granules of a year"""
+    return save_location + '/' + year + '/extraction_manifest.csv'
+
+
+def load_extraction_manifest(save_location, year):
+    """Rows (dict of EXTRACTION_MANIFEST_FIELDS) of the manifest keyed by granule name, empty for a new year"""
+    manifest = {}
+    manifest_file = get_extraction_manifest_file(save_location, year)
+
+    if os.path.exists(manifest_file):
+        with open(manifest_file, newline='') as csvfile:
+            for row in csv.DictReader(csvfile):
+                manifest[row['granule_name']] = row
+
+    return manifest
+
+
+def save_extraction_manifest(save_location, year, manifest):
+    """Save the manifest of a year, through a temporary file"""
+    def write_manifest(tmp_filename):
+        with open(tmp_filename, 'w', newline='') as output:
+            writer = csv.DictWriter(output, fieldnames=EXTRACTION_MANIFEST_FIELDS, lineterminator='\n')
+            writer.writeheader()
+            for granule_name in sorted(manifest):
+                writer.writerow(manifest[granule_name])
+
+    save_file_atomic(get_extraction_manifest_file(save_location, year), write_manifest)
+
+
+def update_extraction_manifest(manifest, granule_name, day, caliop_stamp, status, profiles=0):
+    """Record the status ('done' or 'failed') of a granule"""
+    manifest[granule_name] = {'granule_name': granule_name,
+                              'day': day,
+                              'code_version': EXTRACTION_VERSION,
+                              'caliop_stamp': caliop_stamp,
+                              'status': status,
+                              'profiles': profiles}
+
+
+def is_granule_extracted(manifest, granule_name, caliop_stamp, extraction_file):
+    """A granule is extracted if it was done with the current version from the same HDF file, and its day file
+    still exists"""
+    row = manifest.get(granule_name)
+
+    if row is None:
+        return False
+
+    return (row['status'] == 'done') & (row['code_version'] == EXTRACTION_VERSION) & \
+        (row['caliop_stamp'] == caliop_stamp) & os.path.exists(extraction_file)
+
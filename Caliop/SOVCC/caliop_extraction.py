@@ -5,71 +5,107 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        30/05/2023 12:51
 
+"""
+Ash pre-extraction of a year of CALIOP APro5km granules over a local process pool.
+
+The granules are read in the workers, only the profiles with candidate ash/stratospheric features are kept and
+the granules of a day are saved in one compressed file, see caliop_ash_extraction.py. The extracted granules are
+recorded in the manifest of the year, a rerun only extracts the new, modified or failed granules.
+
+usage: python caliop_extraction.py 2019 --workers 16
+"""
+
 import sys
 sys.path.append('../../')
 
-from Caliop.caliop import Caliop_hdf_reader
-import numpy as np
-import sys
+from Caliop.SOVCC.caliop_ash_extraction import get_year_granules, get_extraction_file, extract_granule, \
+    save_extraction_file, read_extraction_file, load_extraction_manifest, save_extraction_manifest, \
+    update_extraction_manifest, is_granule_extracted
+from getColocationData.get_manifest import get_file_stamp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import pathlib
 import os
 
-# set year from command line arugment
-year = sys.argv[1]
-
 # caliop location on CEDA
 caliop_location = '/gws/nopw/j04/eo_shared_data_vol1/satellite/calipso/APro5km'
 # location to save ash only data
 save_location = './caliop_ash_data_extraction'
 
-# create save_location folder if not exist
-try:
-    os.stat(save_location)
-except:
-    os.mkdir(save_location)
-
-# loop through all the sub year folder in caliop_location
-for caliop_sub_folder in os.listdir(caliop_location + '/' + year):
-
-    try:
-        os.stat(save_location + '/' + year)
-    except:
-        os.mkdir(save_location + '/' + year)
-
-    for files in os.listdir(caliop_location + '/' + year + '/' + caliop_sub_folder):
-        if files.endswith('.hdf'):
-            print('---------> Reading caliop file: %s' %files)
-            # read caliop hdf file
-            caliop_file = caliop_location + '/' + year + '/' + caliop_sub_folder + '/' + files
-            # extract ash layer only
-            request = Caliop_hdf_reader()
-            #
-            (caliop_v4_aerosol_type, feature_type) = request._get_feature_classification(filename=caliop_file, variable='Atmospheric_Volume_Description')
-            extinction = request._get_calipso_data(filename=caliop_file, variable='Extinction_Coefficient_532')
-            orbit_l2_altitude = request.get_altitudes(filename=caliop_file)
-            orbit_l2_latitude = request._get_latitude(filename=caliop_file)
-            orbit_l2_longitude = request._get_longitude(filename=caliop_file)
-            orbit_l2_tropopause_height = request._get_tropopause_height(filename=caliop_file)
-            #
-            save_sub_location = save_location + '/' + year + '/' + caliop_sub_folder + '/'
+
+def save_day(year, day, day_granules, new_granules, manifest):
+    """
+    Save the file of a day once its pending granules are extracted: the new granules and the granules already
+    extracted in the existing file, the granules no longer in the archive being dropped.
+
+    Parameters:
+        day_granules: list of the granule names of the day in the archive.
+        new_granules: dict of the granules (see extract_granule) extracted by this run, keyed by granule name.
+    """
+    extraction_file = get_extraction_file(save_location, year, day)
+
+    granules = {}
+    if os.path.exists(extraction_file):
+        for granule in read_extraction_file(extraction_file):
+            if (granule['granule_name'] in day_granules) & (manifest.get(granule['granule_name'], {})
+                                                           .get('status') == 'done'):
+                granules[granule['granule_name']] = granule
+    granules.update(new_granules)
+
+    save_extraction_file(extraction_file, [granules[granule_name] for granule_name in sorted(granules)])
+    save_extraction_manifest(save_location, year, manifest)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Ash pre-extraction of a year of CALIOP granules.")
+    parser.add_argument("year", type=str, help="Year of the granules, e.g. 2019.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--force", action='store_true', help="Extract again the granules already extracted.")
+    args = parser.parse_args()
+
+    year = args.year
+    pathlib.Path(save_location + '/' + year).mkdir(parents=True, exist_ok=True)
+
+    manifest = load_extraction_manifest(save_location, year)
+
+    # granules of each day, and the granules to be extracted
+    day_granules = {}
+    pending = []
+    for (day, granule_name, caliop_file) in get_year_granules(caliop_location, year):
+        day_granules.setdefault(day, []).append(granule_name)
+
+        caliop_stamp = get_file_stamp(caliop_file)
+        if args.force | (not is_granule_extracted(manifest, granule_name, caliop_stamp,
+                                                  get_extraction_file(save_location, year, day))):
+            pending.append((day, granule_name, caliop_file, caliop_stamp))
+
+    pending_days = {}
+    for (day, granule_name, caliop_file, caliop_stamp) in pending:
+        pending_days[day] = pending_days.get(day, 0) + 1
+
+    print('---------> %d granules to be extracted on %d days with %d workers'
+          % (len(pending), len(pending_days), args.workers))
+
+    # the granules are submitted day by day, a day is saved as soon as its last pending granule is finished
+    new_granules = {day: {} for day in pending_days}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(extract_granule, caliop_file, granule_name): (day, granule_name, caliop_stamp)
+                   for (day, granule_name, caliop_file, caliop_stamp) in pending}
+
+        for future in as_completed(futures):
+            (day, granule_name, caliop_stamp) = futures[future]
             try:
-                os.stat(save_sub_location)
-            except:
-                os.mkdir(save_sub_location)
-
-            # save all the variables as a numpy file
-            save_file_name = save_sub_location + files[:-4]
-            np.savez(save_file_name,
-                     caliop_v4_aerosol_type=caliop_v4_aerosol_type,
-                     feature_type=feature_type,
-                     extinction=extinction,
-                     orbit_l2_altitude=orbit_l2_altitude,
-                     orbit_l2_latitude=orbit_l2_latitude,
-                     orbit_l2_longitude=orbit_l2_longitude,
-                     orbit_l2_tropopause_height=orbit_l2_tropopause_height)
-
-            # for i in range(len(orbit_l2_latitude)):
-            #     # print(len(orbit_l2_latitude))
-            #     print(i, orbit_l2_latitude[i], orbit_l2_longitude[i])
-            # quit()
-        else:
-            pass
\ No newline at end of file
+                granule = future.result()
+                new_granules[day][granule_name] = granule
+                update_extraction_manifest(manifest, granule_name, day, caliop_stamp, 'done',
+                                           len(granule['profile_index']))
+                print('---------> Extracted caliop file: %s, %d of %d profiles'
+                      % (granule_name, len(granule['profile_index']), granule['granule_profiles']))
+            except Exception as error:
+                update_extraction_manifest(manifest, granule_name, day, caliop_stamp, 'failed')
+                print('---------> Failed caliop file: %s (%s)' % (granule_name, error))
+
+            pending_days[day] -= 1
+            if pending_days[day] == 0:
+                save_day(year, day, day_granules[day], new_granules.pop(day), manifest)
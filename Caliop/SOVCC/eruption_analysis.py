@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    eruption_analysis.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 22:20
+
+"""
+Ash layer statistics of the volcanic eruptions of ERUPTIONS, for the box and time figures of
+plot_eruption_analysis.py (former box_<volcano>.py and plot_time_<volcano>.py scripts).
+
+The layers are loaded once, the layers of each eruption (time window and latitude band) with all the variables
+are selected and filtered (see Caliop.SOVCC.ash_layer_filter, each eruption separately), then the statistics of
+all the eruptions are computed in one groupby pass:
+
+    granule_statistics: eruption, utc_time -> mean of the variables and count of the layers.
+    daily_statistics: eruption, date -> mean and std of the variables of the layers.
+
+As in the former scripts, the box figures use the statistics of STATISTICS_VARIABLES (thickness, ash_height,
+extinction, AOD) of the layers with extinction, and the time figures the statistics of TIME_STATISTICS_VARIABLES
+(thickness, ash_height) of the thickness extraction: the layers without extinction stay in the neighbour-density
+filter of the time figures.
+
+The statistics are cached in Parquet, keyed by the source files, the variables and the configuration of the
+eruptions, the figures are drawn from the cache.
+"""
+
+import pandas as pd
+import numpy as np
+import pathlib
+import sys
+import os
+sys.path.append('../../')
+from Caliop.SOVCC.ash_layer_filter import filter_neighbour_density
+from getColocationData.get_file_cache import get_files_cache_key, save_parquet_atomic
+
+# time window, latitude band (degree) and figure options of each eruption: the y limits of the box figures (ylim)
+# and of the time figures (time_ylim), the panels of the time figure drawn with the colorbar of the counts and the
+# daily errorbar (time_errorbar, the Raikoke thickness is the scatter alone, as in the former plot_time_raikoke.py)
+# and the days of the x axes
+ERUPTIONS = [
+    {'name': 'Sarychev', 'start_time': '2009-06-15', 'end_time': '2009-08-25', 'lat_bottom': 40, 'lat_top': 85,
+     'ylim': {'thickness': (0, 5.), 'ash_height': (8, 18.), 'extinction': (0, 0.3), 'AOD': (0, 0.3)},
+     'time_ylim': {'thickness': (0, 5.), 'ash_height': (8, 18.)}, 'time_errorbar': ('thickness', 'ash_height'),
+     'box_days': 50, 'time_days': 50},
+    {'name': 'Puyehue-Cordón Caulle', 'start_time': '2011-06-15', 'end_time': '2011-08-20', 'lat_bottom': -80,
+     'lat_top': 0, 'ylim': {'thickness': (0, 4.), 'ash_height': (8, 15.), 'extinction': (0, 0.3), 'AOD': (0, 0.3)},
+     'time_ylim': {'thickness': (0, 4.), 'ash_height': (8, 15.)}, 'time_errorbar': ('thickness', 'ash_height'),
+     'box_days': 50, 'time_days': 50},
+    {'name': 'Calbuco', 'start_time': '2015-04-22', 'end_time': '2015-07-25', 'lat_bottom': -50, 'lat_top': 0,
+     'ylim': {'thickness': (0, 4.), 'ash_height': (15, 22.), 'extinction': (0, 0.5), 'AOD': (0, 0.3)},
+     'time_ylim': {'thickness': (0, 4.), 'ash_height': (15, 22.)}, 'time_errorbar': ('thickness', 'ash_height'),
+     'box_days': 50, 'time_days': 50},
+    {'name': 'Raikoke', 'start_time': '2019-06-22', 'end_time': '2019-10-25', 'lat_bottom': 40, 'lat_top': 85,
+     'ylim': {'thickness': (0, 5.), 'ash_height': (8, 18.), 'extinction': (0, 0.3), 'AOD': (0, 0.3)},
+     'time_ylim': {'thickness': (0, 6.), 'ash_height': (8, 18.)}, 'time_errorbar': ('ash_height',),
+     'box_days': 50, 'time_days': 100},
+]
+
+# layer variables of the statistics of the box figures and of the time figures
+STATISTICS_VARIABLES = ('thickness', 'ash_height', 'extinction', 'AOD')
+TIME_STATISTICS_VARIABLES = ('thickness', 'ash_height')
+
+
+def select_eruption_layers(all_data, eruptions=ERUPTIONS, variables=STATISTICS_VARIABLES):
+    """
+    Layers within the time window and latitude band of each eruption, the layers with a NaN time, latitude or
+    variable are removed.
+
+    Parameters:
+        all_data: pandas DataFrame, utc_time, latitude and the variables of the layers.
+        eruptions: list of dicts, see ERUPTIONS.
+        variables: names of the layer variables.
+
+    Returns:
+        eruption_data: pandas DataFrame, the layers of all the eruptions with an 'eruption' (name) column, the
+        layers of an eruption in the order of all_data.
+    """
+    all_data = all_data.dropna(subset=['utc_time', 'latitude'] + list(variables))
+    eruption_data_list = []
+
+    for eruption in eruptions:
+        eruption_mask = (all_data['utc_time'] >= eruption['start_time']) & \
+                        (all_data['utc_time'] <= eruption['end_time']) & \
+                        (all_data['latitude'] >= eruption['lat_bottom']) & \
+                        (all_data['latitude'] <= eruption['lat_top'])
+        eruption_data_list.append(all_data[eruption_mask].assign(eruption=eruption['name']))
+
+    return pd.concat(eruption_data_list, ignore_index=True)
+
+
+def get_eruption_statistics(all_data, eruptions=ERUPTIONS, variables=STATISTICS_VARIABLES, lat_window=1.,
+                            min_count=5):
+    """
+    Granule and daily statistics of the layers of all the eruptions.
+
+    Parameters:
+        all_data: pandas DataFrame, utc_time, latitude and the variables of the layers.
+        eruptions: list of dicts, see ERUPTIONS.
+        variables: names of the layer variables, STATISTICS_VARIABLES or TIME_STATISTICS_VARIABLES.
+        lat_window, min_count: parameters of the neighbour-density filter (sequential mode), a layer is kept
+        with at least min_count layers of the same granule within lat_window degrees.
+
+    Returns:
+        granule_statistics: pandas DataFrame, one row per eruption and utc_time.
+        daily_statistics: pandas DataFrame, one row per eruption and date.
+    """
+    eruption_data = select_eruption_layers(all_data, eruptions, variables)
+
+    # the granules of different eruptions are filtered separately
+    eruption_data['granule'] = eruption_data.groupby(['eruption', 'utc_time'], sort=False).ngroup()
+    eruption_data = filter_neighbour_density(eruption_data, lat_window=lat_window, min_count=min_count,
+                                             sequential=True, time_key='granule')
+
+    granule_statistics = eruption_data.groupby(['eruption', 'utc_time']) \
+        .agg(**{variable: (variable, 'mean') for variable in variables}, count=('count', 'first')) \
+        .reset_index()
+
+    daily_statistics = eruption_data.groupby(['eruption', eruption_data['utc_time'].dt.floor('D').rename('date')]) \
+        .agg(**{'%s_%s' % (variable, statistic): (variable, statistic)
+                for variable in variables for statistic in ('mean', 'std')}) \
+        .reset_index()
+
+    return granule_statistics, daily_statistics
+
+
+def get_statistics_cache_key(source_files, source_dir, eruptions=ERUPTIONS, variables=STATISTICS_VARIABLES,
+                             lat_window=1., min_count=5):
+    """
+    Key of the cached statistics, any new, removed or modified source file (named by its path relative to
+    source_dir) or other configuration changes the key
+    """
+    return get_files_cache_key(sorted(source_files), config=[eruptions, list(variables), lat_window, min_count],
+                               root_dir=source_dir)
+
+
+def save_eruption_statistics(cache_dir, cache_key, granule_statistics, daily_statistics):
+    """Save the statistics in <cache_dir>/<cache_key>_granule.parquet and <cache_dir>/<cache_key>_daily.parquet"""
+    pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+    for (statistics_name, statistics) in (('granule', granule_statistics), ('daily', daily_statistics)):
+        save_parquet_atomic(statistics, os.path.join(cache_dir, '%s_%s.parquet' % (cache_key, statistics_name)))
+
+
+def load_eruption_statistics(cache_dir, cache_key):
+    """
+    Cached statistics, see save_eruption_statistics.
+
+    Returns:
+        granule_statistics, daily_statistics: pandas DataFrame, None if not cached.
+    """
+    cache_files = [os.path.join(cache_dir, '%s_%s.parquet' % (cache_key, statistics_name))
+                   for statistics_name in ('granule', 'daily')]
+
+    if not all(os.path.exists(cache_file) for cache_file in cache_files):
+        return None, None
+
+    return tuple(pd.read_parquet(cache_file, engine='pyarrow') for cache_file in cache_files)
+
+
+def get_daily_granule_values(granule_statistics, eruption, variable):
+    """
+    Granule means of a variable for each day of the time window of an eruption, for the box plots.
+
+    Returns:
+        days: pandas DatetimeIndex, days of the time window.
+        values: list of numpy arrays, granule means of each day (empty if there is no granule).
+    """
+    days = pd.date_range(start=eruption['start_time'], end=eruption['end_time'])
+    eruption_statistics = granule_statistics[granule_statistics['eruption'] == eruption['name']]
+
+    day_values = eruption_statistics.groupby(eruption_statistics['utc_time'].dt.floor('D'))[variable] \
+        .apply(np.asarray)
+
+    return days, [day_values.get(day, np.zeros(0)) for day in days]
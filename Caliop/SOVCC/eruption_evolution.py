@@ -5,6 +5,11 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        05/06/2023 17:11
 
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.ash_layer_filter import filter_neighbour_density
+from Caliop.SOVCC.ash_csv_loader import load_csv_files
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 from matplotlib.cm import ScalarMappable
 from matplotlib.colors import Normalize
@@ -14,7 +19,6 @@ from matplotlib import gridspec
 import matplotlib.pyplot as plt
 from datetime import datetime
 import pandas as pd
-import numpy as np
 import os
 # variable file location
 variable_file_location = './thickness_data_extraction'
@@ -31,23 +35,8 @@ lat_bottom = -80
 if not os.path.exists(figure_save_location):
     os.mkdir(figure_save_location)
 
-files = [file for file in os.listdir(variable_file_location) if file.endswith('.csv')]
-
-# Initiate empty DataFrame to store all data
-all_data = pd.DataFrame(columns=['utc_time', 'thickness', 'latitude', 'ash_height'])
-
-for file in files:
-    data = pd.read_csv(variable_file_location + '/' + file)
-    print(f"Processing file {file}")
-
-    for column in ['utc_time', 'thickness', 'latitude', 'ash_height']:
-        if column == 'utc_time':
-            # Convert utc_time to datetime format
-            data[column] = pd.to_datetime(data[column], format='%Y-%m-%dT%H-%M-%S')
-        else:
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-
-    all_data = all_data.append(data[['utc_time', 'thickness', 'latitude', 'ash_height']], ignore_index=True)
+# Read all the csv files at once, cached for the next runs
+all_data = load_csv_files(variable_file_location, ['utc_time', 'thickness', 'latitude', 'ash_height'])
 
 # Remove rows with any NaN values
 all_data = all_data.dropna()
@@ -56,17 +45,9 @@ all_data = all_data.dropna()
 all_data = all_data[(all_data['utc_time'] >= start_time) & (all_data['utc_time'] <= end_time) &
                     (all_data['latitude'] >= lat_bottom) & (all_data['latitude'] <= lat_top)]
 
-# Iterate over the rows to check for latitude criterion
-all_data['count'] = np.nan
-for i, row in all_data.iterrows():
-    nearby_records = all_data[(np.abs(all_data['latitude'] - row['latitude']) <= 1) &
-                              (all_data['utc_time'] == row['utc_time'])]
-    if nearby_records.shape[0] < 5:
-        all_data.drop(i, inplace=True)
-    else:
-        all_data.loc[i, 'count'] = nearby_records.shape[0]
-    if i % 1000 == 0:  # Print progress for every 1000 rows
-        print(f"Processed {i} rows")
+# Keep the rows with at least 5 records within +/-1 degree latitude at the same utc_time, the rows are checked
+# in order and a dropped row no longer counts for the following rows
+all_data = filter_neighbour_density(all_data, lat_window=1., min_count=5, sequential=True)
 
 # Group the data by each utc_time and calculate the mean and count of thickness
 grouped_data_utc = all_data.groupby('utc_time').agg({'thickness': 'mean', 'count': 'first'})
@@ -5,6 +5,10 @@
 # @Time:        04/06/2023 19:13
 
 
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.ash_csv_loader import load_csv_files, FILTERED_TIME_FORMAT
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
@@ -20,24 +24,9 @@ try:
 except:
     os.mkdir(figure_save_location)
 
-files = [file for file in os.listdir(variable_file_location) if file.endswith('.csv')]
-
-# Initiate empty DataFrame to store all data
-all_data = pd.DataFrame(columns=['utc_time', 'thickness', 'latitude', 'ash_height'])  # add ash_height column
-
-for file in files:
-    data = pd.read_csv(variable_file_location + '/' + file)
-    print(f"Processing file {file}")
-
-    for column in ['utc_time', 'thickness', 'latitude', 'ash_height']:  # add ash_height column
-        if column == 'utc_time':
-            # Convert utc_time to datetime format
-            data[column] = pd.to_datetime(data[column], format='%Y-%m-%d %H:%M:%S')
-        else:
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-
-    all_data = all_data.append(data[['utc_time', 'thickness', 'latitude', 'ash_height']],  # add ash_height column
-                               ignore_index=True)
+# Read all the csv files at once, cached for the next runs
+all_data = load_csv_files(variable_file_location, ['utc_time', 'thickness', 'latitude', 'ash_height'],
+                          time_format=FILTERED_TIME_FORMAT)
 
 # Remove rows with any NaN values
 all_data = all_data.dropna()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    plot_eruption_analysis.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 22:40
+
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.eruption_analysis import ERUPTIONS, STATISTICS_VARIABLES, TIME_STATISTICS_VARIABLES, \
+    get_eruption_statistics, get_statistics_cache_key, save_eruption_statistics, load_eruption_statistics, \
+    get_daily_granule_values
+from Caliop.SOVCC.ash_csv_loader import load_csv_files, get_csv_files
+from Caliop.SOVCC.ash_layer_table import read_layer_table
+from mpl_toolkits.axes_grid1.inset_locator import inset_axes
+from matplotlib.colors import Normalize
+import matplotlib.pyplot as plt
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import argparse
+import pathlib
+
+# variable file location and variables of the statistics of the box figures (layers with extinction) and of the
+# time figures (thickness extraction)
+box_variable_file_location = './thickness_data_extraction_extinction'
+time_variable_file_location = './thickness_data_extraction'
+figure_save_location = './figures'
+statistics_cache_location = './eruption_statistics'
+
+# colour and label of the box plots of each variable
+BOX_VARIABLES = (('thickness', '#FF851B', 'Ash layer thickness [km]'),
+                 ('ash_height', '#FF4136', 'Ash height [km]'),
+                 ('extinction', '#3D9970', 'Extinction [km$^{-1}$]'),
+                 ('AOD', 'blue', 'AOD'))
+
+
+def load_layers(eruptions, variable_file_location, variables, layer_table_location=None):
+    """
+    Layers of the thickness csv files, or of the layer table (see ash_layer_table.py) read within the time window and
+    latitude band of each eruption (the windows of ERUPTIONS do not overlap), with the columns of the variables.
+    """
+    columns = ['utc_time', 'latitude'] + [variable for variable in variables if variable != 'AOD']
+    if ('AOD' in variables) and ('extinction' not in columns):
+        columns.append('extinction')
+
+    if layer_table_location is None:
+        all_data = load_csv_files(variable_file_location, columns)
+    else:
+        table_columns = ['time' if column == 'utc_time' else column for column in columns]
+        all_data = pd.concat([read_layer_table(layer_table_location, start_time=eruption['start_time'],
+                                               end_time=eruption['end_time'], lat_bottom=eruption['lat_bottom'],
+                                               lat_top=eruption['lat_top'], columns=table_columns)
+                              for eruption in eruptions], ignore_index=True).rename(columns={'time': 'utc_time'})
+
+    if 'AOD' in variables:
+        # Calculate AOD by multiplying 'thickness' and 'extinction'
+        all_data['AOD'] = all_data['thickness'] * all_data['extinction']
+
+    return all_data
+
+
+def get_statistics(variable_file_location, variables, layer_table_location=None):
+    """
+    Granule and daily statistics of the variables of all the eruptions (see get_eruption_statistics), read from the
+    cache if the source files and the configuration are unchanged.
+    """
+    if layer_table_location is None:
+        (source_dir, source_files) = (variable_file_location, get_csv_files(variable_file_location))
+    else:
+        source_dir = layer_table_location
+        source_files = [str(file) for file in pathlib.Path(layer_table_location).glob('year=*/month=*/*.parquet')]
+
+    cache_key = get_statistics_cache_key(source_files, source_dir, variables=variables)
+    (granule_statistics, daily_statistics) = load_eruption_statistics(statistics_cache_location, cache_key)
+
+    if granule_statistics is None:
+        all_data = load_layers(ERUPTIONS, variable_file_location, variables,
+                               layer_table_location=layer_table_location)
+        (granule_statistics, daily_statistics) = get_eruption_statistics(all_data, variables=variables)
+        save_eruption_statistics(statistics_cache_location, cache_key, granule_statistics, daily_statistics)
+    else:
+        print('Reading cached statistics %s' % cache_key)
+
+    return granule_statistics, daily_statistics
+
+
+def plot_eruption_box(eruption, granule_statistics):
+    """Box plots of the daily granule means of thickness, ash height, extinction and AOD (former box_*.py)"""
+    name = eruption['name']
+    formatted_start_time = datetime.strptime(eruption['start_time'], '%Y-%m-%d').strftime('%d/%m/%Y')
+
+    fig, ax = plt.subplots(1, 4, figsize=(32, 8))
+
+    for (i, (variable, color, label)) in enumerate(BOX_VARIABLES):
+        (days, box_plot_data) = get_daily_granule_values(granule_statistics, eruption, variable)
+        positions = range(len(days))
+        x_labels = list((days - days[0]).days)
+
+        bp = ax[i].boxplot(box_plot_data, positions=positions, widths=0.6)
+        for element in ['boxes', 'whiskers', 'fliers', 'means', 'medians', 'caps']:
+            plt.setp(bp[element], color=color)
+
+        ax[i].set_ylabel(label, fontsize=18)
+        ax[i].tick_params(axis='both', labelsize=18)
+        ax[i].set_ylim(*eruption['ylim'][variable])
+        ax[i].set_title(f"{name}", fontsize=20)
+        ax[i].set_xticks(positions[::5])
+        ax[i].set_xticklabels(x_labels[::5])
+        ax[i].set_xlim(0., eruption['box_days'])
+        ax[i].set_xlabel('Days Since T0 (' + formatted_start_time + ')', fontsize=18)
+
+    plt.savefig(figure_save_location + '/' + name + '_box.png')
+    plt.close(fig)
+
+    # Print the mean and std of the granule mean thickness each day
+    for (day, thickness) in zip(*get_daily_granule_values(granule_statistics, eruption, 'thickness')):
+        if len(thickness) > 0:
+            thickness_std = thickness.std(ddof=1) if len(thickness) > 1 else np.nan
+            print(f"On day {day.date()}, Mean thickness: {thickness.mean()}, Std thickness: {thickness_std}")
+
+
+def plot_eruption_time(eruption, granule_statistics, daily_statistics):
+    """Granule means coloured by count, with the daily mean and std of the layers (former plot_time_*.py)"""
+    name = eruption['name']
+    start_date = pd.to_datetime(eruption['start_time'])
+    formatted_start_time = start_date.strftime('%d/%m/%Y')
+
+    grouped_data_utc = granule_statistics[granule_statistics['eruption'] == name]
+    grouped_data_day = daily_statistics[daily_statistics['eruption'] == name]
+    grouped_data_utc_days = (grouped_data_utc['utc_time'] - start_date).dt.total_seconds() / (24 * 60 * 60)
+    grouped_data_day_days = (grouped_data_day['date'] - start_date).dt.days
+
+    # Set up colormap
+    cmap = plt.get_cmap("jet")
+    norm = Normalize(vmin=grouped_data_utc['count'].min(), vmax=grouped_data_utc['count'].max())
+
+    fig, ax = plt.subplots(2, 1, figsize=(8, 16))  # Set the plot size and create 2 subplots
+    # axis of the x label, the day-based axis of the bottom panel if it has one
+    ax_bottom = ax[1]
+
+    for (i, (variable, label)) in enumerate((('thickness', 'Ash layer thickness [km]'),
+                                             ('ash_height', 'Ash height [km]'))):
+        sc = ax[i].scatter(grouped_data_utc_days, grouped_data_utc[variable], c=grouped_data_utc['count'], cmap=cmap,
+                           norm=norm, alpha=0.35, s=5 * grouped_data_utc['count'])
+        ax[i].set_ylabel(label, fontsize=18)
+        ax[i].set_ylim(*eruption['time_ylim'][variable])
+        ax[i].grid(True)
+        ax[i].tick_params(axis='both', labelsize=18)
+        ax[i].set_xticklabels([])
+        ax[i].set_xlim(0, eruption['time_days'])
+
+        # the scatter alone for the panels without the daily statistics
+        if variable not in eruption['time_errorbar']:
+            continue
+
+        axins = inset_axes(ax[i], width="50%", height="5%", loc='upper left', bbox_to_anchor=(0.05, 0.55, 0.4, 0.4),
+                           bbox_transform=ax[i].transAxes, borderpad=0)
+        plt.colorbar(sc, cax=axins, orientation='horizontal', label='Counts')
+
+        # Error bar plot with day-based x-axis
+        ax_day = ax[i].twiny()
+        ax_day.xaxis.tick_bottom()
+        ax_day.xaxis.set_label_position('bottom')
+        ax_day.errorbar(grouped_data_day_days, grouped_data_day[variable + '_mean'],
+                        yerr=grouped_data_day[variable + '_std'], fmt='x', color='black', markeredgecolor='black',
+                        capsize=3, elinewidth=2.4)
+        ax_day.set_xlim(0, eruption['time_days'])
+        ax_day.tick_params(axis='both', labelsize=18)
+        if i == 1:
+            ax_bottom = ax_day
+
+    ax[0].set_title(f"{name}", fontsize=20)
+    ax_bottom.set_xlabel('Days Since T0 (' + formatted_start_time + ')', fontsize=18)
+
+    plt.savefig(figure_save_location + '/' + name + '_thickness_and_ash_height_for_each_utc_time.png')
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Box and time figures of the ash layers of the eruptions.")
+    parser.add_argument("--eruptions", type=str, nargs='+', default=None,
+                        help="Names of the eruptions to plot, all the eruptions of ERUPTIONS by default.")
+    parser.add_argument("--layer_table", type=str, default=None,
+                        help="Read the layers of all the figures from this layer table instead of the thickness "
+                             "csv files.")
+    args = parser.parse_args()
+
+    # create save_location folder if not exist
+    pathlib.Path(figure_save_location).mkdir(parents=True, exist_ok=True)
+
+    # the statistics of all the eruptions are computed at once and cached, the figures only read the cache
+    (box_granule_statistics, _) = get_statistics(box_variable_file_location, STATISTICS_VARIABLES,
+                                                 layer_table_location=args.layer_table)
+    (time_granule_statistics, time_daily_statistics) = get_statistics(time_variable_file_location,
+                                                                      TIME_STATISTICS_VARIABLES,
+                                                                      layer_table_location=args.layer_table)
+
+    for eruption in ERUPTIONS:
+        if (args.eruptions is None) or (eruption['name'] in args.eruptions):
+            print('---------> Plotting %s' % eruption['name'])
+            plot_eruption_box(eruption, box_granule_statistics)
+            plot_eruption_time(eruption, time_granule_statistics, time_daily_statistics)
@@ -5,6 +5,10 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        04/06/2023 15:04
 
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.ash_csv_loader import load_csv_files
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
@@ -20,20 +24,8 @@ try:
 except:
     os.mkdir(figure_save_location)
 
-files = [file for file in os.listdir(variable_file_location) if file.endswith('.csv')]
-
-# Initiate empty DataFrame to store all data
-all_data = pd.DataFrame(columns=['thickness', 'ash_height', 'latitude', 'tropopause_altitude'])
-
-for file in files:
-    data = pd.read_csv(variable_file_location + '/' + file)
-    print(f"Processing file {file}")
-
-    for column in ['thickness', 'ash_height', 'latitude', 'tropopause_altitude']:
-        data[column] = pd.to_numeric(data[column], errors='coerce')
-
-    all_data = all_data.append(data[['thickness', 'ash_height', 'latitude', 'tropopause_altitude']],
-                               ignore_index=True)
+# Read all the csv files at once, cached for the next runs
+all_data = load_csv_files(variable_file_location, ['thickness', 'ash_height', 'latitude', 'tropopause_altitude'])
 
 
 # Remove rows with any NaN values
@@ -5,6 +5,10 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        03/06/2023 00:05
 
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.ash_csv_loader import load_csv_files
 import matplotlib.gridspec as gridspec
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -22,40 +26,8 @@ try:
 except:
     os.mkdir(figure_save_location)
 
-files = [file for file in os.listdir(variable_file_location) if file.endswith('.csv')]
-
-# Initiate empty DataFrame to store all data
-all_data = pd.DataFrame(columns=['thickness', 'ash_height', 'latitude'])
-
-for file in files:
-
-    data = pd.read_csv(variable_file_location + '/' + file)
-    print(f"Processing file {file}")
-
-    for column in ['thickness', 'ash_height', 'latitude']:
-        if column in ['thickness', 'ash_height']:
-            # We first split the column into multiple columns
-            modified = data[column].str.split(",", expand=True)
-
-            # Case where there is only one value in the cell
-            single_value_mask = modified.count(axis=1) == 1
-            data.loc[single_value_mask, column] = modified.loc[single_value_mask, 0]
-
-            # Case where there are multiple values in the cell
-            multiple_values_mask = ~single_value_mask
-            for i, new_column in enumerate(modified.columns):
-                data.loc[multiple_values_mask, f"{column}_{i + 1}"] = modified.loc[multiple_values_mask, new_column]
-
-            # Convert the new columns to numeric
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-            for i in range(modified.shape[1]):
-                data[f"{column}_{i + 1}"] = pd.to_numeric(data[f"{column}_{i + 1}"], errors='coerce')
-        elif column == 'latitude':
-            # Convert the column to numeric
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-
-    # Append thickness and ash_height data to the DataFrame
-    all_data = all_data.append(data[['thickness', 'ash_height', 'latitude']], ignore_index=True)
+# Read all the csv files at once, cached for the next runs
+all_data = load_csv_files(variable_file_location, ['thickness', 'ash_height', 'latitude'])
 
 # Remove rows with any NaN values
 all_data = all_data.dropna()
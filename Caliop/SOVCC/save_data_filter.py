@@ -5,8 +5,11 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        05/06/2023 22:45
 
-import pandas as pd
-import numpy as np
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.ash_layer_filter import filter_neighbour_density
+from Caliop.SOVCC.ash_csv_loader import load_csv_files
 import os
 
 # variable file location
@@ -19,38 +22,15 @@ try:
 except:
     os.mkdir(data_save_location)
 
-files = [file for file in os.listdir(variable_file_location) if file.endswith('.csv')]
-
-# Initiate empty DataFrame to store all data
-all_data = pd.DataFrame(columns=['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'])  # add ash_height column
-
-for file in files:
-    data = pd.read_csv(variable_file_location + '/' + file)
-    print(f"Processing file {file}")
-
-    for column in ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']:  # add ash_height column
-        if column == 'utc_time':
-            # Convert utc_time to datetime format
-            data[column] = pd.to_datetime(data[column], format='%Y-%m-%dT%H-%M-%S')
-        else:
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-
-    all_data = all_data.append(data[['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']],  # add ash_height column
-                               ignore_index=True)
+# Read all the csv files at once, cached for the next runs
+all_data = load_csv_files(variable_file_location, ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'])
 
 # Remove rows with any NaN values
 all_data = all_data.dropna()
 
-# Iterate over the rows to check for latitude criterion
-total_length = len(all_data)
-for i, row in all_data.iterrows():
-    all_data.loc[i, 'drop'] = len(all_data[(np.abs(all_data['latitude'] - row['latitude']) <= 0.6) &
-                                           (all_data['utc_time'] == row['utc_time'])]) < 10
-    if i % 1000 == 0:  # Print progress for every 1000 rows
-        print(f"Processed {i} out of {total_length} rows")
-
-# Keep only rows where drop is False
-all_data = all_data[all_data['drop'] == False]
+# Keep only the rows with at least 10 records within +/-0.6 degree latitude at the same utc_time
+all_data = filter_neighbour_density(all_data, lat_window=0.6, min_count=10)
+all_data['drop'] = False  # column of the former saved csv files
 
 # Save the dataframe to csv file
 all_data.to_csv(data_save_location + '/' + 'extracted_data.csv', index=False)
@@ -5,6 +5,10 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        31/05/2023 10:59
 
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.ash_layers import get_ash_layers
 import numpy as np
 
 
@@ -63,3 +67,19 @@ ash_mask_thicknesses = calculate_ash_mask_thickness(ash_mask, altitude)
 
 print(f"Thicknesses of ash_mask: {ash_mask_thicknesses}")
 
+# same thicknesses from the granule kernel, with the example profile as a single column
+ash_layers = get_ash_layers(np.array(ash_mask)[:, np.newaxis], altitude)
+
+print(f"Thicknesses of ash_mask (kernel): {list(ash_layers['thickness'])}")
+assert np.allclose(ash_layers['thickness'], ash_mask_thicknesses)
+
+# random granule, every profile against the loop above
+rng = np.random.default_rng(0)
+granule_mask = (rng.random((len(altitude), 500)) < 0.5).astype(int)
+granule_layers = get_ash_layers(granule_mask, altitude)
+
+for i in range(granule_mask.shape[1]):
+    assert np.allclose(granule_layers['thickness'][granule_layers['profile_index'] == i],
+                       calculate_ash_mask_thickness(granule_mask[:, i], altitude))
+
+print(f"Kernel checked on {granule_mask.shape[1]} profiles, {len(granule_layers['thickness'])} ash layers")
@@ -5,6 +5,10 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        15/06/2023 12:13
 
+import sys
+sys.path.append('../../')
+
+from Caliop.SOVCC.ash_csv_loader import load_csv_files, FILTERED_TIME_FORMAT
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 from mpl_toolkits.basemap import Basemap
 from matplotlib.cm import ScalarMappable
@@ -14,7 +18,6 @@ import matplotlib.dates as mdates
 from matplotlib import gridspec
 import matplotlib.pyplot as plt
 from datetime import datetime
-import pandas as pd
 import numpy as np
 import os
 
@@ -33,23 +36,9 @@ lat_bottom = -80
 if not os.path.exists(figure_save_location):
     os.mkdir(figure_save_location)
 
-files = [file for file in os.listdir(variable_file_location) if file.endswith('.csv')]
-
-# Initiate empty DataFrame to store all data
-all_data = pd.DataFrame(columns=['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'])
-
-for file in files:
-    data = pd.read_csv(variable_file_location + '/' + file)
-    print(f"Processing file {file}")
-
-    for column in ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']:  # include 'extinction'
-        if column == 'utc_time':
-            # Convert utc_time to datetime format
-            data[column] = pd.to_datetime(data[column], format='%Y-%m-%d %H:%M:%S')
-        else:
-            data[column] = pd.to_numeric(data[column], errors='coerce')
-
-    all_data = all_data.append(data[['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']], ignore_index=True)  # include 'extinction' and 'AOD'
+# Read all the csv files at once, cached for the next runs
+all_data = load_csv_files(variable_file_location, ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'],
+                          time_format=FILTERED_TIME_FORMAT)
 
 # Remove rows with any NaN values
 all_data = all_data.dropna()
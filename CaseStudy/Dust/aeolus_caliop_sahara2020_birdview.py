@@ -11,6 +11,7 @@ sys.path.append('../../')
 import matplotlib.pyplot as plt
 from Caliop.caliop import Caliop_hdf_reader
 from getColocationData.get_aeolus import *
+from getColocationData.get_reprojection import resample_profiles
 from datetime import datetime, timedelta
 from matplotlib.gridspec import GridSpec
 import matplotlib.colors as colors
@@ -197,7 +198,7 @@ for i in range((end_date - start_date).days + 1):
                     (latitude, longitude, sca_mb_altitude,
                      footprint_time_aeolus, sca_mb_backscatter, alpha_aeolus_mb,
                      qc_aeolus_mb, ber_aeolus_mb, lod_aeolus_mb) = \
-                        extract_variables_from_aeolus(aeolus_file_path, logger)
+                        extract_variables_from_aeolus(aeolus_file_path, logger, return_ber_lod=True)
 
                     spatial_mask = np.where((latitude > lat_down) & (latitude < lat_up) &
                                             (longitude > lon_left) & (longitude < lon_right))[0]
@@ -262,19 +263,9 @@ for i in range((end_date - start_date).days + 1):
         aeolus_beta_all[aeolus_beta_all == -1.e6] = 0
         aeolus_beta_all = aeolus_beta_all * 1.e-6 * 1.e3
 
-        # Create empty array for resampled data, with same shape as alt_aeolus
-        backscatter_resample = np.zeros((aeolus_altitude_all.shape[0], np.size(alt_caliop)))
-        # backscatter_resample[:] = np.nan
-
-        # Iterate through rows and columns of alt_aeolus and data_aeolus
-        for m in range(aeolus_altitude_all.shape[0]):
-            alt_aeolus_m = aeolus_altitude_all[m, :]
-            for n in range(np.size(alt_aeolus_m)):
-                if alt_aeolus_m[n] > 0:
-                    if (n + 1) < len(alt_aeolus_m):
-                        # Resample data based on nearest altitude value less than current value in alt_caliop
-                        backscatter_resample[m, (alt_caliop < alt_aeolus_m[n]) & (alt_caliop > alt_aeolus_m[n + 1])] = \
-                        aeolus_beta_all[m, n]
+        # Resample data based on the Aeolus range bin containing each CALIOP altitude
+        backscatter_resample = resample_profiles(aeolus_altitude_all, aeolus_beta_all, alt_caliop,
+                                                 bin_mask=aeolus_altitude_all[:, :-1] > 0, fill_value=0.)
 
         ############# aeolus tidy up ####################################################
 
@@ -11,6 +11,7 @@ sys.path.append('../../')
 from mpl_toolkits.basemap import Basemap
 import matplotlib.pyplot as plt
 from getColocationData.get_aeolus import *
+from getColocationData.get_reprojection import resample_profiles
 from datetime import datetime, timedelta
 from matplotlib.gridspec import GridSpec
 import matplotlib.colors as colors
@@ -188,7 +189,7 @@ for day in range(14, 27):
                     (latitude, longitude, sca_mb_altitude,
                      footprint_time_aeolus, sca_mb_backscatter, alpha_aeolus_mb,
                      qc_aeolus_mb, ber_aeolus_mb, lod_aeolus_mb) = \
-                        extract_variables_from_aeolus(aeolus_file_path, logger)
+                        extract_variables_from_aeolus(aeolus_file_path, logger, return_ber_lod=True)
 
                     spatial_mask = np.where((latitude > lat_down) & (latitude < lat_up) &
                                             (longitude > lon_left) & (longitude < lon_right))[0]
@@ -225,19 +226,9 @@ for day in range(14, 27):
         # convert aeolus data with the given scaling factor: convert to km-1.sr-1
         beta_all = beta_all * 1.e-6 * 1.e3
 
-        # Create empty array for resampled data, with same shape as alt_aeolus
-        backscatter_resample = np.zeros((altitude_all.shape[0], np.size(alt_caliop)))
-        # backscatter_resample[:] = np.nan
-
-        # Iterate through rows and columns of alt_aeolus and data_aeolus
-        for m in range(altitude_all.shape[0]):
-            alt_aeolus_m = altitude_all[m, :]
-            for n in range(np.size(alt_aeolus_m)):
-                if alt_aeolus_m[n] > 0:
-                    if (n + 1) < len(alt_aeolus_m):
-                        # Resample data based on nearest altitude value less than current value in alt_caliop
-                        backscatter_resample[m, (alt_caliop < alt_aeolus_m[n]) & (alt_caliop > alt_aeolus_m[n + 1])] = \
-                        beta_all[m, n]
+        # Resample data based on the Aeolus range bin containing each CALIOP altitude
+        backscatter_resample = resample_profiles(altitude_all, beta_all, alt_caliop,
+                                                 bin_mask=altitude_all[:, :-1] > 0, fill_value=0.)
 
         ber_all_mask = np.zeros((ber_all.shape))
         ber_all_mask[ber_all < BER_threshold] = 1.
@@ -13,6 +13,8 @@ import numpy as np
 import sys
 import csv
 import os
+sys.path.append('../../')
+from Aeolus.aeolus_qc import get_qc_masks
 
 input_path = './aeolus_caliop_sahara2020_extraction_output/'
 save_path = './crosssection_pair_3/'
@@ -72,26 +74,9 @@ for npz_file in os.listdir(input_path):
         alpha_aeolus = np.load(input_path + npz_file, allow_pickle=True)['alpha']
         qc_aeolus = np.load(input_path + npz_file, allow_pickle=True)['qc']
 
-# convert qc_aeolus to bits and check the quality of the data
-def qc_to_bits(qc_array):
-    # Convert the quality control array to uint8
-    qc_uint8 = qc_array.astype(np.uint8)
-
-    # Unpack the uint8 array to bits
-    qc_bits = np.unpackbits(qc_uint8, axis=1)
-
-    # Reshape the bits array to match the original shape
-    qc_bits = qc_bits.reshape(*qc_array.shape, -1)
-
-    return qc_bits
-# Convert the quality control data to 8 bits
-qc_bits = qc_to_bits(qc_aeolus)
-
-first_bit = qc_bits[:, :, -1]
-second_bit = qc_bits[:, :, -2]
-# Create a boolean mask where the second bit equals 1 (valid data)
-valid_mask_extinction = first_bit == 1
-valid_mask_backscatter = second_bit == 1
+qc_masks = get_qc_masks(qc_aeolus)
+valid_mask_extinction = qc_masks['extinction']
+valid_mask_backscatter = qc_masks['backscatter']
 # set invalid data to nan
 alpha_aeolus_qc = np.where(valid_mask_extinction, alpha_aeolus, np.nan)
 beta_aeolus_qc = np.where(valid_mask_backscatter, beta_aeolus, np.nan)
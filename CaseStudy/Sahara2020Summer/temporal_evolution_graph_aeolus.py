@@ -12,6 +12,9 @@ from datetime import datetime
 import seaborn as sns
 import numpy as np
 import os
+import sys
+sys.path.append('../../')
+from Aeolus.aeolus_qc import get_qc_masks
 
 # This script generates the temporal evolution of dust layer using combined CALIOP and Aeolus data
 
@@ -79,18 +82,6 @@ timestamps = [datetime.strptime(f[-16:-4], '%Y%m%d%H%M') for f in npz_files]
 
 if True:
 
-    def qc_to_bits(qc_array):
-        # Convert the quality control array to uint8
-        qc_uint8 = qc_array.astype(np.uint8)
-
-        # Unpack the uint8 array to bits
-        qc_bits = np.unpackbits(qc_uint8, axis=1)
-
-        # Reshape the bits array to match the original shape
-        qc_bits = qc_bits.reshape(*qc_array.shape, -1)
-
-        return qc_bits
-
     for npz_file in os.listdir(AEOLUS_input_path):
         if npz_file.endswith('.npz') & ('aeolus_qc_' in npz_file):
 
@@ -103,14 +94,9 @@ if True:
             alpha_aeolus = np.load(AEOLUS_input_path + npz_file, allow_pickle=True)['alpha']
             qc_aeolus = np.load(AEOLUS_input_path + npz_file, allow_pickle=True)['qc']
 
-            # Convert the quality control data to 8 bits
-            qc_bits = qc_to_bits(qc_aeolus)
-
-            first_bit = qc_bits[:, :, -1]
-            second_bit = qc_bits[:, :, -2]
-            # Create a boolean mask where the second bit equals 1 (valid data)
-            valid_mask_extinction = first_bit == 1
-            valid_mask_backscatter = second_bit == 1
+            qc_masks = get_qc_masks(qc_aeolus)
+            valid_mask_extinction = qc_masks['extinction']
+            valid_mask_backscatter = qc_masks['backscatter']
             # set invalid data to nan
             # alpha_aeolus_qc = np.where(valid_mask_extinction, alpha_aeolus, np.nan)
             alpha_aeolus_qc = np.copy(alpha_aeolus)
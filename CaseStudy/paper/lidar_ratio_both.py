@@ -16,6 +16,8 @@ import pathlib
 import sys
 import csv
 import os
+sys.path.append('../../')
+from Aeolus.aeolus_qc import get_qc_masks
 
 MYD04_base_path = "/neodc/modis/data/MYD04_L2/collection61"
 input_path = '../Dust/aeolus_caliop_sahara2020_extraction_output/'
@@ -71,13 +73,6 @@ alpha_aeolus_all = []
 alt_aeolus_all = []
 lr_aeolus_all = []
 
-# convert qc_aeolus to bits and check the quality of the data
-def qc_to_bits(qc_array):
-    qc_uint8 = qc_array.astype(np.uint8)
-    qc_bits = np.unpackbits(qc_uint8, axis=1)
-    qc_bits = qc_bits.reshape(*qc_array.shape, -1)
-    return qc_bits
-
 font = {'family': 'serif',
         'weight': 'normal',
         'size': 14}
@@ -97,13 +92,9 @@ for npz_file in os.listdir(input_path):
         alpha[alpha <= 0.] = np.nan
         beta[beta <= 0.] = np.nan
 
-        qc_bits = qc_to_bits(qc_aeolus)
-        first_bit = qc_bits[:, :, -1]
-        second_bit = qc_bits[:, :, -2]
-
-        # Create a boolean mask where the second bit equals 1 (valid data)
-        valid_mask_extinction = first_bit == 1
-        valid_mask_backscatter = second_bit == 1
+        qc_masks = get_qc_masks(qc_aeolus)
+        valid_mask_extinction = qc_masks['extinction']
+        valid_mask_backscatter = qc_masks['backscatter']
         # set invalid data to nan
         alpha_aeolus_qc = np.where(valid_mask_extinction, alpha, np.nan)
         beta_aeolus_qc = np.where(valid_mask_backscatter, beta, np.nan)
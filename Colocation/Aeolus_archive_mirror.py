@@ -8,62 +8,46 @@
 import sys
 sys.path.append('../')
 
-from datetime import datetime, timedelta
-from Aeolus.aeolus import *
-import pathlib
+from datetime import datetime
+from Aeolus.aeolus_mirror import mirror_aeolus_archive, VirESTransport
+import argparse
 import logging
+import os
 
-logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s',
-                    filemode='w',
-                    filename= './aeolus_archive_mirror.log',
-                    level=logging.INFO)
-
-start_date = '2021-06-01 00:00' # start date of search colocations, year-month-day
-end_date = '2022-06-01 00:00' # end date of search colocations, year-month-day
-time_delta = timedelta(days = 1)
+start_date = '2021-06-01' # start date of the mirror, year-month-day
+end_date = '2022-06-01' # end date of the mirror, year-month-day
 
 save_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/aeolus_archive'
 
-start_date_datetime = datetime.strptime(start_date, '%Y-%m-%d %H:%M')
-end_date_datetime = datetime.strptime(end_date, '%Y-%m-%d %H:%M')
 AEOLUS_DATA_PRODUCT = "ALD_U_N_2A"
 
-while start_date_datetime <= end_date_datetime:
-
-    year_i = '{:04d}'.format(start_date_datetime.year)
-    month_i = '{:02d}'.format(start_date_datetime.month)
-    day_i = '{:02d}'.format(start_date_datetime.day)
-    hour_i = '{:02d}'.format(start_date_datetime.hour)
-    minute_i = '{:02d}'.format(start_date_datetime.minute)
-    print('mirror data for: %s-%s-%s %s:%s' % (year_i, month_i, day_i, hour_i, minute_i))
-
-    aeolus_interval_start = start_date_datetime
-    aeolus_interval_end = start_date_datetime + time_delta
-    sub_dir = save_dir + '/%s-%s'%(year_i, month_i)
-
-    try:
-        os.stat(sub_dir)
-    except:
-        pathlib.Path(sub_dir).mkdir(parents=True, exist_ok=True)
-
-    download_index = 0
-    download_success = 'False'
-
-    while download_index < 2:
-        try:
-            print(start_date_datetime, aeolus_interval_end)
-            VirES_request = SaveVirESNetcdf(measurement_start=start_date_datetime,
-                                            measurement_stop=aeolus_interval_end,
-                                            DATA_PRODUCT=AEOLUS_DATA_PRODUCT,
-                                            save_filename=sub_dir + '/%s-%s-%s.nc'%(year_i, month_i, day_i))
-            download_success = 'True'
-            download_index = download_index + 2
-        except:
-            download_index = download_index + 1
-
-    if download_success == 'True':
-        logging.info('Success: saved netCDF for %s-%s-%s'% (year_i, month_i, day_i))
-    else:
-        logging.info('Failed: saved netCDF for %s-%s-%s' % (year_i, month_i, day_i))
-
-    start_date_datetime += time_delta
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Mirror the daily Aeolus files, only the missing or corrupt days "
+                                                 "are fetched.")
+    parser.add_argument("--start_date", type=str, default=start_date, help="First day in the format YYYY-MM-DD.")
+    parser.add_argument("--end_date", type=str, default=end_date, help="Last day in the format YYYY-MM-DD.")
+    parser.add_argument("--save_dir", type=str, default=save_dir, help="Root directory of the mirror.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of days fetched concurrently.")
+    parser.add_argument("--retries", type=int, default=3, help="Number of retries of a failed day.")
+    parser.add_argument("--backoff", type=float, default=30., help="Delay before the first retry, in seconds.")
+    parser.add_argument("--force", action='store_true', help="Fetch again the valid and partial existing days.")
+    args = parser.parse_args()
+
+    script_base, script_ext = os.path.splitext(sys.modules['__main__'].__file__)
+
+    logging.basicConfig(format='%(asctime)s %(threadName)s %(levelname)s %(message)s',
+                        filemode='w',
+                        filename=script_base + '.log',
+                        level=logging.INFO)
+
+    coverage = mirror_aeolus_archive(args.save_dir,
+                                     datetime.strptime(args.start_date, '%Y-%m-%d'),
+                                     datetime.strptime(args.end_date, '%Y-%m-%d'),
+                                     logging.getLogger(),
+                                     transport=VirESTransport(), data_product=AEOLUS_DATA_PRODUCT,
+                                     workers=args.workers, retries=args.retries, backoff=args.backoff,
+                                     force=args.force)
+
+    print('%d days mirrored, %d days failed' % (sum(status != 'failed' for status in coverage.values()),
+                                                sum(status == 'failed' for status in coverage.values())))
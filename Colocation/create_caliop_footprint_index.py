@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    create_caliop_footprint_index.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 10:41
+
+import sys
+sys.path.append('../')
+
+from getColocationData.get_caliop_index import update_caliop_index_day
+from datetime import datetime, timedelta
+import logging
+
+logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s',
+                    filemode='w',
+                    filename='./create_caliop_footprint_index.log',
+                    level=logging.INFO)
+
+# Get a logger object
+logger = logging.getLogger()
+
+start_date = '2021-06-01 00:00' # start date of the footprint index, year-month-day
+end_date = '2022-06-01 00:00' # end date of the footprint index, year-month-day
+time_delta = timedelta(days = 1)
+
+CALIOP_JASMIN_dir = '/gws/nopw/j04/eo_shared_data_vol1/satellite/calipso/APro5km'
+index_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/caliop_footprint_index'
+
+start_date_datetime = datetime.strptime(start_date, '%Y-%m-%d %H:%M')
+end_date_datetime = datetime.strptime(end_date, '%Y-%m-%d %H:%M')
+
+# days already indexed are only updated with the granules added to the archive since the last run
+while start_date_datetime <= end_date_datetime:
+
+    granule_number = update_caliop_index_day(CALIOP_JASMIN_dir, index_dir, start_date_datetime, logger)
+    print('index CALIOP footprints for: %s, %d new granules' % (start_date_datetime.strftime('%Y-%m-%d'), granule_number))
+
+    start_date_datetime += time_delta
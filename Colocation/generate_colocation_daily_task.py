@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    generate_colocation_daily_task.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 11:27
+
+import sys
+sys.path.append('../')
+
+from getColocationData.get_colocation import sweep_colocated_footprints, save_colocation_footprint
+from getColocationData.get_caliop_index import CaliopFootprintIndex
+from getColocationData.get_aeolus import match_sca_to_observations
+from datetime import datetime, timedelta
+from netCDF4 import num2date
+import netCDF4 as nc
+import numpy as np
+import logging
+import csv
+import os
+
+"""
+Search the Aeolus-CALIOP colocations of a whole day in one pass, using the CALIOP footprint index
+(see create_caliop_footprint_index.py) and a space-time sweep over both missions sorted by time.
+The footprint csv files are saved in the same AEOLUS-<time>.csv format as generate_colocation_hourly_task.py.
+"""
+
+def get_script_name():
+    return sys.modules['__main__'].__file__
+
+# Get the name of the script
+script_name = get_script_name()
+
+# Split the script name into a base name and an extension
+script_base, script_ext = os.path.splitext(script_name)
+
+# Add the .log extension to the base name
+log_filename = script_base + '.log'
+
+logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s',
+                    filemode='w',
+                    filename=log_filename,
+                    level=logging.INFO)
+
+index_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/caliop_footprint_index'
+Aeolus_JASMIN_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/aeolus_archive/'
+database_dir = 'colocation_database'
+spatial_threshold = 200. # 200km threshold
+temporal_wd = 10. # hours of temporal window
+
+# read the day to be processed from the job array csv, see getColocationData/create_job_array_daily.py
+with open(sys.argv[1], newline='') as csvfile:
+    csvreader = csv.reader(csvfile, delimiter=',')
+    row_index = 0
+    for row in csvreader:
+        if row_index == 1:
+            search_date_start = row[0]
+            search_date_end = row[1]
+        row_index += 1
+
+search_date_start_datetime = datetime.strptime(search_date_start, '%Y-%m-%d-%H%M')
+search_date_end_datetime = datetime.strptime(search_date_end, '%Y-%m-%d-%H%M')
+
+search_year = '{:04d}'.format(search_date_start_datetime.year)
+search_month = '{:02d}'.format(search_date_start_datetime.month)
+search_day = '{:02d}'.format(search_date_start_datetime.day)
+
+aeolus_dir = Aeolus_JASMIN_dir + '%s-%s/%s-%s-%s.nc'%(search_year, search_month, search_year, search_month, search_day)
+
+with nc.Dataset(aeolus_dir) as dataset_nc:
+    L1B_start_time_obs = dataset_nc['observations']['L1B_start_time_obs'][:].astype(np.int64)
+    latitude_of_DEM_intersection_obs = dataset_nc['observations']['latitude_of_DEM_intersection_obs'][:]
+    longitude_of_DEM_intersection_obs = dataset_nc['observations']['longitude_of_DEM_intersection_obs'][:]
+    sca_time_obs = dataset_nc['sca']['SCA_time_obs'][:].astype(np.int64)
+
+# SCA profiles with a corresponding observation, inside the search period
+search_start_seconds = (search_date_start_datetime - datetime(2000, 1, 1)).total_seconds()
+search_end_seconds = (search_date_end_datetime - datetime(2000, 1, 1)).total_seconds()
+
+(sca_index, obs_index) = match_sca_to_observations(sca_time_obs, L1B_start_time_obs)
+search_mask = (sca_time_obs[sca_index] > search_start_seconds) & (sca_time_obs[sca_index] < search_end_seconds)
+
+sca_time_obs_array = sca_time_obs[sca_index[search_mask]]
+sca_lat_obs_array = np.asarray(latitude_of_DEM_intersection_obs[obs_index[search_mask]])
+sca_lon_obs_array = np.asarray(longitude_of_DEM_intersection_obs[obs_index[search_mask]])
+sca_lon_obs_array_180 = np.where(sca_lon_obs_array > 180., sca_lon_obs_array - 360., sca_lon_obs_array)
+
+logging.info('----------> Search colocated CALIOP profiles for %d Aeolus profiles on %s-%s-%s'
+             % (np.size(sca_time_obs_array), search_year, search_month, search_day))
+
+# CALIOP footprints of the search period, extended by the temporal window
+caliop_index = CaliopFootprintIndex(index_dir,
+                                    search_date_start_datetime - timedelta(hours=temporal_wd),
+                                    search_date_end_datetime + timedelta(hours=temporal_wd))
+
+(index_aeolus, index_caliop, distance, time_difference) = \
+    sweep_colocated_footprints(sca_time_obs_array, sca_lat_obs_array, sca_lon_obs_array_180,
+                               caliop_index.profile_time, caliop_index.latitude, caliop_index.longitude,
+                               temporal_wd=temporal_wd, spatial_threshold=spatial_threshold)
+
+# for every colocated Aeolus profile keep the CALIOP granule of the closest footprint
+order = np.lexsort((distance, index_aeolus))
+index_aeolus = index_aeolus[order]
+index_caliop = index_caliop[order]
+(colocated_aeolus, first_pair) = np.unique(index_aeolus, return_index=True)
+
+sca_time_obs_datetime = num2date(sca_time_obs_array[colocated_aeolus], units="s since 2000-01-01",
+                                 only_use_cftime_datetimes=False)
+
+for m in range(np.size(colocated_aeolus)):
+
+    caliop_filename = caliop_index.granule_name[index_caliop[first_pair[m]]]
+
+    saving_file = save_colocation_footprint(database_dir, sca_time_obs_datetime[m],
+                                            sca_lat_obs_array[colocated_aeolus[m]],
+                                            sca_lon_obs_array[colocated_aeolus[m]],
+                                            caliop_filename)
+
+    logging.info('----------> Colocation profiles found, saved in %s with %s' % (saving_file, caliop_filename))
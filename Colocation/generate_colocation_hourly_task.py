@@ -9,9 +9,9 @@ import sys
 sys.path.append('../')
 
 from Caliop.caliop import Caliop_hdf_reader
+from getColocationData.get_colocation import find_colocated_footprints
+from getColocationData.get_aeolus import match_sca_to_observations, aeolus_time_to_datetime, datetime_to_aeolus_time
 from datetime import datetime, timedelta
-from netCDF4 import num2date
-import geopy.distance
 import netCDF4 as nc
 import numpy as np
 import pathlib
@@ -69,52 +69,35 @@ aeolus_dir = Aeolus_JASMIN_dir + '%s-%s/%s-%s-%s.nc'%(search_year, search_month,
 dataset_nc = nc.Dataset(aeolus_dir)
 
 L1B_start_time_obs = dataset_nc['observations']['L1B_start_time_obs'][:]
-L1B_start_time_obs = [int(i) for i in L1B_start_time_obs]
 
 latitude_of_DEM_intersection_obs = dataset_nc['observations']['latitude_of_DEM_intersection_obs'][:]
 longitude_of_DEM_intersection_obs = dataset_nc['observations']['longitude_of_DEM_intersection_obs'][:]
 
 sca_time_obs = dataset_nc['sca']['SCA_time_obs'][:]
-sca_time_obs = [int(i) for i in sca_time_obs]
 
-sca_time_obs_datetime = num2date(sca_time_obs, units="s since 2000-01-01", only_use_cftime_datetimes=False)
-L1B_start_time_obs_datetime = num2date(L1B_start_time_obs, units="s since 2000-01-01", only_use_cftime_datetimes=False)
+# SCA profiles with a corresponding observation, inside the search period
+(sca_index, obs_index) = match_sca_to_observations(sca_time_obs, L1B_start_time_obs)
+sca_time_obs_seconds = np.ma.getdata(sca_time_obs).astype(np.int64)[sca_index]
+search_mask = (sca_time_obs_seconds > datetime_to_aeolus_time(search_date_start_datetime)) & \
+              (sca_time_obs_seconds < datetime_to_aeolus_time(search_date_end_datetime))
 
-sca_time_obs_list = []
-sca_lat_obs_list = []
-sca_lon_obs_list = []
+sca_time_obs_array = aeolus_time_to_datetime(sca_time_obs_seconds[search_mask])
+sca_lat_obs_array = np.asarray(latitude_of_DEM_intersection_obs[obs_index[search_mask]])
+sca_lon_obs_array = np.asarray(longitude_of_DEM_intersection_obs[obs_index[search_mask]])
 
-for i in range(len(sca_time_obs_datetime)):
-    if (sca_time_obs_datetime[i] in L1B_start_time_obs_datetime) & \
-            (sca_time_obs_datetime[i] > search_date_start_datetime) & \
-            (sca_time_obs_datetime[i] < search_date_end_datetime):
-        sca_time_obs_list.append(sca_time_obs_datetime[i])
-        sca_lat_obs_list.append(
-            latitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
-        sca_lon_obs_list.append(
-            longitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
+# day of each Aeolus profile, the CALIOP granules of the previous, same and following days are searched
+sca_time_obs_datetime64 = sca_time_obs_array.astype('datetime64[s]')
+sca_date_obs_datetime64 = sca_time_obs_datetime64.astype('datetime64[D]')
 
-sca_time_obs_array = np.asarray(sca_time_obs_list)
-sca_lat_obs_array = np.asarray(sca_lat_obs_list)
-sca_lon_obs_array = np.asarray(sca_lon_obs_list)
+# name of the last colocated CALIOP granule for each Aeolus profile
+colocation_caliop_file = {}
 
-for m in range(np.size(sca_time_obs_array)):
-
-    year_m = '{:04d}'.format(sca_time_obs_array[m].year)
-    month_m = '{:02d}'.format(sca_time_obs_array[m].month)
-    day_m = '{:02d}'.format(sca_time_obs_array[m].day)
-    hour_m = '{:02d}'.format(sca_time_obs_array[m].hour)
-    minute_m = '{:02d}'.format(sca_time_obs_array[m].minute)
-    second_m = '{:02d}'.format(sca_time_obs_array[m].second)
+if np.size(sca_time_obs_array) > 0:
 
-    logging.info(
-        '----------> Search colocated CALIOP profiles based on Aeolus location: (%.2f, %.2f) at %s-%s-%s %s:%s:%s'
-        % (sca_lat_obs_array[m], sca_lon_obs_array[m], year_m, month_m, day_m, hour_m, minute_m,
-           second_m))
+    caliop_interval_start = datetime.combine(sca_time_obs_array.min().date(), datetime.min.time()) - timedelta(days=1)
+    caliop_interval_end = datetime.combine(sca_time_obs_array.max().date(), datetime.min.time()) + timedelta(days=1)
 
-    caliop_interval_start = sca_time_obs_array[m] - timedelta(days=1)
-
-    while caliop_interval_start <= sca_time_obs_array[m] + timedelta(days=1):
+    while caliop_interval_start <= caliop_interval_end:
 
         caliop_fetch_dir = CALIOP_JASMIN_dir + '%s/%s_%s_%s/' % (
             caliop_interval_start.year,
@@ -122,43 +105,69 @@ for m in range(np.size(sca_time_obs_array)):
             '{:02d}'.format(caliop_interval_start.month),
             '{:02d}'.format(caliop_interval_start.day))
 
+        # Aeolus profiles whose search window contains this CALIOP day
+        fetch_date_mask = np.abs(sca_date_obs_datetime64 - np.datetime64(caliop_interval_start.date())) <= \
+                          np.timedelta64(1, 'D')
+
         for file in os.listdir(caliop_fetch_dir):
 
             if file.endswith('hdf'):
 
                 caliop_file_datetime = datetime.strptime(file[-25:-6], '%Y-%m-%dT%H-%M-%S')
 
-                if caliop_file_datetime - sca_time_obs_array[m] < timedelta(hours=24):
+                search_mask = fetch_date_mask & \
+                              (np.datetime64(caliop_file_datetime) - sca_time_obs_datetime64 < np.timedelta64(24, 'h'))
 
+                if np.sum(search_mask) > 0:
+
+                    # read the CALIOP geolocation once and test all Aeolus profiles of this task at once
                     caliop_request = Caliop_hdf_reader()
                     caliop_interval_latitude = caliop_request._get_latitude(caliop_fetch_dir + file)
                     caliop_interval_longitude = caliop_request._get_longitude(caliop_fetch_dir + file)
 
-                    aeolus_caliop_distance = [geopy.distance.geodesic((
-                        sca_lat_obs_array[m], sca_lon_obs_array[m]),
-                        (caliop_interval_latitude[k], caliop_interval_longitude[k])).km
-                                              for k in range(len(caliop_interval_latitude))]
-                    aeolus_caliop_distance = np.asarray(aeolus_caliop_distance)
-
-                    if len(aeolus_caliop_distance[aeolus_caliop_distance < spatial_threshold]) >= 1:
-                        logging.info(
-                            '----------> Colocation profiles found ......')
-                        logging.info(
-                            '----------> Saving AEOLUS and CALIOP colocation information ......')
-
-                        saving_dir = database_dir + '/%s/%s-%s-%s' % (year_m, year_m, month_m, day_m)
-                        try:
-                            os.stat(saving_dir)
-                        except:
-                            pathlib.Path(saving_dir).mkdir(parents=True, exist_ok=True)
-
-                        with open(saving_dir + '/AEOLUS-%s%s%sT%s%s%s.csv' %
-                                  (year_m, month_m, day_m,
-                                   hour_m, minute_m, second_m), "w") as output:
-
-                            writer = csv.writer(output, lineterminator='\n')
-                            writer.writerow(('AEOLUS_latitude', 'AEOLUS_longitude', 'CALIOP_filename'))
-                            writer.writerow(
-                                (sca_lat_obs_array[m], sca_lon_obs_array[m], file))
+                    search_index = np.where(search_mask)[0]
+                    (index_aeolus, _, _) = find_colocated_footprints(sca_lat_obs_array[search_index],
+                                                                     sca_lon_obs_array[search_index],
+                                                                     caliop_interval_latitude,
+                                                                     caliop_interval_longitude,
+                                                                     spatial_threshold=spatial_threshold)
+
+                    for m in search_index[np.unique(index_aeolus)]:
+                        colocation_caliop_file[m] = file
 
         caliop_interval_start += timedelta(days=1)
+
+for m in range(np.size(sca_time_obs_array)):
+
+    year_m = '{:04d}'.format(sca_time_obs_array[m].year)
+    month_m = '{:02d}'.format(sca_time_obs_array[m].month)
+    day_m = '{:02d}'.format(sca_time_obs_array[m].day)
+    hour_m = '{:02d}'.format(sca_time_obs_array[m].hour)
+    minute_m = '{:02d}'.format(sca_time_obs_array[m].minute)
+    second_m = '{:02d}'.format(sca_time_obs_array[m].second)
+
+    logging.info(
+        '----------> Search colocated CALIOP profiles based on Aeolus location: (%.2f, %.2f) at %s-%s-%s %s:%s:%s'
+        % (sca_lat_obs_array[m], sca_lon_obs_array[m], year_m, month_m, day_m, hour_m, minute_m,
+           second_m))
+
+    if m in colocation_caliop_file:
+        logging.info(
+            '----------> Colocation profiles found ......')
+        logging.info(
+            '----------> Saving AEOLUS and CALIOP colocation information ......')
+
+        saving_dir = database_dir + '/%s/%s-%s-%s' % (year_m, year_m, month_m, day_m)
+        try:
+            os.stat(saving_dir)
+        except:
+            pathlib.Path(saving_dir).mkdir(parents=True, exist_ok=True)
+
+        with open(saving_dir + '/AEOLUS-%s%s%sT%s%s%s.csv' %
+                  (year_m, month_m, day_m,
+                   hour_m, minute_m, second_m), "w") as output:
+
+            writer = csv.writer(output, lineterminator='\n')
+            writer.writerow(('AEOLUS_latitude', 'AEOLUS_longitude', 'CALIOP_filename'))
+            writer.writerow(
+                (sca_lat_obs_array[m], sca_lon_obs_array[m], colocation_caliop_file[m]))
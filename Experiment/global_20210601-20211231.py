@@ -5,18 +5,18 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        06/02/2023 17:49
 
-from datetime import datetime, timedelta
+from datetime import datetime
 import matplotlib.pyplot as plt
 from matplotlib import colors
-from scipy.stats import kde
 import numpy as np
 import pathlib
-import csv
 import sys
 import os
 
 sys.path.append('../')
-from readColocationData.readColocationNetCDF import *
+from readColocationData.aggregateColocationStatistics import *
+from getPlots.getDensity2D import *
+from Aeolus.aeolus_qc import get_qc_bit
 
 """
 This code uses all pre-calculated colocation files to do the retrieval analysis and comparison.
@@ -76,108 +76,26 @@ colocationData_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/
 start_date_datetime = datetime.strptime(start_date, '%Y-%m-%d')
 end_date_datetime = datetime.strptime(end_date, '%Y-%m-%d')
 
-# Set up time delta
-time_delta = timedelta(days = 1)
+# per-bin statistics of all the colocation files over a process pool, cached per day: a new run only
+# processes the new or modified days
+colocation_statistics = aggregateColocationStatistics(colocationData_dir, start_date_datetime, end_date_datetime,
+                                                      cache_dir=output_dir + '/cache', tem_dis_max=temporal_wd)
 
-if os.path.exists(output_dir + '/%s.csv' % script_base):
+# only the bins with positive backscatter from both instruments are compared
+positive_mask = (colocation_statistics['beta_aeolus'] > 0) & (colocation_statistics['beta_caliop'] > 0)
+colocation_statistics = {key: colocation_statistics[key][positive_mask] for key in colocation_statistics}
+saveColocationStatistics(output_dir + '/%s.npz' % script_base, colocation_statistics)
 
-    print("Colocated profiles are already extracted in %s.csv" %script_base)
-
-    beta_caliop_all = []
-    beta_aeolus_all = []
-    ber_aeolus_all = []
-    qc_aeolus_all = []
-    alt_top_all = []
-
-    with open(output_dir + '/%s.csv' % script_base, newline='') as csvfile:
-
-        reader = csv.reader(csvfile)
-        index = 0
-        for row in reader:
-            if index > 0:
-                beta_caliop_all.append(float(row[1]))
-                beta_aeolus_all.append(float(row[2]))
-                qc_aeolus_all.append(row[5])
-                ber_aeolus_all.append(float(row[6]))
-                alt_top_all.append(float(row[4]))
-            index = index + 1
-
-    beta_aeolus_all = np.asarray(beta_aeolus_all)
-    beta_caliop_all = np.asarray(beta_caliop_all)
-    qc_aeolus_all = np.asarray(qc_aeolus_all)
-    ber_aeolus_all = np.asarray(ber_aeolus_all)
-    alt_top_all = np.asarray(alt_top_all)
-
-else:
-
-    beta_aeolus_all = []
-    beta_caliop_all = []
-    alt_bottom_all = []
-    alt_top_all = []
-    time_str_all = []
-    qc_aeolus_all = []
-    ber_aeolus_all = []
-    lod_aeolus_all = []
-
-    # Iterate through date range
-    while start_date_datetime <= end_date_datetime:
-
-        year_i = '{:04d}'.format(start_date_datetime.year)
-        month_i = '{:02d}'.format(start_date_datetime.month)
-        day_i = '{:02d}'.format(start_date_datetime.day)
-
-        # locate the daily colocation observation parameter from satellite data
-        colocationData_daily_dir = os.path.join(colocationData_dir, year_i, f"{year_i}-{month_i}-{day_i}")
-
-        if os.path.isdir(colocationData_daily_dir):
-            for file in os.listdir(colocationData_daily_dir):
-                if file.endswith('.nc'):
-
-                    try:
-                        print('Processing file %s......'%file)
-                        (beta_aeolus_i, beta_caliop_i, alt_bottom_i, alt_top_i, time_str_i, qc_i, ber_i,
-                         lod_i) = extractColocationParameters(colocationData_daily_dir + '/' + file)
-
-                        beta_aeolus_all.extend(beta_aeolus_i)
-                        beta_caliop_all.extend(beta_caliop_i)
-                        alt_bottom_all.extend(alt_bottom_i)
-                        alt_top_all.extend(alt_top_i)
-                        time_str_all.extend(time_str_i)
-                        qc_aeolus_all.extend(qc_i)
-                        ber_aeolus_all.extend(ber_i)
-                        lod_aeolus_all.extend(lod_i)
-                    except:
-                        continue
-
-        else:
-            print('No colocation for %s-%s-%s'%(year_i, month_i, day_i))
-
-        start_date_datetime = start_date_datetime + time_delta
-
-    beta_aeolus_all = np.asarray(beta_aeolus_all)
-    beta_caliop_all = np.asarray(beta_caliop_all)
-
-    with open(output_dir + '/%s.csv' % script_base, "w") as output:
-        writer = csv.writer(output, lineterminator='\n')
-        writer.writerow(('Colocation_Datetime', 'Aeolus_beta', 'Caliop_beta', 'alt_bottom', 'alt_top', 'Aeolus_QC', 'Aeolus_BER', 'Aeolus_LOD'))
-
-        for j in range(np.size(beta_aeolus_all)):
-
-            try:
-                if (float(beta_aeolus_all[j]) > 0) & (float(beta_caliop_all[j]) >0):
-                    writer.writerow((time_str_all[j], float(beta_aeolus_all[j]), float(beta_caliop_all[j]),
-                                     alt_bottom_all[j], alt_top_all[j], qc_aeolus_all[j],
-                                     ber_aeolus_all[j], lod_aeolus_all[j]))
-            except:
-                continue
+beta_aeolus_all = colocation_statistics['beta_aeolus']
+beta_caliop_all = colocation_statistics['beta_caliop']
+qc_aeolus_all = colocation_statistics['qc_aeolus']
+ber_aeolus_all = colocation_statistics['ber_aeolus']
+alt_top_all = colocation_statistics['alt_top']
 
 ################################################################################
-# remove aeolus with low SNR
-qc_aeolus_all = [0 if element =='--' else element for element in qc_aeolus_all]
-qc_aeolus_all = np.array(qc_aeolus_all, dtype=np.uint8)
-qc_aeolus_flag = np.unpackbits(qc_aeolus_all).reshape([np.size(qc_aeolus_all), 8])
-
-beta_aeolus_SNR_filtered = [np.nan if qc_aeolus_flag[q][1] == 0 else beta_aeolus_all[q] for q in range(np.size(qc_aeolus_all))]
+# remove aeolus with low SNR: bit 6 of the QC flags (index 1 of the former most significant bit first
+# np.unpackbits), masked QC flags are invalid
+beta_aeolus_SNR_filtered = np.where(get_qc_bit(qc_aeolus_all, 6), beta_aeolus_all, np.nan)
 beta_aeolus_SNR_cloud_filtered = np.copy(beta_aeolus_SNR_filtered)
 beta_aeolus_SNR_cloud_filtered[ber_aeolus_all < BER_threshold] = np.nan
 beta_aeolus_SNR_cloud_filtered = np.asarray(beta_aeolus_SNR_cloud_filtered)
@@ -264,9 +182,8 @@ for i in range(2):
 
             if Colocation_number > 0:
 
-                k = kde.gaussian_kde([x, y])
-                xi, yi = np.mgrid[x.min():x.max():nbins * 1j, y.min():y.max():nbins * 1j]
-                zi = k(np.vstack([xi.flatten(), yi.flatten()]))
+                # binned FFT kernel density, gaussian_kde on the nbins x nbins grid takes hours for 1e5 pairs
+                xi, yi, zi = getBinnedKDE2D(x, y, nbins=nbins)
 
                 ax[i, j].pcolormesh(xi, yi, zi.reshape(xi.shape), shading='auto', cmap='RdYlBu_r')
                 # ax[i, j].scatter(x, y)
@@ -6,18 +6,17 @@
 # @Time:        06/02/2023 12:21
 
 # Import external libraries
-from datetime import datetime, timedelta
+from datetime import datetime
 from scipy.stats import gaussian_kde
 import matplotlib.pyplot as plt
 from matplotlib import colors
 import numpy as np
 import logging
-import csv
 import sys
 import os
 
 sys.path.append('../')
-from readColocationData.readColocationNetCDF import *
+from readColocationData.aggregateColocationStatistics import *
 
 """
 This code uses all pre-calculated colocation files to do the retrieval analysis and comparison.
@@ -56,71 +55,18 @@ colocationData_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/
 start_date_datetime = datetime.strptime(start_date, '%Y-%m-%d')
 end_date_datetime = datetime.strptime(end_date, '%Y-%m-%d')
 
-# Set up time delta
-time_delta = timedelta(days = 1)
+# per-bin statistics of all the colocation files over a process pool, cached per day: a new run only
+# processes the new or modified days
+colocation_statistics = aggregateColocationStatistics(colocationData_dir, start_date_datetime, end_date_datetime,
+                                                      cache_dir='./%s_cache' % script_base, tem_dis_max=temporal_wd)
 
-beta_aeolus_all = []
-beta_caliop_all = []
+# only the bins with positive backscatter from both instruments are compared
+positive_mask = (colocation_statistics['beta_aeolus'] > 0) & (colocation_statistics['beta_caliop'] > 0)
+colocation_statistics = {key: colocation_statistics[key][positive_mask] for key in colocation_statistics}
+saveColocationStatistics('./%s.npz' % script_base, colocation_statistics)
 
-alt_bottom_all = []
-alt_top_all = []
-
-time_str_all = []
-
-qc_aeolus_all = []
-ber_aeolus_all = []
-lod_aeolus_all = []
-
-# Iterate through date range
-while start_date_datetime <= end_date_datetime:
-
-    year_i = '{:04d}'.format(start_date_datetime.year)
-    month_i = '{:02d}'.format(start_date_datetime.month)
-    day_i = '{:02d}'.format(start_date_datetime.day)
-
-    # locate the daily colocation observation parameter from satellite data
-    colocationData_daily_dir = os.path.join(colocationData_dir, year_i, f"{year_i}-{month_i}-{day_i}")
-
-    if os.path.isdir(colocationData_daily_dir):
-        for file in os.listdir(colocationData_daily_dir):
-            if file.endswith('.nc'):
-                print(file)
-
-                try:
-                    (beta_aeolus_i, beta_caliop_i, alt_bottom_i, alt_top_i, time_str_i, qc_i, ber_i,
-                     lod_i) = extractColocationParameters(colocationData_daily_dir + '/' + file)
-
-                    beta_aeolus_all.extend(beta_aeolus_i)
-                    beta_caliop_all.extend(beta_caliop_i)
-                    alt_bottom_all.extend(alt_bottom_i)
-                    alt_top_all.extend(alt_top_i)
-                    time_str_all.extend(time_str_i)
-                    qc_aeolus_all.extend(qc_i)
-                    ber_aeolus_all.extend(ber_i)
-                    lod_aeolus_all.extend(lod_i)
-                except:
-                    continue
-
-    else:
-        print('No colocation for %s-%s-%s'%(year_i, month_i, day_i))
-
-    start_date_datetime = start_date_datetime + time_delta
-
-beta_aeolus_all = np.asarray(beta_aeolus_all)
-beta_caliop_all = np.asarray(beta_caliop_all)
-
-with open('./%s.csv' % script_base, "w") as output:
-    writer = csv.writer(output, lineterminator='\n')
-    writer.writerow(('Colocation_Datetime', 'Aeolus_beta', 'Caliop_beta', 'alt_bottom', 'alt_top', 'Aeolus_QC', 'Aeolus_BER', 'Aeolus_LOD'))
-
-    for j in range(np.size(beta_aeolus_all)):
-        try:
-            if (float(beta_aeolus_all[j]) > 0) & (float(beta_caliop_all[j]) > 0):
-                writer.writerow((time_str_all[j], float(beta_aeolus_all[j]), float(beta_caliop_all[j]),
-                                 alt_bottom_all[j], alt_top_all[j], qc_aeolus_all[j],
-                                 ber_aeolus_all[j], lod_aeolus_all[j]))
-        except:
-            continue
+beta_aeolus_all = colocation_statistics['beta_aeolus']
+beta_caliop_all = colocation_statistics['beta_caliop']
 
 # beta_caliop_all = []
 # beta_aeolus_all = []
@@ -9,8 +9,8 @@ import sys
 sys.path.append('../')
 
 from Caliop.caliop import Caliop_hdf_reader
+from getColocationData.get_aeolus import match_sca_to_observations, aeolus_time_to_datetime
 from datetime import datetime, timedelta
-from netCDF4 import num2date
 import geopy.distance
 import netCDF4 as nc
 import numpy as np
@@ -46,41 +46,23 @@ aeolus_dir = Aeolus_JASMIN_dir + '%s-%s/%s-%s-%s.nc'%(search_year, search_month,
 dataset_nc = nc.Dataset(aeolus_dir)
 
 L1B_start_time_obs = dataset_nc['observations']['L1B_start_time_obs'][:]
-L1B_start_time_obs = [int(i) for i in L1B_start_time_obs]
 
 latitude_of_DEM_intersection_obs = dataset_nc['observations']['latitude_of_DEM_intersection_obs'][:]
 longitude_of_DEM_intersection_obs = dataset_nc['observations']['longitude_of_DEM_intersection_obs'][:]
 
 sca_time_obs = dataset_nc['sca']['SCA_time_obs'][:]
-sca_time_obs = [int(i) for i in sca_time_obs]
 
 sca_middle_bin_backscatter = dataset_nc['sca']['SCA_middle_bin_backscatter'][:]
 sca_middle_bin_extinction = dataset_nc['sca']['SCA_middle_bin_extinction'][:]
 
-sca_time_obs_datetime = num2date(sca_time_obs, units="s since 2000-01-01", only_use_cftime_datetimes=False)
-L1B_start_time_obs_datetime = num2date(L1B_start_time_obs, units="s since 2000-01-01", only_use_cftime_datetimes=False)
-
-sca_time_obs_list = []
-sca_lat_obs_list = []
-sca_lon_obs_list = []
-sca_middle_bin_backscatter_list = []
-sca_middle_bin_extinction_list = []
-
-for i in range(len(sca_time_obs_datetime)):
-    if sca_time_obs_datetime[i] in L1B_start_time_obs_datetime:
-        sca_time_obs_list.append(sca_time_obs_datetime[i])
-        sca_lat_obs_list.append(
-            latitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
-        sca_lon_obs_list.append(
-            longitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
-        sca_middle_bin_backscatter_list.append(sca_middle_bin_backscatter[i, :].filled())
-        sca_middle_bin_extinction_list.append(sca_middle_bin_extinction[i, :].filled())
-
-sca_time_obs_array = np.asarray(sca_time_obs_list)
-sca_lat_obs_array = np.asarray(sca_lat_obs_list)
-sca_lon_obs_array = np.asarray(sca_lon_obs_list)
-sca_middle_bin_backscatter_array = np.asarray(sca_middle_bin_backscatter_list)
-sca_middle_bin_extinction_array = np.asarray(sca_middle_bin_extinction_list)
+# SCA profiles with a corresponding observation
+(sca_index, obs_index) = match_sca_to_observations(sca_time_obs, L1B_start_time_obs)
+
+sca_time_obs_array = aeolus_time_to_datetime(np.ma.getdata(sca_time_obs)[sca_index])
+sca_lat_obs_array = np.asarray(latitude_of_DEM_intersection_obs[obs_index])
+sca_lon_obs_array = np.asarray(longitude_of_DEM_intersection_obs[obs_index])
+sca_middle_bin_backscatter_array = sca_middle_bin_backscatter[sca_index, :].filled()
+sca_middle_bin_extinction_array = sca_middle_bin_extinction[sca_index, :].filled()
 
 for m in range(np.size(sca_time_obs_array)):
 
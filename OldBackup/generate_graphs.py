@@ -10,12 +10,12 @@ import sys
 sys.path.append('../')
 
 from Caliop.caliop import Caliop_hdf_reader
+from getColocationData.get_aeolus import match_sca_to_observations, aeolus_time_to_datetime
 from mpl_toolkits.basemap import Basemap
 from datetime import datetime, timedelta
 from matplotlib.gridspec import GridSpec
 from netCDF4 import Dataset, date2num
 import matplotlib.pyplot as plt
-from netCDF4 import num2date
 from osgeo import gdal
 import netCDF4 as nc
 import numpy as np
@@ -32,42 +32,23 @@ def plot_footprint_map(aeolus_colocation_file, caliop_colocation_file,
     dataset_nc = nc.Dataset(aeolus_colocation_file)
 
     L1B_start_time_obs = dataset_nc['observations']['L1B_start_time_obs'][:]
-    L1B_start_time_obs = [int(i) for i in L1B_start_time_obs]
 
     latitude_of_DEM_intersection_obs = dataset_nc['observations']['latitude_of_DEM_intersection_obs'][:]
     longitude_of_DEM_intersection_obs = dataset_nc['observations']['longitude_of_DEM_intersection_obs'][:]
 
     sca_time_obs = dataset_nc['sca']['sca_time_obs'][:]
-    sca_time_obs = [int(i) for i in sca_time_obs]
 
     sca_middle_bin_backscatter = dataset_nc['sca']['sca_middle_bin_backscatter'][:]
     sca_middle_bin_extinction = dataset_nc['sca']['sca_middle_bin_extinction'][:]
 
-    sca_time_obs_datetime = num2date(sca_time_obs, units="s since 2000-01-01", only_use_cftime_datetimes=False)
-    L1B_start_time_obs_datetime = num2date(L1B_start_time_obs, units="s since 2000-01-01",
-                                           only_use_cftime_datetimes=False)
-
-    sca_time_obs_list = []
-    sca_lat_obs_list = []
-    sca_lon_obs_list = []
-    sca_middle_bin_backscatter_list = []
-    sca_middle_bin_extinction_list = []
-
-    for i in range(len(sca_time_obs_datetime)):
-        if sca_time_obs_datetime[i] in L1B_start_time_obs_datetime:
-            sca_time_obs_list.append(sca_time_obs_datetime[i])
-            sca_lat_obs_list.append(
-                latitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
-            sca_lon_obs_list.append(
-                longitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
-            sca_middle_bin_backscatter_list.append(sca_middle_bin_backscatter[i, :].filled())
-            sca_middle_bin_extinction_list.append(sca_middle_bin_extinction[i, :].filled())
-
-    sca_time_obs_array = np.asarray(sca_time_obs_list)
-    sca_lat_obs_array = np.asarray(sca_lat_obs_list)
-    sca_lon_obs_array = np.asarray(sca_lon_obs_list)
-    sca_middle_bin_backscatter_array = np.asarray(sca_middle_bin_backscatter_list)
-    sca_middle_bin_extinction_array = np.asarray(sca_middle_bin_extinction_list)
+    # SCA profiles with a corresponding observation
+    (sca_index, obs_index) = match_sca_to_observations(sca_time_obs, L1B_start_time_obs)
+
+    sca_time_obs_array = aeolus_time_to_datetime(np.ma.getdata(sca_time_obs)[sca_index])
+    sca_lat_obs_array = np.asarray(latitude_of_DEM_intersection_obs[obs_index])
+    sca_lon_obs_array = np.asarray(longitude_of_DEM_intersection_obs[obs_index])
+    sca_middle_bin_backscatter_array = sca_middle_bin_backscatter[sca_index, :].filled()
+    sca_middle_bin_extinction_array = sca_middle_bin_extinction[sca_index, :].filled()
 
     sca_lon_obs_array[sca_lon_obs_array > 180.] = sca_lon_obs_array[sca_lon_obs_array > 180.] - 360.
     index = np.where(sca_time_obs_array == colocation_datetime)[0][0]
@@ -292,7 +273,6 @@ def plot_map2d_aeolus(aeolus_colocation_file, colocation_datetime):
     dataset_nc = nc.Dataset(aeolus_colocation_file)
 
     L1B_start_time_obs = dataset_nc['observations']['L1B_start_time_obs'][:]
-    L1B_start_time_obs = [int(i) for i in L1B_start_time_obs]
 
     latitude_of_DEM_intersection_obs = dataset_nc['observations']['latitude_of_DEM_intersection_obs'][:]
     longitude_of_DEM_intersection_obs = dataset_nc['observations']['longitude_of_DEM_intersection_obs'][:]
@@ -300,40 +280,20 @@ def plot_map2d_aeolus(aeolus_colocation_file, colocation_datetime):
 
 
     sca_time_obs = dataset_nc['sca']['sca_time_obs'][:]
-    sca_time_obs = [int(i) for i in sca_time_obs]
 
     sca_middle_bin_backscatter = dataset_nc['sca']['sca_middle_bin_backscatter'][:]
     sca_middle_bin_extinction = dataset_nc['sca']['sca_middle_bin_extinction'][:]
     sca_middle_bin_altitude_obs = dataset_nc['sca']['sca_middle_bin_altitude_obs'][:]
 
-    sca_time_obs_datetime = num2date(sca_time_obs, units="s since 2000-01-01", only_use_cftime_datetimes=False)
-    L1B_start_time_obs_datetime = num2date(L1B_start_time_obs, units="s since 2000-01-01",
-                                           only_use_cftime_datetimes=False)
-
-    sca_time_obs_list = []
-    sca_lat_obs_list = []
-    sca_lon_obs_list = []
-    sca_middle_bin_backscatter_list = []
-    sca_middle_bin_extinction_list = []
-    sca_middle_bin_altitude_obs_list = []
-
-    for i in range(len(sca_time_obs_datetime)):
-        if sca_time_obs_datetime[i] in L1B_start_time_obs_datetime:
-            sca_time_obs_list.append(sca_time_obs_datetime[i])
-            sca_lat_obs_list.append(
-                latitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
-            sca_lon_obs_list.append(
-                longitude_of_DEM_intersection_obs[L1B_start_time_obs_datetime == sca_time_obs_datetime[i]][0])
-            sca_middle_bin_backscatter_list.append(sca_middle_bin_backscatter[i, :].filled())
-            sca_middle_bin_extinction_list.append(sca_middle_bin_extinction[i, :].filled())
-            sca_middle_bin_altitude_obs_list.append(sca_middle_bin_altitude_obs[i, :])
-
-    sca_time_obs_array = np.asarray(sca_time_obs_list)
-    sca_lat_obs_array = np.asarray(sca_lat_obs_list)
-    sca_lon_obs_array = np.asarray(sca_lon_obs_list)
-    sca_middle_bin_backscatter_array = np.asarray(sca_middle_bin_backscatter_list)
-    sca_middle_bin_extinction_array = np.asarray(sca_middle_bin_extinction_list)
-    sca_middle_bin_altitude_obs_list = np.asarray(sca_middle_bin_altitude_obs_list)
+    # SCA profiles with a corresponding observation
+    (sca_index, obs_index) = match_sca_to_observations(sca_time_obs, L1B_start_time_obs)
+
+    sca_time_obs_array = aeolus_time_to_datetime(np.ma.getdata(sca_time_obs)[sca_index])
+    sca_lat_obs_array = np.asarray(latitude_of_DEM_intersection_obs[obs_index])
+    sca_lon_obs_array = np.asarray(longitude_of_DEM_intersection_obs[obs_index])
+    sca_middle_bin_backscatter_array = sca_middle_bin_backscatter[sca_index, :].filled()
+    sca_middle_bin_extinction_array = sca_middle_bin_extinction[sca_index, :].filled()
+    sca_middle_bin_altitude_obs_list = np.asarray(sca_middle_bin_altitude_obs[sca_index, :])
 
     sca_lon_obs_array[sca_lon_obs_array > 180.] = sca_lon_obs_array[sca_lon_obs_array > 180.] - 360.
     index = np.where(sca_time_obs_array == colocation_datetime)[0][0]
@@ -9,7 +9,6 @@ import os
 import sys
 import logging
 import datetime
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
@@ -19,6 +18,7 @@ from matplotlib.gridspec import GridSpec
 import matplotlib as mpl
 sys.path.append('../../../')
 from getColocationData.get_caliop import *
+from Caliop.SOVCC.ash_csv_loader import load_csv_files, FILTERED_TIME_FORMAT
 
 # Constants
 LOG_EXT = ".log"
@@ -89,23 +89,9 @@ def main():
     if not os.path.exists(FIGURE_SAVE_LOCATION):
         os.mkdir(FIGURE_SAVE_LOCATION)
 
-    files = [file for file in os.listdir(VARIABLE_FILE_LOCATION) if file.endswith('.csv')]
-
-    # Initiate empty DataFrame to store all data
-    all_data = pd.DataFrame(columns=['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'])  # add ash_height column
-
-    for file in files:
-        data = pd.read_csv(VARIABLE_FILE_LOCATION + '/' + file)
-        print(f"Processing file {file}")
-
-        for column in ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']:  # include 'extinction'
-            if column == 'utc_time':
-                # Convert utc_time to datetime format
-                data[column] = pd.to_datetime(data[column], format='%Y-%m-%d %H:%M:%S')
-            else:
-                data[column] = pd.to_numeric(data[column], errors='coerce')
-
-        all_data = all_data.append(data[['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']], ignore_index=True)  # include 'extinction' and 'AOD'
+    # Read all the csv files at once, cached for the next runs
+    all_data = load_csv_files(VARIABLE_FILE_LOCATION, ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'],
+                              time_format=FILTERED_TIME_FORMAT)
 
     # Remove rows with any NaN values
     all_data = all_data.dropna()
@@ -9,7 +9,6 @@ import os
 import sys
 import logging
 import datetime
-import pandas as pd
 import numpy as np
 import argparse
 import matplotlib.pyplot as plt
@@ -22,6 +21,7 @@ import matplotlib as mpl
 # Append the custom path to system path
 sys.path.append('../../../')
 from getColocationData.get_caliop import *
+from Caliop.SOVCC.ash_csv_loader import load_csv_files, FILTERED_TIME_FORMAT
 
 # Constants
 LOG_EXTENSION = ".log"
@@ -105,25 +105,9 @@ def main():
     if not os.path.exists(FIGURE_OUTPUT_PATH):
         os.mkdir(FIGURE_OUTPUT_PATH)
 
-    # Load all CSV files from the variable data directory
-    csv_files = [f for f in os.listdir(VARIABLE_DATA_PATH) if f.endswith('.csv')]
-
-    # Initialize an empty DataFrame to collect data
-    all_data_df = pd.DataFrame(columns=['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'])
-
-    # Process each CSV file
-    for csv_file in csv_files:
-        file_data = pd.read_csv(os.path.join(VARIABLE_DATA_PATH, csv_file))
-        print(f"Processing file {csv_file}")
-
-        # Parse and convert necessary columns
-        for col_name in ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']:
-            if col_name == 'utc_time':
-                file_data[col_name] = pd.to_datetime(file_data[col_name], format='%Y-%m-%d %H:%M:%S')
-            else:
-                file_data[col_name] = pd.to_numeric(file_data[col_name], errors='coerce')
-
-        all_data_df = all_data_df.append(file_data[['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height']], ignore_index=True)
+    # Load all CSV files from the variable data directory at once, cached for the next runs
+    all_data_df = load_csv_files(VARIABLE_DATA_PATH, ['utc_time', 'thickness', 'latitude', 'longitude', 'ash_height'],
+                                 time_format=FILTERED_TIME_FORMAT)
 
     # Filter out invalid data entries and apply date & latitude filters
     all_data_df = all_data_df.dropna()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    consolidate_colocation_month.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 18:12
+
+"""
+Consolidate the colocation files of whole months into the monthly colocation stores (see save_colocation_store.py).
+
+The saved events are listed from the daily manifests (see get_manifest.py) and the events not yet in the store
+are appended, so that the script can be run again after every production run. With --rebuild the store is
+built again from scratch in a temporary file, e.g. after a new version of COLOCATION_CODE_VERSIONS.
+
+usage: python consolidate_colocation_month.py 2021-06 2021-12
+"""
+
+# Import external libraries
+import os
+import sys
+import argparse
+import logging
+
+# Import internal modules
+sys.path.append('../')
+from getColocationData.process_colocation_event import get_savenc_subdir
+from getColocationData.get_manifest import load_manifest
+from getColocationData.save_colocation_store import get_monthly_store_file, append_colocation_events
+from datetime import datetime, timedelta
+
+# dir of the saved netcdf
+savenc_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/Database_v2'
+
+
+def get_monthly_colocation_files(savenc_dir, month_datetime):
+    """Saved colocation files of a month, listed from the daily manifests"""
+    ncFile_list = []
+
+    date_i = month_datetime
+    while date_i.month == month_datetime.month:
+
+        manifest = load_manifest(get_savenc_subdir(savenc_dir, date_i))
+        ncFile_list.extend([manifest[aeolus_time]['nc_file'] for aeolus_time in sorted(manifest)
+                            if manifest[aeolus_time]['status'] == 'done'])
+
+        date_i += timedelta(days=1)
+
+    return [ncFilename for ncFilename in ncFile_list if os.path.exists(ncFilename)]
+
+
+def consolidate_month(savenc_dir, month_datetime, logger, rebuild=False):
+    """Append the new colocation files of a month to its store, or build it again with rebuild=True"""
+    store_file = get_monthly_store_file(savenc_dir, month_datetime)
+    ncFile_list = get_monthly_colocation_files(savenc_dir, month_datetime)
+
+    if not rebuild:
+        return append_colocation_events(store_file, ncFile_list, logger)
+
+    if os.path.exists(store_file + '.tmp'):
+        os.remove(store_file + '.tmp')
+    n_appended = append_colocation_events(store_file + '.tmp', ncFile_list, logger)
+    if n_appended > 0:
+        os.replace(store_file + '.tmp', store_file)
+
+    return n_appended
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Consolidate the colocation files into monthly stores.")
+    parser.add_argument("start_month", type=str, help="First month in the format YYYY-MM.")
+    parser.add_argument("end_month", type=str, help="Last month in the format YYYY-MM.")
+    parser.add_argument("--rebuild", action='store_true', help="Build the stores again from scratch.")
+    args = parser.parse_args()
+
+    script_base, script_ext = os.path.splitext(sys.modules['__main__'].__file__)
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s',
+                        filemode='w',
+                        filename=script_base + '.log',
+                        level=logging.INFO)
+
+    # Get a logger object
+    logger = logging.getLogger()
+
+    month_datetime = datetime.strptime(args.start_month, '%Y-%m')
+    end_month_datetime = datetime.strptime(args.end_month, '%Y-%m')
+
+    while month_datetime <= end_month_datetime:
+
+        n_appended = consolidate_month(savenc_dir, month_datetime, logger, rebuild=args.rebuild)
+        logger.info('%s: %d events consolidated' % (month_datetime.strftime('%Y-%m'), n_appended))
+
+        month_datetime = (month_datetime + timedelta(days=32)).replace(day=1)
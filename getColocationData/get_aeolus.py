@@ -6,99 +6,197 @@
 # @Time:        08/01/2023 12:52
 
 # import the necessary modules
-from netCDF4 import num2date
+from getColocationData.get_colocation import get_lon_mask
 from netCDF4 import Dataset
 import numpy as np
 import logging
 
-def extract_variables_from_aeolus(nc_file, logger):
-    """Extract relevant variables from the AEOLUS data"""
-
-    # open the netcdf file
+# reference time of the Aeolus time variables
+AEOLUS_TIME_REFERENCE = np.datetime64('2000-01-01T00:00:00', 's')
+
+def aeolus_time_to_datetime(aeolus_time):
+    """Convert Aeolus time (seconds since 2000-01-01) to an array of datetime objects in one vectorized step"""
+    aeolus_time = np.asarray(aeolus_time).astype(np.int64)
+    return (AEOLUS_TIME_REFERENCE + aeolus_time.astype('timedelta64[s]')).astype(object)
+
+def datetime_to_aeolus_time(time):
+    """Convert a datetime to Aeolus time (seconds since 2000-01-01)"""
+    return (np.datetime64(time, 's') - AEOLUS_TIME_REFERENCE).astype(np.int64)
+
+def get_aeolus_profile_range(sca_time, latitude, time_range=None, lat_range=None, longitude=None, lon_range=None):
+    """
+    Find the range of profile indices to be read from the 1-D time and geolocation arrays.
+
+    Parameters:
+        sca_time: numpy array, SCA time, unit -> seconds since 2000-01-01.
+        latitude: numpy array, latitude of the profiles, unit -> degree.
+        time_range: (datetime, datetime) or None, start and end time of the slice.
+        lat_range: (float, float) or None, minimum and maximum latitude of the slice.
+        longitude: numpy array, longitude of the profiles, unit -> degree.
+        lon_range: (float, float) or None, minimum and maximum longitude of the slice.
+
+    Returns:
+        index_start, index_end: int, hyperslab [index_start, index_end) covering the requested slice.
+        profile_mask: numpy array or None, profiles of the hyperslab inside lat_range and lon_range.
+    """
+    index_start = 0
+    index_end = np.size(sca_time)
+
+    if time_range is not None:
+        index_start = int(np.searchsorted(sca_time, datetime_to_aeolus_time(time_range[0]), side='left'))
+        index_end = int(np.searchsorted(sca_time, datetime_to_aeolus_time(time_range[1]), side='right'))
+        index_end = max(index_end, index_start)
+
+    if (lat_range is None) & (lon_range is None):
+        return index_start, index_end, None
+
+    profile_mask = np.ones(index_end - index_start, dtype=bool)
+    if lat_range is not None:
+        latitude = latitude[index_start:index_end]
+        profile_mask &= (latitude > lat_range[0]) & (latitude < lat_range[1])
+    if lon_range is not None:
+        profile_mask &= get_lon_mask(longitude[index_start:index_end], lon_range)
+
+    profile_index = np.where(profile_mask)[0]
+
+    if np.size(profile_index) > 0:
+        # only the span between the first and the last profile inside the bounding box is read
+        profile_mask = profile_mask[profile_index[0]:profile_index[-1] + 1]
+        index_end = index_start + int(profile_index[-1]) + 1
+        index_start = index_start + int(profile_index[0])
+    else:
+        index_end = index_start
+        profile_mask = np.zeros(0, dtype=bool)
+
+    return index_start, index_end, profile_mask
+
+def match_sca_to_observations(sca_time, observation_time):
+    """
+    Pair the SCA profiles with the observations of the same L1B start time, with a sorted search over integer
+    seconds instead of a datetime membership test for every profile.
+
+    Parameters:
+        sca_time: numpy array, SCA time of the profiles, unit -> seconds since 2000-01-01.
+        observation_time: numpy array, L1B start time of the observations, unit -> seconds since 2000-01-01.
+
+    Returns:
+        sca_index: numpy array, indices of the SCA profiles with an observation of the same time.
+        observation_index: numpy array, index of the (first) observation of each of these profiles.
+    """
+    sca_time = np.ma.getdata(sca_time).astype(np.int64)
+    observation_time = np.ma.getdata(observation_time).astype(np.int64)
+
+    if np.size(observation_time) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # the stable sort keeps the first observation of a repeated time first
+    observation_sorter = np.argsort(observation_time, kind='stable')
+    observation_position = np.searchsorted(observation_time, sca_time, sorter=observation_sorter)
+    observation_index = observation_sorter[np.clip(observation_position, 0, np.size(observation_time) - 1)]
+    sca_index = np.nonzero(observation_time[observation_index] == sca_time)[0]
+
+    return sca_index, observation_index[sca_index]
+
+def read_aeolus_time(nc_file):
+    """Read the SCA time of the profiles paired with an observation, unit -> seconds since 2000-01-01"""
     with Dataset(nc_file, 'r') as nc_data:
+        nc_data.set_auto_mask(False)
+        number_profiles = min(nc_data['observations']['latitude_of_DEM_intersection_obs'].shape[0],
+                              nc_data['sca']['SCA_time_obs'].shape[0])
+        sca_observation_time = nc_data['sca']['SCA_time_obs'][:number_profiles].astype(np.int64)
+
+    return sca_observation_time
+
+def extract_variables_from_aeolus(nc_file, logger, time_range=None, lat_range=None, lon_range=None,
+                                  return_ber_lod=False):
+    """
+    Extract relevant variables from the AEOLUS data
 
-        # Extract relevant variables from the AEOLUS data
+    All variables are read in bulk as contiguous numpy arrays straight from the netCDF variables.
+    With time_range, lat_range and/or lon_range only the corresponding slice of profiles is read.
 
-        # L1B_start_time_obs = list(map(int, nc_data['observations']['L1B_start_time_obs'][:]))
-        latitude_of_DEM_intersection_obs = nc_data['observations']['latitude_of_DEM_intersection_obs'][:]
-        longitude_of_DEM_intersection_obs = nc_data['observations']['longitude_of_DEM_intersection_obs'][:]
-        sca_observation_time = list(map(int, nc_data['sca']['SCA_time_obs'][:]))
+    Parameters:
+        nc_file: string, daily Aeolus netCDF file.
+        logger: logging object.
+        time_range: (datetime, datetime) or None, only read the profiles between these times.
+        lat_range: (float, float) or None, only read the profiles between these latitudes.
+        lon_range: (float, float) or None, only read the profiles between these longitudes, in [-180, 180].
+        return_ber_lod: bool, also return the middle bin BER and LOD.
 
-        sca_middle_bin_altitude_obs = nc_data['sca']['SCA_middle_bin_altitude_obs'][:]
-        sca_middle_bin_backscatter = nc_data['sca']['SCA_middle_bin_backscatter'][:]
-        sca_middle_bin_extinction = nc_data['sca']['SCA_middle_bin_extinction'][:]
-        sca_middle_bin_qc = nc_data['sca']['SCA_middle_bin_processing_qc_flag'][:]
-        # sca_middle_bin_ber = nc_data['sca']['SCA_middle_bin_BER'][:]
-        # sca_middle_bin_lod = nc_data['sca']['SCA_middle_bin_LOD'][:]
+    Returns:
+        latitude, longitude, altitude, time, backscatter, extinction, qc (, ber, lod) of the SCA middle bins.
+    """
 
-    # latitude_of_DEM_intersection_obs[1:] = latitude_of_DEM_intersection_obs[0:len(latitude_of_DEM_intersection_obs) - 1]
-    # longitude_of_DEM_intersection_obs[1:] = longitude_of_DEM_intersection_obs[0:len(latitude_of_DEM_intersection_obs) - 1]
+    # open the netcdf file
+    with Dataset(nc_file, 'r') as nc_data:
+
+        # read the raw values, the sentinel values are handled downstream
+        nc_data.set_auto_mask(False)
+
+        # observations and SCA profiles are paired by index
+        number_profiles = min(nc_data['observations']['latitude_of_DEM_intersection_obs'].shape[0],
+                              nc_data['sca']['SCA_time_obs'].shape[0])
+
+        # the 1-D time and latitude arrays are read first to locate the requested slice
+        sca_observation_time = nc_data['sca']['SCA_time_obs'][:number_profiles].astype(np.int64)
+
+        latitude_of_DEM_intersection_obs = None
+        longitude_of_DEM_intersection_obs = None
+        if lat_range is not None:
+            latitude_of_DEM_intersection_obs = nc_data['observations']['latitude_of_DEM_intersection_obs'][:number_profiles]
+        if lon_range is not None:
+            longitude_of_DEM_intersection_obs = nc_data['observations']['longitude_of_DEM_intersection_obs'][:number_profiles]
+            longitude_of_DEM_intersection_obs = np.where(longitude_of_DEM_intersection_obs > 180.,
+                                                         longitude_of_DEM_intersection_obs - 360.,
+                                                         longitude_of_DEM_intersection_obs)
+
+        (index_start, index_end, lat_mask) = get_aeolus_profile_range(sca_observation_time,
+                                                                      latitude_of_DEM_intersection_obs,
+                                                                      time_range=time_range, lat_range=lat_range,
+                                                                      longitude=longitude_of_DEM_intersection_obs,
+                                                                      lon_range=lon_range)
+
+        # Extract relevant variables from the AEOLUS data, only the hyperslab of the requested profiles
+        sca_lat_obs_array = nc_data['observations']['latitude_of_DEM_intersection_obs'][index_start:index_end]
+        sca_lon_obs_array = nc_data['observations']['longitude_of_DEM_intersection_obs'][index_start:index_end]
+        sca_observation_time = sca_observation_time[index_start:index_end]
+
+        sca_alt_obs_array = nc_data['sca']['SCA_middle_bin_altitude_obs'][index_start:index_end, :]
+        sca_middle_bin_backscatter_array = nc_data['sca']['SCA_middle_bin_backscatter'][index_start:index_end, :]
+        sca_middle_bin_extinction_array = nc_data['sca']['SCA_middle_bin_extinction'][index_start:index_end, :]
+        sca_middle_bin_qc_array = nc_data['sca']['SCA_middle_bin_processing_qc_flag'][index_start:index_end, :]
+
+        if return_ber_lod:
+            sca_middle_bin_ber_array = nc_data['sca']['SCA_middle_bin_BER'][index_start:index_end, :]
+            sca_middle_bin_lod_array = nc_data['sca']['SCA_middle_bin_LOD'][index_start:index_end, :]
 
     # Convert time variables to datetime objects
-    sca_observation_time_dt = num2date(sca_observation_time, units="s since 2000-01-01",
-                                       only_use_cftime_datetimes=False)
-    # L1B_start_time_obs_dt = num2date(L1B_start_time_obs, units="s since 2000-01-01",
-    #                                  only_use_cftime_datetimes=False)
-
-    # Initialize lists to store selected AEOLUS data
-    sca_observation_time_list = []
-    sca_lat_obs_list = []
-    sca_lon_obs_list = []
-    sca_alt_obs_list = []
-    sca_middle_bin_backscatter_list = []
-    sca_middle_bin_extinction_list = []
-    sca_middle_bin_qc_list = []
-    sca_middle_bin_ber_list = []
-    sca_middle_bin_lod_list = []
-
-    # Iterate through the AEOLUS data, selecting only data points that have a corresponding L1B_start_time_obs value
-
-    for time, lat, lon, alt, backscatter, extinction, qc, in zip(sca_observation_time_dt, latitude_of_DEM_intersection_obs,
-                                                                          longitude_of_DEM_intersection_obs, sca_middle_bin_altitude_obs,
-                                                                          sca_middle_bin_backscatter, sca_middle_bin_extinction,
-                                                                          sca_middle_bin_qc):
-
-        # if time in L1B_start_time_obs_dt:
-        sca_observation_time_list.append(time)
-        sca_lat_obs_list.append(lat)
-        sca_lon_obs_list.append(lon)
-        sca_alt_obs_list.append(alt)
-        sca_middle_bin_backscatter_list.append(backscatter)
-        sca_middle_bin_extinction_list.append(extinction)
-        sca_middle_bin_qc_list.append(qc)
-        # sca_middle_bin_ber_list.append(ber)
-        # sca_middle_bin_lod_list.append(lod)
-        print(time)
-        print(lat)
-        print(extinction)
-
-            # if lat == 11.794943:
-            #     print(lat)
-            #     print(lon)
-            #     print(backscatter)
-            #     quit()
-
-    sca_observation_time_array = np.asarray(sca_observation_time_list)
-    sca_lat_obs_array = np.asarray(sca_lat_obs_list)
-    sca_lon_obs_array = np.asarray(sca_lon_obs_list)
-    sca_alt_obs_array = np.asarray(sca_alt_obs_list)
-    sca_middle_bin_backscatter_array = np.asarray(sca_middle_bin_backscatter_list)
-    sca_middle_bin_extinction_array = np.asarray(sca_middle_bin_extinction_list)
-    sca_middle_bin_qc_array = np.asarray(sca_middle_bin_qc_list)
-    # sca_middle_bin_ber_array = np.asarray(sca_middle_bin_ber_list)
-    # sca_middle_bin_lod_array = np.asarray(sca_middle_bin_lod_list)
+    sca_observation_time_array = aeolus_time_to_datetime(sca_observation_time)
+
+    # Keep only the profiles inside the bounding box
+    if lat_mask is not None:
+        sca_lat_obs_array = sca_lat_obs_array[lat_mask]
+        sca_lon_obs_array = sca_lon_obs_array[lat_mask]
+        sca_observation_time_array = sca_observation_time_array[lat_mask]
+        sca_alt_obs_array = sca_alt_obs_array[lat_mask, :]
+        sca_middle_bin_backscatter_array = sca_middle_bin_backscatter_array[lat_mask, :]
+        sca_middle_bin_extinction_array = sca_middle_bin_extinction_array[lat_mask, :]
+        sca_middle_bin_qc_array = sca_middle_bin_qc_array[lat_mask, :]
+        if return_ber_lod:
+            sca_middle_bin_ber_array = sca_middle_bin_ber_array[lat_mask, :]
+            sca_middle_bin_lod_array = sca_middle_bin_lod_array[lat_mask, :]
 
     # Update longitude values
     sca_lon_obs_array[sca_lon_obs_array > 180.] -= 360.
 
     # Log a message indicating that the data has been extracted
-    logger.info("Extracted data from AEOLUS file")
+    logger.info("Extracted data from AEOLUS file: %d profiles" % np.size(sca_lat_obs_array))
 
-    # return sca_lat_obs_array, sca_lon_obs_array, sca_alt_obs_array, \
-    #        sca_observation_time_array, sca_middle_bin_backscatter_array, sca_middle_bin_extinction_array, \
-    #        sca_middle_bin_qc_array, sca_middle_bin_ber_array, sca_middle_bin_lod_array
+    if return_ber_lod:
+        return sca_lat_obs_array, sca_lon_obs_array, sca_alt_obs_array, \
+               sca_observation_time_array, sca_middle_bin_backscatter_array, sca_middle_bin_extinction_array, \
+               sca_middle_bin_qc_array, sca_middle_bin_ber_array, sca_middle_bin_lod_array
 
     return sca_lat_obs_array, sca_lon_obs_array, sca_alt_obs_array, \
            sca_observation_time_array, sca_middle_bin_backscatter_array, sca_middle_bin_extinction_array, \
            sca_middle_bin_qc_array
-
@@ -12,8 +12,12 @@ import matplotlib.colors as colors
 import matplotlib.ticker as ticker
 import matplotlib.pyplot as plt
 import matplotlib as mpl
-import geopy.distance
+from functools import lru_cache
+from datetime import datetime
 import numpy as np
+from getColocationData.get_colocation import compute_colocation_metrics
+from getColocationData.get_reprojection import resample_aeolus
+from getColocationData.save_colocated_data import read_colocation_nc
 
 
 def _cliop_cmp():
@@ -32,6 +36,17 @@ def _cliop_cmp():
     return cliop_cmp
 
 
+@lru_cache(maxsize=64)
+def get_tile_basemap(lat_min, lat_max, lon_min, lon_max, lat_mid, lon_mid):
+    """
+    Mercator Basemap of a colocation tile, cached per tile extent: the projection and the coastline
+    geometry are only built once for all the colocations falling in the same tile.
+    """
+    return Basemap(projection='merc', llcrnrlat=lat_min, urcrnrlat=lat_max,
+                   llcrnrlon=lon_min, urcrnrlon=lon_max,
+                   lat_0=lat_mid, lon_0=lon_mid)
+
+
 def plot_grid_tiles(lat_colocation, lon_colocation,
                     lat_aeolus, lon_aeolus, alt_aeolus, beta_aeolus, alpha_aeolus,
                     lat_caliop, lon_caliop, alt_caliop, beta_caliop, alpha_caliop,
@@ -61,14 +76,13 @@ def plot_grid_tiles(lat_colocation, lon_colocation,
     lats = range(lat_min - interval, lat_max + interval, int(interval / 2))
     lons = range(lon_min - interval, lon_max + interval, int(interval / 2))
 
-    # calculate and find the closest distance point
-    colocation_distance_list = [geopy.distance.geodesic((lat_colocation, lon_colocation),
-                                                      (lat_caliop[s], lon_caliop[s])).km for s in range(len(lat_caliop))]
-    colocation_distance_array = np.asarray(colocation_distance_list)
-    spa_dis = np.min(colocation_distance_array)
+    # find the closest profiles, the inputs are copied as some are masked for plotting
+    (spa_dis, location_index_aeolus, location_index_caliop) = \
+        compute_colocation_metrics(lat_colocation, lon_colocation, lat_aeolus, lat_caliop, lon_caliop)
+    beta_caliop = np.array(beta_caliop, dtype=float)
+    alpha_caliop = np.array(alpha_caliop, dtype=float)
+    aerosol_type_caliop = np.array(aerosol_type_caliop)
 
-    location_index_aeolus = np.argmin((abs(lat_aeolus - lat_colocation)))
-    location_index_caliop = np.argmin(colocation_distance_array)
     lat_colocation_caliop = lat_caliop[location_index_caliop]
     lon_colocation_caliop = lon_caliop[location_index_caliop]
 
@@ -84,9 +98,7 @@ def plot_grid_tiles(lat_colocation, lon_colocation,
     ax1 = fig.add_subplot(gs[0:2, 0:2])
 
     # Create a Basemap object using the Sinusoidal Tile Grid projection
-    m = Basemap(projection='merc', llcrnrlat=lat_min, urcrnrlat=lat_max,
-                llcrnrlon=lon_min, urcrnrlon=lon_max,
-                lat_0=lat_mid, lon_0=lon_mid)
+    m = get_tile_basemap(lat_min, lat_max, lon_min, lon_max, lat_mid, lon_mid)
 
     x_aeolus, y_aeolus = m(lon_aeolus, lat_aeolus)
     x_caliop, y_caliop = m(lon_caliop, lat_caliop)
@@ -373,8 +385,39 @@ def plot_grid_tiles(lat_colocation, lon_colocation,
     plt.tight_layout()
     # Show the map
     plt.savefig(savefigname)
+    plt.close(fig)
     logger.info("Colocation map is generated. ----------------------> Success")
 
     return tem_dis, spa_dis
 
+
+def plot_colocation_nc(ncFilename, savefigname, logger, interval=10):
+    """
+    Plot a colocation event from its saved netcdf file (see save_colocation_nc), so that the figures are
+    rendered after the colocation production. The Aeolus profiles are resampled to the CALIOP altitudes
+    as during the production.
+    """
+    colocation_data = read_colocation_nc(ncFilename)
+
+    aeolus_time_str = ncFilename.split('/')[-1].split('.nc')[0]
+    colocation_datetime = datetime.strptime(aeolus_time_str, '%Y%m%dT%H%M%S')
+
+    beta_aeolus_resample = resample_aeolus(colocation_data['lat_aeolus'], colocation_data['alt_aeolus'],
+                                           colocation_data['beta_aeolus'], colocation_data['alt_caliop'])
+    alpha_aeolus_resample = resample_aeolus(colocation_data['lat_aeolus'], colocation_data['alt_aeolus'],
+                                            colocation_data['alpha_aeolus'], colocation_data['alt_caliop'])
+
+    return plot_grid_tiles(colocation_data['lat_colocation'], colocation_data['lon_colocation'],
+                           colocation_data['lat_aeolus'], colocation_data['lon_aeolus'],
+                           colocation_data['alt_aeolus'], beta_aeolus_resample, alpha_aeolus_resample,
+                           colocation_data['lat_caliop'], colocation_data['lon_caliop'],
+                           colocation_data['alt_caliop'], colocation_data['beta_caliop'],
+                           colocation_data['alpha_caliop'], colocation_data['aerosol_type_caliop'],
+                           colocation_data['feature_type_caliop'],
+                           savefigname=savefigname,
+                           title='%s CALIOP-AEOLUS Co-located Level-2 Profiles' %
+                                 colocation_datetime.strftime('%d/%m/%Y'),
+                           colocation_info='Temporal distance = %.1f hours' % colocation_data['tem_dis'],
+                           logger=logger, tem_dis=colocation_data['tem_dis'], interval=interval)
+
 # plot_grid_tiles(0.5, 42, interval=10)
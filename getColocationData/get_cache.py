@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    get_cache.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 13:02
+
+from getColocationData.get_aeolus import extract_variables_from_aeolus, read_aeolus_time
+from getColocationData.get_caliop import extract_variables_from_caliop
+from collections import OrderedDict
+import numpy as np
+import os
+
+# rough size of the python object behind each element of an object array (e.g. datetime)
+OBJECT_ITEM_BYTES = 64
+
+
+def get_nbytes(value):
+    """Estimate the memory size of a decoded file: numpy arrays, nested in tuples, lists or dicts"""
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return value.nbytes + value.size * OBJECT_ITEM_BYTES
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(get_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(get_nbytes(item) for item in value.values())
+    return OBJECT_ITEM_BYTES
+
+
+def _set_read_only(value):
+    """Protect the cached arrays, a caller modifying them in place would silently corrupt the cache"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            _set_read_only(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _set_read_only(item)
+
+
+class DecodedFileCache():
+    """
+    Bounded cache of decoded files with LRU eviction by memory size.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Maximum memory of the cached values, the least recently used files are evicted beyond it.
+        A single value larger than max_bytes is returned without being cached.
+    """
+
+    def __init__(self, max_bytes):
+        super().__init__()
+
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        """Return the cached value of key, decoding it with loader() on a miss"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+        self.misses += 1
+        value = loader()
+        nbytes = get_nbytes(value)
+
+        if nbytes <= self.max_bytes:
+            _set_read_only(value)
+            self.entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+
+            # evict the least recently used files
+            while self.current_bytes > self.max_bytes:
+                (_, (_, evicted_nbytes)) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_nbytes
+
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.current_bytes = 0
+
+
+def get_file_key(filename, *args):
+    """Cache key of a file, a file rewritten on disk gets a new key"""
+    file_stat = os.stat(filename)
+    return (os.path.abspath(filename), file_stat.st_mtime_ns, file_stat.st_size) + args
+
+
+# one daily Aeolus file is around 100 MB decoded, a CALIOP APro5km granule around 50 MB
+aeolus_cache = DecodedFileCache(max_bytes=2 * 1024 ** 3)
+caliop_cache = DecodedFileCache(max_bytes=2 * 1024 ** 3)
+
+
+def read_aeolus_time_cached(nc_file):
+    """read_aeolus_time, read once per file; the returned array is read-only"""
+    key = get_file_key(nc_file, 'aeolus_time')
+
+    return aeolus_cache.get(key, lambda: read_aeolus_time(nc_file))
+
+
+def extract_variables_from_aeolus_cached(nc_file, logger, time_range=None, lat_range=None, lon_range=None,
+                                         return_ber_lod=False):
+    """extract_variables_from_aeolus, decoded once per file and slice; the returned arrays are read-only"""
+    key = get_file_key(nc_file, 'aeolus', time_range, lat_range, lon_range, return_ber_lod)
+
+    return aeolus_cache.get(key, lambda: extract_variables_from_aeolus(nc_file, logger, time_range=time_range,
+                                                                       lat_range=lat_range, lon_range=lon_range,
+                                                                       return_ber_lod=return_ber_lod))
+
+
+def extract_variables_from_caliop_cached(hdf_file, logger, lat_range=None, lon_range=None):
+    """extract_variables_from_caliop, decoded once per granule and slice; the returned arrays are read-only"""
+    key = get_file_key(hdf_file, 'caliop', lat_range, lon_range)
+
+    return caliop_cache.get(key, lambda: extract_variables_from_caliop(hdf_file, logger, lat_range=lat_range,
+                                                                       lon_range=lon_range))
@@ -5,7 +5,10 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        08/01/2023 23:17
 
-from Caliop.caliop import Caliop_hdf_reader
+from pyhdf.SD import SD, SDC
+from pyhdf.HDF import HDF, HC
+from getColocationData.get_colocation import get_lon_mask
+import numpy as np
 import os
 
 def find_caliop_file(dir, filename, date):
@@ -19,139 +22,211 @@ def find_caliop_file(dir, filename, date):
     else:
         return None
 
-def extract_variables_from_caliop(hdf_file, logger):
-    """Extract relevant variables from the CALIOP data"""
-
-    caliop_request = Caliop_hdf_reader()
-    caliop_latitude_list = caliop_request. \
-        _get_latitude(hdf_file)
-    caliop_longitude_list = caliop_request. \
-        _get_longitude(hdf_file)
-    caliop_altitude_list = caliop_request. \
-        get_altitudes(hdf_file)
-    caliop_beta_list = caliop_request. \
-        _get_calipso_data(filename=hdf_file,
-                          variable='Total_Backscatter_Coefficient_532')
-    caliop_alpha_list = caliop_request. \
-        _get_calipso_data(filename=hdf_file,
-                          variable='Extinction_Coefficient_532')
-
-    (caliop_aerosol_type, caliop_feature_type) = caliop_request.\
-        _get_feature_classification(filename=hdf_file,
-                                    variable='Atmospheric_Volume_Description')
-
-    caliop_Depolarization_Ratio_list = caliop_request. \
-        _get_calipso_data(filename=hdf_file,
-                          variable='Particulate_Depolarization_Ratio_Profile_532')
-
-    CAD_Score = caliop_request. \
-        _get_calipso_data(filename=hdf_file,
-                          variable='CAD_Score')
-    print(caliop_Depolarization_Ratio_list.shape)
-    print(CAD_Score.shape)
-    print(CAD_Score[0, -50, 1:20])
-    print(CAD_Score[1, -50, 1:20])
-    quit()
-    caliop_tropopause_height = caliop_request.\
-        _get_tropopause_height(filename=hdf_file)
+def decode_feature_classification(flags):
+    """
+    Decode the CALIOP feature classification flags (Atmospheric_Volume_Description, Feature_Classification_Flags).
+
+    Returns:
+        dict of numpy arrays with the same shape as flags:
+        feature_type (bits 1-3), feature_type_qa (bits 4-5), cloud_phase (bits 6-7),
+        cloud_phase_qa (bits 8-9), aerosol_type (feature subtype, bits 10-12)
+    """
+    flags = np.asarray(flags).astype(np.uint16)
+
+    return {'feature_type': (flags & 7).astype(np.int8),
+            'feature_type_qa': ((flags >> 3) & 3).astype(np.int8),
+            'cloud_phase': ((flags >> 5) & 3).astype(np.int8),
+            'cloud_phase_qa': ((flags >> 7) & 3).astype(np.int8),
+            'aerosol_type': ((flags >> 9) & 7).astype(np.int8)}
+
+# Lidar_Data_Altitudes are the same for every granule of a product, read once per product
+_lidar_altitudes = {}
+
+def _get_product_name(hdf_file):
+    """e.g. CAL_LID_L2_05kmAPro-Standard-V4-20 for CAL_LID_L2_05kmAPro-Standard-V4-20.2019-06-22T00-00-00ZD.hdf"""
+    return os.path.basename(hdf_file).split('.')[0]
+
+def get_lidar_altitudes(hdf_file):
+    """Altitudes of the range bins of a CALIOP granule, from the metadata vdata, unit -> km"""
+    product = _get_product_name(hdf_file)
+
+    if product not in _lidar_altitudes:
+        hdf = HDF(hdf_file, HC.READ)
+        vs = hdf.vstart()
+        try:
+            metadata = vs.attach('metadata')
+            metadata.setfields('Lidar_Data_Altitudes')
+            _lidar_altitudes[product] = np.asarray(metadata.read(nRec=1)[0][0], dtype=np.float32)
+            metadata.detach()
+        finally:
+            vs.end()
+            hdf.close()
+
+    return _lidar_altitudes[product]
+
+def _get_profile_middle(values):
+    """Keep the middle value of per-profile variables stored as (first, middle, last) columns"""
+    values = np.asarray(values)
+    if values.ndim == 2:
+        values = values[:, values.shape[1] // 2]
+    return values
+
+def _read_hyperslab(hdf, variable, index_start, index_end):
+    """Read the profiles [index_start, index_end) of a SDS, pyhdf does not accept an empty hyperslab"""
+    sds = hdf.select(variable)
+    if index_end <= index_start:
+        return np.asarray(sds[0:1])[0:0]
+    return np.asarray(sds[int(index_start):int(index_end)])
+
+def _read_sds(hdf, variable, index_start, index_end, profile_mask):
+    """Read the hyperslab [index_start, index_end) of the profiles of a SDS, profiles on the last axis"""
+    data = _read_hyperslab(hdf, variable, index_start, index_end)
+    if profile_mask is not None:
+        data = data[profile_mask]
+    return data.T
+
+def read_caliop_variables(hdf_file, variables=(), feature_classification=None, geolocation=True,
+                          altitude=False, lat_range=None, lon_range=None):
+    """
+    Read a named list of SDS variables from a CALIOP granule, opening the HDF file once.
+
+    The 2-D variables are returned with the profiles on the last axis (e.g. (399, N) for APro5km),
+    as done by Caliop_hdf_reader._get_calipso_data.
+
+    Parameters:
+        hdf_file: string, CALIOP HDF file.
+        variables: list of string, SDS variables to be read.
+        feature_classification: string or None, feature classification SDS to be decoded,
+                                e.g. 'Atmospheric_Volume_Description' or 'Feature_Classification_Flags'.
+        geolocation: bool, also read the latitude and longitude of the profiles (middle of the 5 km profile).
+        altitude: bool, also return the altitudes of the range bins, unit -> km.
+        lat_range: (float, float) or None, only read the profiles between these latitudes. The profile
+                   range is found from the 1-D latitude first, and only that hyperslab is read and decoded.
+        lon_range: (float, float) or None, only read the profiles between these longitudes, in [-180, 180].
+
+    Returns:
+        bundle: dict of numpy arrays, keyed by SDS name, plus 'latitude', 'longitude', 'altitude',
+                'profile_index' and the decoded 'feature_type', 'feature_type_qa', 'cloud_phase',
+                'cloud_phase_qa' and 'aerosol_type'.
+    """
+    bundle = {}
+
+    hdf = SD(hdf_file, SDC.READ)
+    try:
+        index_start = 0
+        index_end = np.atleast_1d(hdf.select('Latitude').info()[2])[0]
+        profile_mask = None
+
+        if (lat_range is not None) | geolocation:
+            latitude = _get_profile_middle(hdf.select('Latitude')[:])
+
+        if (lat_range is not None) | (lon_range is not None):
+            profile_mask = np.ones(index_end, dtype=bool)
+            if lat_range is not None:
+                profile_mask &= (latitude > lat_range[0]) & (latitude < lat_range[1])
+            if lon_range is not None:
+                profile_mask &= get_lon_mask(_get_profile_middle(hdf.select('Longitude')[:]), lon_range)
+
+            bbox_index = np.where(profile_mask)[0]
+            if np.size(bbox_index) > 0:
+                index_start = int(bbox_index[0])
+                index_end = int(bbox_index[-1]) + 1
+            else:
+                index_end = index_start
+            profile_mask = profile_mask[index_start:index_end]
+
+        profile_index = np.arange(index_start, index_end)
+        if profile_mask is not None:
+            profile_index = profile_index[profile_mask]
+        bundle['profile_index'] = profile_index
+
+        if geolocation:
+            longitude = _get_profile_middle(_read_hyperslab(hdf, 'Longitude', index_start, index_end))
+            latitude = latitude[index_start:index_end]
+            if profile_mask is not None:
+                latitude = latitude[profile_mask]
+                longitude = longitude[profile_mask]
+            bundle['latitude'] = latitude
+            bundle['longitude'] = longitude
+
+        for variable in variables:
+            bundle[variable] = _read_sds(hdf, variable, index_start, index_end, profile_mask)
+
+        if feature_classification is not None:
+            flags = _read_hyperslab(hdf, feature_classification, index_start, index_end)
+            if profile_mask is not None:
+                flags = flags[profile_mask]
+            # APro5km stores two classifications per range bin, the first one is used
+            if flags.ndim == 3:
+                flags = flags[:, :, 0]
+            bundle.update(decode_feature_classification(flags.T))
+
+    finally:
+        hdf.end()
+
+    if altitude:
+        bundle['altitude'] = get_lidar_altitudes(hdf_file)
+
+    return bundle
+
+def extract_variables_from_caliop(hdf_file, logger, lat_range=None, lon_range=None):
+    """Extract relevant variables from the CALIOP data, optionally only the profiles inside lat_range and lon_range"""
+
+    caliop_bundle = read_caliop_variables(hdf_file,
+                                          variables=['Total_Backscatter_Coefficient_532',
+                                                     'Extinction_Coefficient_532',
+                                                     'Particulate_Depolarization_Ratio_Profile_532',
+                                                     'Tropopause_Height'],
+                                          feature_classification='Atmospheric_Volume_Description',
+                                          altitude=True, lat_range=lat_range, lon_range=lon_range)
 
     logger.info("Extracted data from caliop file: 7 parameters")
 
-    return caliop_latitude_list, caliop_longitude_list, \
-           caliop_altitude_list, caliop_beta_list, \
-           caliop_alpha_list, caliop_aerosol_type, caliop_feature_type, \
-           caliop_Depolarization_Ratio_list, caliop_tropopause_height
+    return caliop_bundle['latitude'], caliop_bundle['longitude'], \
+           caliop_bundle['altitude'], caliop_bundle['Total_Backscatter_Coefficient_532'], \
+           caliop_bundle['Extinction_Coefficient_532'], caliop_bundle['aerosol_type'], caliop_bundle['feature_type'], \
+           caliop_bundle['Particulate_Depolarization_Ratio_Profile_532'], \
+           np.squeeze(caliop_bundle['Tropopause_Height'], axis=0)
 
 def extract_cloud_phase_caliop(hdf_file, logger):
 
-    caliop_request = Caliop_hdf_reader()
-    caliop_cloud_phase, caliop_cloud_phase_QA = caliop_request. \
-        _get_cloud_phase(filename=hdf_file, variable='Atmospheric_Volume_Description')
+    caliop_bundle = read_caliop_variables(hdf_file, feature_classification='Atmospheric_Volume_Description',
+                                          geolocation=False)
 
-    return caliop_cloud_phase, caliop_cloud_phase_QA
+    return caliop_bundle['cloud_phase'], caliop_bundle['cloud_phase_qa']
 
 def extract_variables_from_caliop_level1(hdf_file, logger):
     """Extract relevant variables from the CALIOP Level-1 data"""
 
-    caliop_request = Caliop_hdf_reader()
-    caliop_latitude_list = caliop_request. \
-        _get_latitude(hdf_file)
-    caliop_longitude_list = caliop_request. \
-        _get_longitude(hdf_file)
-    caliop_altitude_list = caliop_request. \
-        get_altitudes(hdf_file)
-    caliop_total_attenuated_backscatter_list = \
-        caliop_request._get_calipso_data(filename=hdf_file,
-                                         variable='Total_Attenuated_Backscatter_532')
-    caliop_perpendicular_attenuated_backscatter_532_list = \
-        caliop_request._get_calipso_data(filename=hdf_file,
-                                            variable='Perpendicular_Attenuated_Backscatter_532')
-    caliop_atteunated_backscatter_1064_list = \
-        caliop_request._get_calipso_data(filename=hdf_file,
-                                            variable='Attenuated_Backscatter_1064')
-
-    # caliop_alpha_list = caliop_request. \
-    #     _get_calipso_data(filename=hdf_file,
-    #                       variable='Extinction_Coefficient_532')
-    # (caliop_aerosol_type, caliop_feature_type) = caliop_request.\
-    #     _get_feature_classification(filename=hdf_file,
-    #                                 variable='Atmospheric_Volume_Description')
-    #
-    # caliop_Depolarization_Ratio_list = caliop_request. \
-    #     _get_calipso_data(filename=hdf_file,
-    #                       variable='Particulate_Depolarization_Ratio_Profile_532')
-    #
-    # caliop_tropopause_height = caliop_request.\
-    #     _get_tropopause_height(filename=hdf_file)
+    caliop_bundle = read_caliop_variables(hdf_file,
+                                          variables=['Total_Attenuated_Backscatter_532',
+                                                     'Perpendicular_Attenuated_Backscatter_532',
+                                                     'Attenuated_Backscatter_1064'],
+                                          altitude=True)
 
     logger.info("Extracted data from caliop level-1 file")
-    return caliop_latitude_list, caliop_longitude_list, \
-           caliop_altitude_list, caliop_total_attenuated_backscatter_list, \
-           caliop_perpendicular_attenuated_backscatter_532_list, \
-           caliop_atteunated_backscatter_1064_list
+    return caliop_bundle['latitude'], caliop_bundle['longitude'], \
+           caliop_bundle['altitude'], caliop_bundle['Total_Attenuated_Backscatter_532'], \
+           caliop_bundle['Perpendicular_Attenuated_Backscatter_532'], \
+           caliop_bundle['Attenuated_Backscatter_1064']
 
 
 def extract_variables_from_caliop_ALay(hdf_file, logger):
-    """Extract relevant variables from the CALIOP Level-1 data"""
+    """Extract relevant variables from the CALIOP Level-2 aerosol layer data"""
 
-    caliop_request = Caliop_hdf_reader()
-
-    caliop_Profile_Time = caliop_request. \
-        _get_calipso_data(filename=hdf_file,
-                            variable='Profile_Time')
-    caliop_DN_flag = caliop_request. \
-        _get_calipso_data(filename=hdf_file,
-                            variable='Day_Night_Flag')
-    caliop_latitude_list = caliop_request. \
-        _get_latitude(hdf_file)
-    caliop_longitude_list = caliop_request. \
-        _get_longitude(hdf_file)
-
-    caliop_Integrated_Attenuated_Total_Color_Ratio = \
-        caliop_request._get_calipso_data(filename=hdf_file,
-                                         variable='Integrated_Attenuated_Total_Color_Ratio')
-    caliop_Integrated_Particulate_Depolarization_Ratio = \
-        caliop_request._get_calipso_data(filename=hdf_file,
-                                            variable='Integrated_Particulate_Depolarization_Ratio')
-
-    (caliop_aerosol_type, caliop_feature_type) = caliop_request. \
-        _get_feature_classification_ALay(filename=hdf_file,
-                                         variable='Feature_Classification_Flags')
-
-    caliop_Layer_Top_Altitude =  caliop_request._get_calipso_data(filename=hdf_file,
-                                                                  variable='Layer_Top_Altitude')
-    caliop_Layer_Base_Altitude = caliop_request._get_calipso_data(filename=hdf_file,
-                                                                 variable='Layer_Base_Altitude')
-    caliop_Tropopause_Height = caliop_request._get_calipso_data(filename=hdf_file,
-                                                                variable='Tropopause_Height')
-
-    caliop_CAD =  caliop_request._get_calipso_data(filename=hdf_file, variable='CAD_Score')
+    caliop_bundle = read_caliop_variables(hdf_file,
+                                          variables=['Profile_Time', 'Day_Night_Flag',
+                                                     'Integrated_Attenuated_Total_Color_Ratio',
+                                                     'Integrated_Particulate_Depolarization_Ratio',
+                                                     'Layer_Top_Altitude', 'Layer_Base_Altitude',
+                                                     'Tropopause_Height', 'CAD_Score'],
+                                          feature_classification='Feature_Classification_Flags')
 
     logger.info("Extracted data from caliop ALay file")
-    return (caliop_Profile_Time, caliop_DN_flag,
-            caliop_latitude_list, caliop_longitude_list,
-            caliop_Integrated_Attenuated_Total_Color_Ratio,
-            caliop_Integrated_Particulate_Depolarization_Ratio,
-            caliop_aerosol_type, caliop_feature_type,
-            caliop_Layer_Top_Altitude, caliop_Layer_Base_Altitude,
-            caliop_Tropopause_Height, caliop_CAD)
+    return (caliop_bundle['Profile_Time'], caliop_bundle['Day_Night_Flag'],
+            caliop_bundle['latitude'], caliop_bundle['longitude'],
+            caliop_bundle['Integrated_Attenuated_Total_Color_Ratio'],
+            caliop_bundle['Integrated_Particulate_Depolarization_Ratio'],
+            caliop_bundle['aerosol_type'], caliop_bundle['feature_type'],
+            caliop_bundle['Layer_Top_Altitude'], caliop_bundle['Layer_Base_Altitude'],
+            caliop_bundle['Tropopause_Height'], caliop_bundle['CAD_Score'])
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    get_caliop_index.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 10:05
+
+from getColocationData.get_colocation import latlon_to_ecef, km_to_chord, chord_to_km
+from getColocationData.get_caliop import read_caliop_variables
+from datetime import datetime, timedelta
+from scipy.spatial import cKDTree
+import numpy as np
+import pathlib
+import os
+
+# CALIOP Profile_Time is given in TAI seconds since 1993-01-01, the footprint index stores the time in
+# seconds since 2000-01-01 as used by the Aeolus products (the few leap seconds in between are ignored).
+CALIOP_TIME_OFFSET = (datetime(2000, 1, 1) - datetime(1993, 1, 1)).total_seconds()
+
+
+def get_caliop_index_file(index_dir, date):
+    """Location of the daily footprint index file, following the <year>/<year>_<month>_<day> CALIOP layout"""
+    year = '{:04d}'.format(date.year)
+    month = '{:02d}'.format(date.month)
+    day = '{:02d}'.format(date.day)
+
+    return index_dir + '/%s/%s_%s_%s.npz' % (year, year, month, day)
+
+
+def _get_profile_middle(values, n_profiles):
+    """Keep the middle value of per-profile variables stored as (first, middle, last) triplets"""
+    values = np.squeeze(np.asarray(values))
+
+    if values.ndim == 2:
+        if values.shape[0] == n_profiles:
+            values = values[:, values.shape[1] // 2]
+        else:
+            values = values[values.shape[0] // 2, :]
+
+    return values
+
+
+def read_caliop_footprints(hdf_file):
+    """
+    Read the footprint geolocation and profile time of one CALIOP granule.
+
+    Returns:
+        latitude: numpy array, unit -> degree.
+        longitude: numpy array, unit -> degree.
+        profile_time: numpy array, unit -> seconds since 2000-01-01.
+    """
+    caliop_bundle = read_caliop_variables(hdf_file, variables=['Profile_Time'])
+    latitude = np.asarray(caliop_bundle['latitude'], dtype=np.float64)
+    longitude = np.asarray(caliop_bundle['longitude'], dtype=np.float64)
+    profile_time = caliop_bundle['Profile_Time']
+    profile_time = _get_profile_middle(profile_time, np.size(latitude)).astype(np.float64) - CALIOP_TIME_OFFSET
+
+    return latitude, longitude, profile_time
+
+
+def load_caliop_index_day(index_dir, date):
+    """
+    Load the footprint index of one day.
+
+    Returns:
+        index_day: dict of numpy arrays with keys 'ecef', 'latitude', 'longitude', 'profile_time',
+                   'profile_index', 'granule_id' and 'granule_name', or None if the day is not indexed.
+    """
+    index_file = get_caliop_index_file(index_dir, date)
+
+    if not os.path.exists(index_file):
+        return None
+
+    with np.load(index_file) as index_data:
+        index_day = {key: index_data[key] for key in index_data.files}
+
+    return index_day
+
+
+def save_caliop_index_day(index_dir, date, index_day):
+    """Save the footprint index of one day, written to a temporary file first so that readers never see a partial index"""
+    index_file = get_caliop_index_file(index_dir, date)
+    pathlib.Path(os.path.dirname(index_file)).mkdir(parents=True, exist_ok=True)
+
+    index_file_tmp = index_file[:-4] + '.tmp.npz'
+    np.savez(index_file_tmp, **index_day)
+    os.replace(index_file_tmp, index_file)
+
+
+def update_caliop_index_day(caliop_dir, index_dir, date, logger):
+    """
+    Add the granules of one CALIOP day that are not yet in the footprint index.
+
+    Parameters:
+        caliop_dir: string, CALIOP archive, organised as <year>/<year>_<month>_<day>/<granule>.hdf
+        index_dir: string, directory of the footprint index.
+        date: datetime, day to be indexed.
+        logger: logging object.
+
+    Returns:
+        number of granules added to the index.
+    """
+    year = '{:04d}'.format(date.year)
+    month = '{:02d}'.format(date.month)
+    day = '{:02d}'.format(date.day)
+    caliop_day_dir = caliop_dir + '/%s/%s_%s_%s/' % (year, year, month, day)
+
+    if not os.path.isdir(caliop_day_dir):
+        logger.warning('%s not exists, no CALIOP footprint indexed.' % caliop_day_dir)
+        return 0
+
+    index_day = load_caliop_index_day(index_dir, date)
+
+    if index_day is None:
+        index_day = {'ecef': np.zeros((0, 3), dtype=np.float32),
+                     'latitude': np.zeros(0, dtype=np.float32),
+                     'longitude': np.zeros(0, dtype=np.float32),
+                     'profile_time': np.zeros(0, dtype=np.float64),
+                     'profile_index': np.zeros(0, dtype=np.int32),
+                     'granule_id': np.zeros(0, dtype=np.int32),
+                     'granule_name': np.zeros(0, dtype='U128')}
+
+    granule_name_list = list(index_day['granule_name'])
+    new_granule_list = sorted([file for file in os.listdir(caliop_day_dir)
+                               if file.endswith('hdf') & (file not in granule_name_list)])
+
+    if len(new_granule_list) == 0:
+        return 0
+
+    ecef_list = [index_day['ecef']]
+    latitude_list = [index_day['latitude']]
+    longitude_list = [index_day['longitude']]
+    profile_time_list = [index_day['profile_time']]
+    profile_index_list = [index_day['profile_index']]
+    granule_id_list = [index_day['granule_id']]
+
+    for file in new_granule_list:
+
+        try:
+            (latitude, longitude, profile_time) = read_caliop_footprints(caliop_day_dir + file)
+        except Exception as error:
+            logger.error('Error reading CALIOP footprints from %s: %s' % (file, error))
+            continue
+
+        ecef_list.append(latlon_to_ecef(latitude, longitude).astype(np.float32))
+        latitude_list.append(latitude.astype(np.float32))
+        longitude_list.append(longitude.astype(np.float32))
+        profile_time_list.append(profile_time)
+        profile_index_list.append(np.arange(np.size(latitude), dtype=np.int32))
+        granule_id_list.append(np.full(np.size(latitude), len(granule_name_list), dtype=np.int32))
+        granule_name_list.append(file)
+
+    index_day = {'ecef': np.concatenate(ecef_list),
+                 'latitude': np.concatenate(latitude_list),
+                 'longitude': np.concatenate(longitude_list),
+                 'profile_time': np.concatenate(profile_time_list),
+                 'profile_index': np.concatenate(profile_index_list),
+                 'granule_id': np.concatenate(granule_id_list),
+                 'granule_name': np.asarray(granule_name_list, dtype='U128')}
+
+    save_caliop_index_day(index_dir, date, index_day)
+    logger.info('Indexed %d CALIOP granules for %s-%s-%s' % (len(ecef_list) - 1, year, month, day))
+
+    return len(ecef_list) - 1
+
+
+class CaliopFootprintIndex():
+    """
+    Spatial index over the CALIOP footprints of a range of days, backed by a KD-tree on the unit-sphere
+    ECEF coordinates. Colocation queries are answered from the daily index files without opening any HDF file.
+
+    Parameters
+    ----------
+    index_dir : string
+        Directory of the footprint index built by update_caliop_index_day.
+    start_date, end_date : datetime
+        First and last day (inclusive) loaded into the tree.
+    """
+
+    def __init__(self, index_dir, start_date, end_date):
+        super().__init__()
+
+        self.index_dir = index_dir
+        self.start_date = start_date
+        self.end_date = end_date
+
+        self.load_index()
+        self.tree = cKDTree(self.ecef)
+
+    def load_index(self):
+
+        ecef_list = []
+        profile_time_list = []
+        profile_index_list = []
+        granule_name_list = []
+        latitude_list = []
+        longitude_list = []
+
+        date = datetime.combine(self.start_date.date(), datetime.min.time())
+        while date <= self.end_date:
+            index_day = load_caliop_index_day(self.index_dir, date)
+            if index_day is not None:
+                ecef_list.append(index_day['ecef'].astype(np.float64))
+                latitude_list.append(index_day['latitude'])
+                longitude_list.append(index_day['longitude'])
+                profile_time_list.append(index_day['profile_time'])
+                profile_index_list.append(index_day['profile_index'])
+                granule_name_list.append(index_day['granule_name'][index_day['granule_id']])
+            date += timedelta(days=1)
+
+        if len(ecef_list) > 0:
+            self.ecef = np.concatenate(ecef_list)
+            self.latitude = np.concatenate(latitude_list)
+            self.longitude = np.concatenate(longitude_list)
+            self.profile_time = np.concatenate(profile_time_list)
+            self.profile_index = np.concatenate(profile_index_list)
+            self.granule_name = np.concatenate(granule_name_list)
+        else:
+            self.ecef = np.zeros((0, 3))
+            self.latitude = np.zeros(0, dtype=np.float32)
+            self.longitude = np.zeros(0, dtype=np.float32)
+            self.profile_time = np.zeros(0)
+            self.profile_index = np.zeros(0, dtype=np.int32)
+            self.granule_name = np.zeros(0, dtype='U128')
+
+    def query(self, lat, lon, time, spatial_threshold=200., temporal_threshold=24.):
+        """
+        Find all the CALIOP footprints within spatial_threshold km and temporal_threshold hours of the given points.
+
+        Parameters:
+            lat, lon: numpy array, location of the points, unit -> degree.
+            time: numpy array, time of the points, unit -> seconds since 2000-01-01.
+            spatial_threshold: float, unit -> km.
+            temporal_threshold: float, unit -> hours.
+
+        Returns:
+            index_point: numpy array, index of the query point of each colocated pair.
+            index_footprint: numpy array, index of the CALIOP footprint in the index of each colocated pair,
+                             use granule_name, profile_index and profile_time to identify the footprint.
+            distance: numpy array, great-circle distance of each colocated pair, unit -> km.
+            time_difference: numpy array, CALIOP minus point time of each colocated pair, unit -> hours.
+        """
+        lat = np.atleast_1d(lat)
+        lon = np.atleast_1d(lon)
+        time = np.atleast_1d(np.asarray(time, dtype=np.float64))
+
+        if (np.size(self.profile_time) == 0) | (np.size(lat) == 0):
+            empty_index = np.zeros(0, dtype=np.int64)
+            return empty_index, empty_index, np.zeros(0), np.zeros(0)
+
+        point_ecef = latlon_to_ecef(lat, lon)
+        neighbours = self.tree.query_ball_point(point_ecef, r=km_to_chord(spatial_threshold))
+
+        index_point = np.repeat(np.arange(np.size(lat)), [len(neighbour) for neighbour in neighbours])
+        index_footprint = np.fromiter((footprint for neighbour in neighbours for footprint in neighbour),
+                                      dtype=np.int64, count=np.size(index_point))
+
+        time_difference = (self.profile_time[index_footprint] - time[index_point]) / 3600.
+        within_window = np.abs(time_difference) <= temporal_threshold
+
+        index_point = index_point[within_window]
+        index_footprint = index_footprint[within_window]
+        distance = chord_to_km(np.linalg.norm(self.ecef[index_footprint] - point_ecef[index_point], axis=1))
+
+        return index_point, index_footprint, distance, time_difference[within_window]
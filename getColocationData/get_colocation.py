@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    get_colocation.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 09:12
+
+import geopy.distance
+import numpy as np
+import pathlib
+import csv
+
+# mean earth radius used by the spherical distances, unit -> km
+EARTH_RADIUS_KM = 6371.0088
+# the spherical (haversine) distance differs from the WGS-84 geodesic used by geopy by less
+# than 0.6% anywhere on the globe, candidates are pre-selected with this relative margin so that
+# the geodesic refinement returns exactly the same footprints as a full geodesic search.
+GEODESIC_TOLERANCE = 0.006
+
+
+def latlon_to_ecef(lat, lon):
+    """
+    Convert latitude and longitude to Cartesian coordinates on the unit sphere.
+
+    Parameters:
+        lat: numpy array, latitude values, unit -> degree.
+        lon: numpy array, longitude values, unit -> degree.
+
+    Returns:
+        xyz: numpy array with shape (N, 3), unit-sphere ECEF coordinates.
+    """
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat_rad)
+
+    return np.stack((cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)), axis=-1)
+
+
+def km_to_chord(distance_km):
+    """Convert a great-circle distance in km to the chord length on the unit sphere."""
+    return 2. * np.sin(np.asarray(distance_km) / (2. * EARTH_RADIUS_KM))
+
+
+def chord_to_km(chord):
+    """Convert a chord length on the unit sphere to the great-circle distance in km."""
+    return 2. * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2., 0., 1.))
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two sets of points, broadcast like numpy arrays.
+
+    Parameters:
+        lat1, lon1: numpy array, latitude and longitude of the first points, unit -> degree.
+        lat2, lon2: numpy array, latitude and longitude of the second points, unit -> degree.
+
+    Returns:
+        distance: numpy array, great-circle distance, unit -> km.
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+
+    a = np.sin((lat2 - lat1) / 2.) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.) ** 2
+
+    return 2. * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0., 1.)))
+
+
+def geodesic_distance(lat1, lon1, lat2, lon2):
+    """
+    WGS-84 geodesic distance (geopy) for paired 1-D arrays of points, unit -> km.
+    Only meant for the few candidate pairs that survive the spherical pre-selection.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(lat1, lon1, lat2, lon2)
+
+    return np.asarray([geopy.distance.geodesic((lat1[s], lon1[s]), (lat2[s], lon2[s])).km
+                       for s in range(np.size(lat1))], dtype=np.float64)
+
+
+def get_lon_mask(longitude, lon_range):
+    """
+    Mask of the longitudes inside lon_range, the range may cross the dateline (e.g. (170., 190.)).
+
+    Parameters:
+        longitude: numpy array, longitude values, unit -> degree.
+        lon_range: (float, float), minimum and maximum longitude, unit -> degree.
+
+    Returns:
+        lon_mask: numpy array of bool.
+    """
+    return np.mod(np.asarray(longitude) - lon_range[0], 360.) < (lon_range[1] - lon_range[0])
+
+
+def find_colocated_footprints(lat_aeolus, lon_aeolus, lat_caliop, lon_caliop,
+                              spatial_threshold=200., refine=True, block_size=256):
+    """
+    Find all the CALIOP footprints within spatial_threshold of each Aeolus footprint.
+
+    The distances over a whole orbit are computed at once with the haversine formula,
+    Aeolus footprints are processed in blocks of block_size to keep the distance matrix small.
+    With refine=True the geodesic distance is only computed for the candidates that are
+    already inside the threshold (plus GEODESIC_TOLERANCE), so that the selection and the
+    distances are identical to a geopy.distance.geodesic search. With refine=False the
+    haversine distances are returned, which stay within 0.6% of the geodesic distances.
+
+    Parameters:
+        lat_aeolus, lon_aeolus: numpy array, Aeolus footprint location, unit -> degree.
+        lat_caliop, lon_caliop: numpy array, CALIOP footprint location, unit -> degree.
+        spatial_threshold: float, search radius, unit -> km.
+        refine: bool, refine the candidates with the WGS-84 geodesic distance.
+        block_size: int, number of Aeolus footprints per distance matrix.
+
+    Returns:
+        index_aeolus: numpy array, index of the Aeolus footprint of each colocated pair.
+        index_caliop: numpy array, index of the CALIOP footprint of each colocated pair.
+        distance: numpy array, distance of each colocated pair, unit -> km.
+    """
+    lat_aeolus = np.atleast_1d(np.asarray(lat_aeolus, dtype=np.float64))
+    lon_aeolus = np.atleast_1d(np.asarray(lon_aeolus, dtype=np.float64))
+    lat_caliop = np.atleast_1d(np.asarray(lat_caliop, dtype=np.float64))
+    lon_caliop = np.atleast_1d(np.asarray(lon_caliop, dtype=np.float64))
+
+    # search radius of the spherical pre-selection
+    if refine:
+        search_radius = spatial_threshold * (1. + GEODESIC_TOLERANCE)
+    else:
+        search_radius = spatial_threshold
+
+    index_aeolus_list = []
+    index_caliop_list = []
+    distance_list = []
+
+    for block_start in range(0, np.size(lat_aeolus), block_size):
+        block_end = min(block_start + block_size, np.size(lat_aeolus))
+
+        distance_block = haversine_distance(lat_aeolus[block_start:block_end, np.newaxis],
+                                            lon_aeolus[block_start:block_end, np.newaxis],
+                                            lat_caliop[np.newaxis, :], lon_caliop[np.newaxis, :])
+
+        (index_aeolus_block, index_caliop_block) = np.nonzero(distance_block < search_radius)
+
+        index_aeolus_list.append(index_aeolus_block + block_start)
+        index_caliop_list.append(index_caliop_block)
+        distance_list.append(distance_block[index_aeolus_block, index_caliop_block])
+
+    if len(distance_list) > 0:
+        index_aeolus = np.concatenate(index_aeolus_list)
+        index_caliop = np.concatenate(index_caliop_list)
+        distance = np.concatenate(distance_list)
+    else:
+        index_aeolus = np.zeros(0, dtype=np.int64)
+        index_caliop = np.zeros(0, dtype=np.int64)
+        distance = np.zeros(0, dtype=np.float64)
+
+    if refine & (np.size(distance) > 0):
+        distance = geodesic_distance(lat_aeolus[index_aeolus], lon_aeolus[index_aeolus],
+                                     lat_caliop[index_caliop], lon_caliop[index_caliop])
+
+    within_threshold = distance < spatial_threshold
+
+    return index_aeolus[within_threshold], index_caliop[within_threshold], distance[within_threshold]
+
+
+def find_closest_footprint(lat_colocation, lon_colocation, lat_caliop, lon_caliop, refine=True):
+    """
+    Find the CALIOP footprint closest to a colocation point.
+
+    Parameters:
+        lat_colocation, lon_colocation: float, colocation location, unit -> degree.
+        lat_caliop, lon_caliop: numpy array, CALIOP footprint location, unit -> degree.
+        refine: bool, refine the closest candidates with the WGS-84 geodesic distance.
+
+    Returns:
+        index_closest: int, index of the closest CALIOP footprint.
+        distance_closest: float, distance to the closest CALIOP footprint, unit -> km.
+    """
+    distance = haversine_distance(lat_colocation, lon_colocation, lat_caliop, lon_caliop)
+    index_closest = int(np.argmin(distance))
+
+    if refine:
+        # every footprint that could be the geodesic minimum lies within the spherical tolerance
+        candidates = np.where(distance <= distance[index_closest] *
+                              (1. + GEODESIC_TOLERANCE) / (1. - GEODESIC_TOLERANCE))[0]
+        distance_candidates = geodesic_distance(lat_colocation, lon_colocation,
+                                                np.asarray(lat_caliop)[candidates],
+                                                np.asarray(lon_caliop)[candidates])
+        index_closest = int(candidates[np.argmin(distance_candidates)])
+
+        return index_closest, float(np.min(distance_candidates))
+
+    return index_closest, float(distance[index_closest])
+
+
+def compute_colocation_metrics(lat_colocation, lon_colocation, lat_aeolus, lat_caliop, lon_caliop):
+    """
+    Numeric colocation metrics saved with each colocation event, independent of any plotting.
+
+    Parameters:
+        lat_colocation, lon_colocation: float, location of the colocated Aeolus profile, unit -> degree.
+        lat_aeolus: numpy array, latitude of the reprojected Aeolus profiles, unit -> degree.
+        lat_caliop, lon_caliop: numpy array, location of the reprojected CALIOP profiles, unit -> degree.
+
+    Returns:
+        spa_dis: float, geodesic distance to the closest CALIOP profile, unit -> km.
+        location_index_aeolus: int, index of the Aeolus profile closest in latitude to the colocation.
+        location_index_caliop: int, index of the closest CALIOP profile.
+    """
+    (location_index_caliop, spa_dis) = find_closest_footprint(lat_colocation, lon_colocation, lat_caliop, lon_caliop)
+    location_index_aeolus = int(np.argmin(abs(np.asarray(lat_aeolus) - lat_colocation)))
+
+    return spa_dis, location_index_aeolus, location_index_caliop
+
+
+def sweep_colocated_footprints(time_aeolus, lat_aeolus, lon_aeolus,
+                               time_caliop, lat_caliop, lon_caliop,
+                               temporal_wd=10., spatial_threshold=200., refine=True, block_size=256):
+    """
+    Space-time sweep-line matcher between Aeolus and CALIOP footprints.
+
+    Both missions are sorted by time and the Aeolus footprints are swept in blocks of block_size.
+    Each block is only compared with the CALIOP footprints inside its temporal window, the spatial
+    test uses the dot product of the unit-sphere ECEF coordinates, so each block costs one matrix product.
+
+    Parameters:
+        time_aeolus, lat_aeolus, lon_aeolus: numpy array, Aeolus footprints, time unit -> seconds.
+        time_caliop, lat_caliop, lon_caliop: numpy array, CALIOP footprints, time unit -> seconds.
+        temporal_wd: float, half width of the temporal window, unit -> hours.
+        spatial_threshold: float, search radius, unit -> km.
+        refine: bool, refine the candidates with the WGS-84 geodesic distance.
+        block_size: int, number of Aeolus footprints swept at once.
+
+    Returns:
+        index_aeolus: numpy array, index of the Aeolus footprint of each colocated pair.
+        index_caliop: numpy array, index of the CALIOP footprint of each colocated pair.
+        distance: numpy array, distance of each colocated pair, unit -> km.
+        time_difference: numpy array, CALIOP minus Aeolus time of each colocated pair, unit -> hours.
+    """
+    time_aeolus = np.atleast_1d(np.asarray(time_aeolus, dtype=np.float64))
+    time_caliop = np.atleast_1d(np.asarray(time_caliop, dtype=np.float64))
+    lat_aeolus = np.atleast_1d(np.asarray(lat_aeolus, dtype=np.float64))
+    lon_aeolus = np.atleast_1d(np.asarray(lon_aeolus, dtype=np.float64))
+    lat_caliop = np.atleast_1d(np.asarray(lat_caliop, dtype=np.float64))
+    lon_caliop = np.atleast_1d(np.asarray(lon_caliop, dtype=np.float64))
+
+    # sort both missions by time
+    order_aeolus = np.argsort(time_aeolus, kind='stable')
+    order_caliop = np.argsort(time_caliop, kind='stable')
+    time_caliop_sorted = time_caliop[order_caliop]
+    ecef_aeolus_sorted = latlon_to_ecef(lat_aeolus[order_aeolus], lon_aeolus[order_aeolus])
+    ecef_caliop_sorted = latlon_to_ecef(lat_caliop[order_caliop], lon_caliop[order_caliop])
+    time_aeolus_sorted = time_aeolus[order_aeolus]
+
+    temporal_wd_seconds = temporal_wd * 3600.
+
+    # minimum cosine of the angle between two footprints inside the search radius
+    if refine:
+        search_radius = spatial_threshold * (1. + GEODESIC_TOLERANCE)
+    else:
+        search_radius = spatial_threshold
+    cos_threshold = np.cos(search_radius / EARTH_RADIUS_KM)
+
+    index_aeolus_list = []
+    index_caliop_list = []
+
+    for block_start in range(0, np.size(time_aeolus_sorted), block_size):
+        block_end = min(block_start + block_size, np.size(time_aeolus_sorted))
+
+        # CALIOP footprints inside the temporal window of this block
+        caliop_start = np.searchsorted(time_caliop_sorted, time_aeolus_sorted[block_start] - temporal_wd_seconds, side='left')
+        caliop_end = np.searchsorted(time_caliop_sorted, time_aeolus_sorted[block_end - 1] + temporal_wd_seconds, side='right')
+
+        if caliop_end <= caliop_start:
+            continue
+
+        cos_block = ecef_aeolus_sorted[block_start:block_end] @ ecef_caliop_sorted[caliop_start:caliop_end].T
+        (index_aeolus_block, index_caliop_block) = np.nonzero(cos_block > cos_threshold)
+
+        index_aeolus_block = index_aeolus_block + block_start
+        index_caliop_block = index_caliop_block + caliop_start
+
+        # the block spans a time range, keep only the pairs inside the window of their own Aeolus footprint
+        within_window = np.abs(time_caliop_sorted[index_caliop_block] - time_aeolus_sorted[index_aeolus_block]) \
+                        <= temporal_wd_seconds
+
+        index_aeolus_list.append(index_aeolus_block[within_window])
+        index_caliop_list.append(index_caliop_block[within_window])
+
+    if len(index_aeolus_list) > 0:
+        index_aeolus = order_aeolus[np.concatenate(index_aeolus_list)]
+        index_caliop = order_caliop[np.concatenate(index_caliop_list)]
+    else:
+        index_aeolus = np.zeros(0, dtype=np.int64)
+        index_caliop = np.zeros(0, dtype=np.int64)
+
+    if refine & (np.size(index_aeolus) > 0):
+        distance = geodesic_distance(lat_aeolus[index_aeolus], lon_aeolus[index_aeolus],
+                                     lat_caliop[index_caliop], lon_caliop[index_caliop])
+    else:
+        distance = haversine_distance(lat_aeolus[index_aeolus], lon_aeolus[index_aeolus],
+                                      lat_caliop[index_caliop], lon_caliop[index_caliop])
+
+    within_threshold = distance < spatial_threshold
+    time_difference = (time_caliop[index_caliop] - time_aeolus[index_aeolus]) / 3600.
+
+    return index_aeolus[within_threshold], index_caliop[within_threshold], \
+           distance[within_threshold], time_difference[within_threshold]
+
+
+def save_colocation_footprint(database_dir, time_aeolus, lat_aeolus, lon_aeolus, caliop_filename):
+    """
+    Save one Aeolus colocation footprint as database_dir/<year>/<year>-<month>-<day>/AEOLUS-<time>.csv
+
+    Parameters:
+        database_dir: string, footprint database directory.
+        time_aeolus: datetime, time of the Aeolus footprint.
+        lat_aeolus, lon_aeolus: float, location of the Aeolus footprint, unit -> degree.
+        caliop_filename: string, name of the colocated CALIOP granule.
+
+    Returns:
+        name of the saved csv file.
+    """
+    year_m = '{:04d}'.format(time_aeolus.year)
+    month_m = '{:02d}'.format(time_aeolus.month)
+    day_m = '{:02d}'.format(time_aeolus.day)
+
+    saving_dir = database_dir + '/%s/%s-%s-%s' % (year_m, year_m, month_m, day_m)
+    pathlib.Path(saving_dir).mkdir(parents=True, exist_ok=True)
+
+    saving_file = saving_dir + '/AEOLUS-%s.csv' % time_aeolus.strftime('%Y%m%dT%H%M%S')
+
+    with open(saving_file, "w") as output:
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(('AEOLUS_latitude', 'AEOLUS_longitude', 'CALIOP_filename'))
+        writer.writerow((lat_aeolus, lon_aeolus, caliop_filename))
+
+    return saving_file
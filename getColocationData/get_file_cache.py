@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    get_file_cache.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 23:40
+
+"""
+Helpers of the on-disk caches and outputs: the key of a set of source files, and the atomic writes.
+
+A cache is keyed by the names, modification times and sizes of its source files and by its configuration, any
+new, removed or modified source file or other configuration changes the key. The files are written to a
+temporary file renamed once complete, a killed script never leaves a partial file behind:
+
+    cache_key = get_files_cache_key(csv_files, config=(columns, time_key))
+    save_parquet_atomic(all_data, cache_file)
+"""
+
+import numpy as np
+import hashlib
+import json
+import os
+
+
+def get_files_cache_key(filenames, config=(), root_dir=None):
+    """
+    Key of a cache built from source files.
+
+    Parameters:
+        filenames: list of strings, source files, in the order they are read.
+        config: any JSON serialisable value (e.g. tuple of the options), configuration of the cache.
+        root_dir: string, the files are named by their path relative to root_dir, by their basename if None.
+
+    Returns:
+        cache_key: string, sha1 hex digest.
+    """
+    key = hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode())
+
+    for filename in filenames:
+        file_stat = os.stat(filename)
+        name = os.path.basename(filename) if root_dir is None else os.path.relpath(filename, root_dir)
+        key.update(('%s:%d:%d;' % (name, file_stat.st_mtime_ns, file_stat.st_size)).encode())
+
+    return key.hexdigest()
+
+
+def save_file_atomic(save_filename, write_file, tmp_filename=None):
+    """
+    Write a file through a temporary file renamed once written.
+
+    Parameters:
+        save_filename: string, file to write.
+        write_file: function writing the file, called with the name of the temporary file.
+        tmp_filename: string, temporary file, <save_filename>.tmp by default (e.g. <name>.tmp.nc for the writers
+        expecting an extension).
+    """
+    if tmp_filename is None:
+        tmp_filename = save_filename + '.tmp'
+
+    try:
+        write_file(tmp_filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+    os.replace(tmp_filename, save_filename)
+
+
+def save_parquet_atomic(data, save_filename, **parquet_options):
+    """Save a pandas DataFrame in a Parquet file (pyarrow, no index) through a temporary file"""
+    save_file_atomic(save_filename, lambda tmp_filename: data.to_parquet(tmp_filename, engine='pyarrow', index=False,
+                                                                           **parquet_options))
+
+
+def save_npz_atomic(save_filename, **arrays):
+    """Save numpy arrays in a npz file through a temporary file (np.savez would append .npz to a file name)"""
+    def write_npz(tmp_filename):
+        with open(tmp_filename, 'wb') as output:
+            np.savez(output, **arrays)
+
+    save_file_atomic(save_filename, write_npz)
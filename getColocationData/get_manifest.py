@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    get_manifest.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 16:32
+
+import csv
+import os
+
+# versions of the colocation processing, append a version when a change affects the saved colocation files,
+# with the first and last day (YYYY-MM-DD) of the Aeolus data affected by the change (None: no limit). The events
+# of the affected days processed with an earlier version are considered stale and processed again, the events of
+# the other days are kept.
+COLOCATION_CODE_VERSIONS = (
+    ('2.2', None, None),
+)
+COLOCATION_CODE_VERSION = COLOCATION_CODE_VERSIONS[-1][0]
+
+MANIFEST_FIELDS = ('aeolus_time', 'caliop_filename', 'code_version', 'aeolus_stamp', 'caliop_stamp',
+                   'status', 'nc_file')
+
+
+def get_manifest_file(savenc_subdir):
+    """Manifest of the colocation events of one day, saved next to the colocation files"""
+    return savenc_subdir + '/colocation_manifest.csv'
+
+
+def get_file_stamp(filename):
+    """Modification time and size of an input file, a file replaced in the archive gets a new stamp"""
+    if (filename is None) or (not os.path.exists(filename)):
+        return ''
+    file_stat = os.stat(filename)
+    return '%d-%d' % (file_stat.st_mtime_ns, file_stat.st_size)
+
+
+def load_manifest(savenc_subdir):
+    """
+    Load the manifest of one day.
+
+    Returns:
+        manifest: dict of rows (dict of MANIFEST_FIELDS) keyed by Aeolus time, empty if the day was never processed.
+    """
+    manifest = {}
+    manifest_file = get_manifest_file(savenc_subdir)
+
+    if os.path.exists(manifest_file):
+        with open(manifest_file, newline='') as csvfile:
+            for row in csv.DictReader(csvfile):
+                manifest[row['aeolus_time']] = row
+
+    return manifest
+
+
+def save_manifest(savenc_subdir, manifest):
+    """Save the manifest of one day, written to a temporary file first so that a crash never leaves it partial"""
+    manifest_file = get_manifest_file(savenc_subdir)
+
+    with open(manifest_file + '.tmp', 'w', newline='') as output:
+        writer = csv.DictWriter(output, fieldnames=MANIFEST_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        for aeolus_time in sorted(manifest):
+            writer.writerow(manifest[aeolus_time])
+
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+
+def is_version_stale(event_version, aeolus_time_str, code_versions=COLOCATION_CODE_VERSIONS):
+    """
+    An event processed with event_version is stale if a later version of code_versions affects its day, or if
+    event_version is unknown.
+
+    Parameters:
+        event_version: string, code version of the manifest row.
+        aeolus_time_str: string, time of the colocated Aeolus profile, e.g. 20210601T003502.
+        code_versions: tuple of (version, first affected day, last affected day), see COLOCATION_CODE_VERSIONS.
+    """
+    versions = [code_version[0] for code_version in code_versions]
+
+    if event_version not in versions:
+        return True
+
+    event_day = '%s-%s-%s' % (aeolus_time_str[0:4], aeolus_time_str[4:6], aeolus_time_str[6:8])
+
+    for (version, first_day, last_day) in code_versions[versions.index(event_version) + 1:]:
+        if ((first_day is None) or (event_day >= first_day)) & ((last_day is None) or (event_day <= last_day)):
+            return True
+
+    return False
+
+
+def is_event_finished(manifest, aeolus_time_str, caliop_filename, aeolus_stamp, caliop_stamp,
+                      code_versions=COLOCATION_CODE_VERSIONS):
+    """
+    An event is finished if it was saved (or skipped) by a code version still valid for its day (see
+    is_version_stale), from the same CALIOP granule and the same input files, and its colocation file still
+    exists. Failed and stale events are processed again.
+    """
+    row = manifest.get(aeolus_time_str)
+
+    if row is None:
+        return False
+
+    if (row['caliop_filename'] != caliop_filename) | (row['aeolus_stamp'] != aeolus_stamp) | \
+            (row['caliop_stamp'] != caliop_stamp) | is_version_stale(row['code_version'], aeolus_time_str,
+                                                                     code_versions):
+        return False
+
+    if row['status'] == 'done':
+        return os.path.exists(row['nc_file'])
+
+    return row['status'] == 'skipped'
+
+
+def update_manifest(manifest, aeolus_time_str, caliop_filename, aeolus_stamp, caliop_stamp, status, nc_file='',
+                    code_version=COLOCATION_CODE_VERSION):
+    """Record the status ('done', 'skipped' or 'failed') of an event"""
+    manifest[aeolus_time_str] = {'aeolus_time': aeolus_time_str,
+                                 'caliop_filename': caliop_filename,
+                                 'code_version': code_version,
+                                 'aeolus_stamp': aeolus_stamp,
+                                 'caliop_stamp': caliop_stamp,
+                                 'status': status,
+                                 'nc_file': nc_file if nc_file is not None else ''}
+
+
+def save_colocation_ref(ref_file, manifest):
+    """Rebuild the colocation_ref csv file of one day from the saved events of the manifest, atomically"""
+    with open(ref_file + '.tmp', "w") as output:
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(('Colocation_Datetime', 'Parameter_File_Location'))
+        for aeolus_time in sorted(manifest):
+            if manifest[aeolus_time]['status'] == 'done':
+                writer.writerow((aeolus_time, manifest[aeolus_time]['nc_file']))
+
+    os.replace(ref_file + '.tmp', ref_file)
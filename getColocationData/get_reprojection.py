@@ -8,6 +8,41 @@
 import numpy as np
 import math
 
+def get_tile_bounds(lat_colocation, lon_colocation, interval=10):
+    """
+    Bounds of the tile around a colocation, two intervals wide in latitude and longitude.
+
+    Returns:
+        lat_min, lat_max, lon_min, lon_max: float, unit -> degree.
+    """
+    lat_min = math.floor(lat_colocation / interval) * interval - interval
+    lat_max = lat_min + 2 * interval
+    lon_min = math.floor(lon_colocation / interval) * interval - interval
+    lon_max = lon_min + 2 * interval
+
+    return lat_min, lat_max, lon_min, lon_max
+
+def get_aeolus_index_window(time_aeolus, time_colocation, half_width=50):
+    """
+    Index window of the Aeolus profiles around a colocation, plus minus half_width profiles
+    to ensure only the target orbit from the entire daily file is extracted.
+
+    Parameters:
+        time_aeolus: numpy array, time of the Aeolus profiles (datetime or seconds since 2000-01-01).
+        time_colocation: time of the colocated Aeolus profile, same type as time_aeolus.
+        half_width: int, number of profiles kept on each side of the colocation.
+
+    Returns:
+        index_start, index_end: int, window [index_start, index_end) of the Aeolus profiles.
+    """
+    # Find the index in the time_aeolus array where the value is equal to time_colocation
+    index_colocation = np.where(time_aeolus == time_colocation)[0][0]
+
+    index_start = max(index_colocation - half_width, 0)
+    index_end = min(index_colocation + half_width, len(time_aeolus))
+
+    return index_start, index_end
+
 def reproject_observations(lat_colocation, lon_colocation, time_colocation,
                            lat_aeolus, lon_aeolus, alt_aeolus, time_aeolus,
                            beta_aeolus, alpha_aeolus, qc_aeolus, ber_aeolus, lod_aeolus,
@@ -15,20 +50,9 @@ def reproject_observations(lat_colocation, lon_colocation, time_colocation,
                            aerosol_type_caliop, feature_type_caliop, depolarization_ratio_caliop,
                            interval=10):
 
-    # Find the index in the time_aeolus array where the value is equal to time_colocation
-    index_colocation = np.where(time_aeolus == time_colocation)[0][0]
-
     # Set the start and end indices for the filtered lat and lon arrays
     # plus minus 50 to ensure only the target orbit from the entire .nc file is extracted
-    aeolus_index_start = index_colocation - 50
-    aeolus_index_end = index_colocation + 50
-
-    # If the start index is negative, set it to 0
-    if aeolus_index_start < 0:
-        aeolus_index_start = 0
-    # If the end index is greater than the length of the lat_aeolus array, set it to the length of the array
-    if aeolus_index_end > len(lat_aeolus):
-        aeolus_index_end = len(lat_aeolus)
+    (aeolus_index_start, aeolus_index_end) = get_aeolus_index_window(time_aeolus, time_colocation)
 
     # Filter the lat and lon arrays based on the start and end indices
     lat_aeolus_filtered = lat_aeolus[aeolus_index_start: aeolus_index_end][:]
@@ -41,10 +65,7 @@ def reproject_observations(lat_colocation, lon_colocation, time_colocation,
     lod_aeolus_filtered = lod_aeolus[aeolus_index_start: aeolus_index_end, :][:]
 
     # Compute the minimum and maximum values for the latitude and longitude ranges
-    lat_min = math.floor(lat_colocation / interval) * interval - interval
-    lat_max = lat_min + 2 * interval
-    lon_min = math.floor(lon_colocation / interval) * interval - interval
-    lon_max = lon_min + 2 * interval
+    (lat_min, lat_max, lon_min, lon_max) = get_tile_bounds(lat_colocation, lon_colocation, interval=interval)
 
     # Filter the lat_aeolus_filtered array based on the latitude range and store the result in lat_aeolus_cutoff
     lat_aeolus_cutoff = lat_aeolus_filtered[(lat_aeolus_filtered > lat_min) & (lat_aeolus_filtered < lat_max)]
@@ -85,48 +106,176 @@ def reproject_observations(lat_colocation, lon_colocation, time_colocation,
            feature_type_caliop_cutoff, depolarization_ratio_caliop_cutoff
 
 
-def resample_aeolus(lat_aeolus, alt_aeolus, data_aeolus, alt_caliop):
+def _count_edges_above(alt_edges, alt_target, inclusive=False):
     """
-    Resample the input data_aeolus based on the altitude values in alt_aeolus and alt_caliop.
+    Number of the bin edges of every profile above (or at, if inclusive) each target altitude.
 
     Parameters:
-        lat_aeolus: numpy array, latitude values for data_aeolus
-        alt_aeolus: numpy array, altitude values for data_aeolus, unit -> metres.
-        data_aeolus: numpy array, input data to be resampled,
-        alt_caliop: numpy array, altitude values to resample data_aeolus to, unit -> km.
+        alt_edges: numpy array (profiles, edges), non-increasing bin edges of every profile.
+        alt_target: numpy array, target altitudes sorted in ascending order.
 
     Returns:
-        data_aeolus_resample: numpy array, resampled data based on alt_caliop
+        edges_above: numpy array (profiles, targets) of int.
     """
+    (number_profiles, number_edges) = alt_edges.shape
+    number_target = np.size(alt_target)
 
-    # Replace any -1 values in alt_aeolus with NaN values
-    alt_aeolus[alt_aeolus == -1] = np.nan
-    data_aeolus[data_aeolus == -1.e6] = np.nan
-    # Convert altitude values from meters to kilometers
-    alt_aeolus = alt_aeolus * 1e-3
+    # position of every edge in the target altitudes, the edges below a target are counted with a histogram
+    edge_position = np.searchsorted(alt_target, alt_edges, side='right' if inclusive else 'left')
+    edge_position += (number_target + 1) * np.arange(number_profiles)[:, None]
+    edge_histogram = np.bincount(edge_position.ravel(), minlength=number_profiles * (number_target + 1))
+    edges_below = np.cumsum(edge_histogram.reshape(number_profiles, number_target + 1), axis=1)[:, :number_target]
 
-    # convert aeolus data with the given scaling factor
-    data_aeolus = data_aeolus * 1.e-6 * 1.e3
+    return number_edges - edges_below
 
-    # Create empty array for resampled data, with same shape as alt_aeolus
-    data_aeolus_resample = np.zeros((alt_aeolus.shape[0], np.size(alt_caliop)))
-    data_aeolus_resample[:] = np.nan
+def _integrate_profiles(alt_edges, data, bin_valid, alt_target):
+    """Integral of the piecewise constant profiles from the top of the profile down to each target altitude"""
+    number_edges = alt_edges.shape[1]
 
-    # Iterate through rows and columns of alt_aeolus and data_aeolus
-    for i in range(alt_aeolus.shape[0]):
-        alt_aeolus_i = alt_aeolus[i, :]
+    bin_width = alt_edges[:, :-1] - alt_edges[:, 1:]
+    bin_integral = np.where(bin_valid, data * np.where(bin_valid, bin_width, 0.), 0.)
+    edge_integral = np.concatenate((np.zeros((alt_edges.shape[0], 1)), np.cumsum(bin_integral, axis=1)), axis=1)
 
-        for k in range(np.size(alt_aeolus_i)):
-            if alt_aeolus_i[k] > 0:
-                if (k + 1) < len(alt_aeolus_i):
+    edges_above = _count_edges_above(alt_edges, alt_target)
+    bin_index = np.clip(edges_above - 1, 0, number_edges - 2)
+    bin_top = np.take_along_axis(alt_edges, bin_index, axis=1)
+    partial_integral = np.where(np.take_along_axis(bin_valid, bin_index, axis=1),
+                                np.take_along_axis(data, bin_index, axis=1) * (bin_top - alt_target), 0.)
 
-                    # Resample data based on nearest altitude value less than current value in alt_caliop
-                    data_aeolus_resample[i, (alt_caliop < alt_aeolus_i[k]) & (alt_caliop > alt_aeolus_i[k + 1])] = \
-                    data_aeolus[i, k]
+    profile_integral = np.take_along_axis(edge_integral, bin_index, axis=1) + partial_integral
+    profile_integral[edges_above == 0] = 0.
+    profile_integral[edges_above == number_edges] = np.broadcast_to(edge_integral[:, -1:], profile_integral.shape)[
+        edges_above == number_edges]
 
-    return data_aeolus_resample
+    return profile_integral
 
+def resample_profiles(alt_edges, data, alt_target, mode='nearest', bin_mask=None, fill_value=np.nan, inclusive=False):
+    """
+    Resample profiles given on range bins to a common altitude grid, for all the profiles at once.
 
+    Bin k of a profile spans the altitudes between alt_edges[:, k + 1] and alt_edges[:, k], the range bins
+    are ordered from the top to the bottom as in the Aeolus products. The inputs are not modified.
 
+    Parameters:
+        alt_edges: numpy array (profiles, bins + 1), altitude of the bin edges, NaN for missing edges, unit -> km.
+        data: numpy array (profiles, bins), value of every bin.
+        alt_target: numpy array, altitudes to resample the data to (e.g. CALIOP altitudes), unit -> km.
+        mode: string,
+              'nearest': value of the bin containing the target altitude,
+              'average': mean value of the bins overlapping the target cell,
+              'overlap': mean value of the bins weighted by their overlap with the target cell;
+              the target cells are bounded by the midpoints between adjacent target altitudes.
+        bin_mask: numpy array (profiles, bins) of bool or None, bins to be used.
+        fill_value: float, value of the target altitudes without data.
+        inclusive: bool, in 'nearest' mode, also assign the target altitudes equal to a bin edge
+                   (to the lower bin).
+
+    Returns:
+        data_resample: numpy array (profiles, targets).
+    """
+    alt_edges = np.asarray(alt_edges, dtype=np.float64)
+    data = np.asarray(data, dtype=np.float64)
+    alt_target = np.asarray(alt_target, dtype=np.float64)
+    number_edges = alt_edges.shape[1]
+
+    # work on ascending target altitudes, the original order is restored at the end
+    target_order = np.argsort(alt_target, kind='stable')
+    alt_target_sorted = alt_target[target_order]
+
+    # missing edges take the value of the edge above, so that the edges of every profile are monotonic
+    alt_edges_filled = np.fmin.accumulate(alt_edges, axis=1)
+
+    if inclusive & (mode == 'nearest'):
+        bin_valid = alt_edges[:, :-1] >= alt_edges[:, 1:]
+    else:
+        bin_valid = alt_edges[:, :-1] > alt_edges[:, 1:]
+    if bin_mask is not None:
+        bin_valid &= bin_mask
+
+    if mode == 'nearest':
+        # candidate bins touching each target altitude, the lowest valid one is kept
+        edges_above = _count_edges_above(alt_edges_filled, alt_target_sorted)
+        edges_above_or_at = _count_edges_above(alt_edges_filled, alt_target_sorted, inclusive=True)
+        if inclusive:
+            (bin_first, bin_last) = (edges_above - 1, edges_above_or_at - 1)
+        else:
+            (bin_first, bin_last) = (edges_above_or_at - 1, edges_above - 1)
+
+        last_valid_bin = np.maximum.accumulate(np.where(bin_valid, np.arange(number_edges - 1), -1), axis=1)
+        bin_index = np.take_along_axis(last_valid_bin, np.clip(bin_last, 0, number_edges - 2), axis=1)
+        target_valid = (bin_last >= 0) & (bin_first <= number_edges - 2) & (bin_index >= np.maximum(bin_first, 0))
+        bin_index = np.clip(bin_index, 0, number_edges - 2)
+
+        bin_top = np.take_along_axis(alt_edges, bin_index, axis=1)
+        bin_bottom = np.take_along_axis(alt_edges, bin_index + 1, axis=1)
+        if inclusive:
+            target_valid &= (bin_top >= alt_target_sorted) & (bin_bottom <= alt_target_sorted)
+        else:
+            target_valid &= (bin_top > alt_target_sorted) & (bin_bottom < alt_target_sorted)
+
+        data_resample_sorted = np.where(target_valid, np.take_along_axis(data, bin_index, axis=1), fill_value)
+
+    elif mode in ('average', 'overlap'):
+        # bounds of the target cells
+        alt_middle = (alt_target_sorted[1:] + alt_target_sorted[:-1]) / 2.
+        alt_lower = np.concatenate((alt_target_sorted[:1] - (alt_middle[:1] - alt_target_sorted[:1]), alt_middle))
+        alt_upper = np.concatenate((alt_middle, alt_target_sorted[-1:] + (alt_target_sorted[-1:] - alt_middle[-1:])))
+
+        bin_valid &= np.isfinite(data)
+
+        if mode == 'overlap':
+            data_integral = _integrate_profiles(alt_edges_filled, data, bin_valid, alt_lower) - \
+                            _integrate_profiles(alt_edges_filled, data, bin_valid, alt_upper)
+            coverage = _integrate_profiles(alt_edges_filled, np.ones(data.shape), bin_valid, alt_lower) - \
+                       _integrate_profiles(alt_edges_filled, np.ones(data.shape), bin_valid, alt_upper)
+        else:
+            # bins overlapping a cell: top above the cell lower bound and bottom below the cell upper bound
+            bin_first = np.maximum(_count_edges_above(alt_edges_filled, alt_upper, inclusive=True) - 1, 0)
+            bin_last = np.minimum(_count_edges_above(alt_edges_filled, alt_lower) - 1, number_edges - 2)
+            bin_last = np.maximum(bin_last, bin_first - 1)
+
+            data_sum = np.concatenate((np.zeros((data.shape[0], 1)),
+                                       np.cumsum(np.where(bin_valid, data, 0.), axis=1)), axis=1)
+            bin_count = np.concatenate((np.zeros((data.shape[0], 1)), np.cumsum(bin_valid, axis=1)), axis=1)
+
+            data_integral = np.take_along_axis(data_sum, bin_last + 1, axis=1) - \
+                            np.take_along_axis(data_sum, bin_first, axis=1)
+            coverage = np.take_along_axis(bin_count, bin_last + 1, axis=1) - \
+                       np.take_along_axis(bin_count, bin_first, axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data_resample_sorted = np.where(coverage > 0, data_integral / coverage, fill_value)
+
+    else:
+        raise ValueError("mode should be 'nearest', 'average' or 'overlap', not %s" % mode)
 
+    data_resample = np.empty(data_resample_sorted.shape)
+    data_resample[:, target_order] = data_resample_sorted
+
+    return data_resample
+
+def resample_aeolus(lat_aeolus, alt_aeolus, data_aeolus, alt_caliop, mode='nearest'):
+    """
+    Resample the input data_aeolus based on the altitude values in alt_aeolus and alt_caliop.
+
+    The inputs are not modified, the fill values of alt_aeolus (-1) and data_aeolus (-1.e6) are handled internally.
+
+    Parameters:
+        lat_aeolus: numpy array, latitude values for data_aeolus
+        alt_aeolus: numpy array, altitude values for data_aeolus, unit -> metres.
+        data_aeolus: numpy array, input data to be resampled,
+        alt_caliop: numpy array, altitude values to resample data_aeolus to, unit -> km.
+        mode: string, 'nearest', 'average' or 'overlap', see resample_profiles.
+
+    Returns:
+        data_aeolus_resample: numpy array, resampled data based on alt_caliop
+    """
+
+    # Replace any -1 values in alt_aeolus with NaN values, and convert altitude values from meters to kilometers
+    alt_aeolus = np.where(alt_aeolus == -1, np.nan, alt_aeolus) * 1e-3
+
+    # convert aeolus data with the given scaling factor
+    data_aeolus = np.where(data_aeolus == -1.e6, np.nan, data_aeolus) * 1.e-6 * 1.e3
 
+    # only the range bins with their top above the ground are used
+    return resample_profiles(alt_aeolus, data_aeolus, alt_caliop, mode=mode, bin_mask=alt_aeolus[:, :-1] > 0)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    process_colocation_event.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 15:20
+
+from getColocationData.save_colocated_data import save_colocation_nc_compressed
+from getColocationData.get_reprojection import get_tile_bounds, get_aeolus_index_window, \
+    reproject_observations
+from getColocationData.get_colocation import compute_colocation_metrics
+from getColocationData.get_aeolus import aeolus_time_to_datetime, datetime_to_aeolus_time
+from getColocationData.get_caliop import find_caliop_file
+from getColocationData.get_file_cache import save_file_atomic
+from getColocationData.get_cache import read_aeolus_time_cached, extract_variables_from_aeolus_cached, \
+    extract_variables_from_caliop_cached
+from datetime import datetime, timedelta
+import numpy as np
+import csv
+import os
+
+
+def get_colocation_dir_daily(colocation_fp_dir, date):
+    """Daily directory of the colocation footprint csv files"""
+    year = '{:04d}'.format(date.year)
+    month = '{:02d}'.format(date.month)
+    day = '{:02d}'.format(date.day)
+
+    return colocation_fp_dir + '/%s/%s-%s-%s/' % (year, year, month, day)
+
+
+def get_savenc_subdir(savenc_dir, date):
+    """Daily directory of the colocation netcdf files and graphs"""
+    year = '{:04d}'.format(date.year)
+    month = '{:02d}'.format(date.month)
+    day = '{:02d}'.format(date.day)
+
+    return savenc_dir + '/%s/%s-%s-%s' % (year, year, month, day)
+
+
+def get_aeolus_daily_file(Aeolus_dir, date):
+    """Daily Aeolus netcdf file of the mirror, see Aeolus_archive_mirror.py"""
+    year = '{:04d}'.format(date.year)
+    month = '{:02d}'.format(date.month)
+    day = '{:02d}'.format(date.day)
+
+    return Aeolus_dir + '/%s-%s/%s-%s-%s.nc' % (year, month, year, month, day)
+
+
+def find_caliop_colocation_file(CALIOP_dir, caliop_filename, date):
+    """Search the CALIOP granule on the specified date, then on the previous and the following days"""
+    for date_i in (date, date - timedelta(days=1), date + timedelta(days=1)):
+        caliop_colocation_file = find_caliop_file(CALIOP_dir, caliop_filename, date_i)
+        if caliop_colocation_file is not None:
+            return caliop_colocation_file
+
+    return None
+
+
+def get_colocation_events(colocation_fp_dir, date, logger):
+    """
+    List the colocation events of one day from the footprint csv files, see save_colocation_footprint.
+
+    Returns:
+        events: list of (aeolus_time_str, lat_colocation, lon_colocation, caliop_filename), sorted by Aeolus time.
+    """
+    colocation_dir_daily = get_colocation_dir_daily(colocation_fp_dir, date)
+
+    events = []
+
+    if not os.path.isdir(colocation_dir_daily):
+        logger.warning(f'{colocation_dir_daily} not exists, no colocation data found.')
+        return events
+
+    for file in sorted(os.listdir(colocation_dir_daily)):
+
+        aeolus_time_str = (file.split('AEOLUS-'))[1].split('.csv')[0]
+
+        with open(colocation_dir_daily + file, newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            try:
+                for row in reader:
+                    lat_colocation = float(row['AEOLUS_latitude'])
+                    lon_colocation = float(row['AEOLUS_longitude'])
+                    caliop_filename = row['CALIOP_filename']
+
+                    if lat_colocation > 180.:
+                        lat_colocation = lat_colocation - 360.
+                    if lon_colocation > 180.:
+                        lon_colocation = lon_colocation - 360.
+            except:
+                logger.error('Error reading colocation footprint')
+                continue
+
+        events.append((aeolus_time_str, lat_colocation, lon_colocation, caliop_filename))
+
+    return events
+
+
+def process_colocation_event(aeolus_time_str, lat_colocation, lon_colocation, caliop_filename, date,
+                             Aeolus_dir, CALIOP_dir, savenc_subdir, logger,
+                             temporal_wd=10., aoi=(-90., 90., -180., 180.)):
+    """
+    Read, reproject and save one Aeolus-CALIOP colocation event.
+
+    Parameters:
+        aeolus_time_str: string, time of the colocated Aeolus profile, e.g. 20210601T003502.
+        lat_colocation, lon_colocation: float, location of the colocated Aeolus profile, unit -> degree.
+        caliop_filename: string, name of the colocated CALIOP granule.
+        date: datetime, day of the colocation.
+        Aeolus_dir: string, daily Aeolus netcdf archive.
+        CALIOP_dir: string, CALIOP APro5km archive.
+        savenc_subdir: string, daily directory of the output netcdf.
+        logger: logging object.
+        temporal_wd: float, temporal window, unit -> hours.
+        aoi: (lat_down, lat_up, lon_left, lon_right), area of interest, unit -> degree.
+
+    Returns:
+        saveFilenameNC: string, saved netcdf file, or None if the event is skipped.
+    """
+    (lat_down, lat_up, lon_left, lon_right) = aoi
+
+    aeolus_time_datetime = datetime.strptime(aeolus_time_str, '%Y%m%dT%H%M%S')
+
+    logger.info('>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>')
+    logger.info('Fetching colocations......')
+    logger.info('lat, lon: (%.2f, %.2f)' % (float(lat_colocation), float(lon_colocation)))
+
+    if not ((lat_colocation > lat_down) & (lat_colocation < lat_up) &
+            (lon_colocation > lon_left) & (lon_colocation < lon_right)):
+        logger.warning("Colocation profiles exceed the AOI, go to next......")
+        return None
+
+    aeolus_colocation_file = get_aeolus_daily_file(Aeolus_dir, date)
+
+    caliop_colocation_file = find_caliop_colocation_file(CALIOP_dir, caliop_filename, date)
+    if caliop_colocation_file is None:
+        logger.error("CALIOP file not found in specified date or surrounding days")
+        return None
+
+    cliop_time_datetime = datetime.strptime(caliop_colocation_file[-25:-6], '%Y-%m-%dT%H-%M-%S')
+    abs_temportal_distance = abs(aeolus_time_datetime - cliop_time_datetime)
+    abs_temportal_total_hours = abs_temportal_distance.total_seconds() / 3600.
+
+    if abs_temportal_distance >= timedelta(hours=temporal_wd):
+        logger.warning("Colocation profiles exceed minimum temporal window, go to next......")
+        return None
+
+    # only the profiles of the colocation tile are decoded: the Aeolus orbit window around the
+    # colocation is located from the 1-D time array, read once per daily file
+    (lat_min, lat_max, lon_min, lon_max) = get_tile_bounds(lat_colocation, lon_colocation, interval=10)
+
+    time_aeolus = read_aeolus_time_cached(aeolus_colocation_file)
+    (aeolus_index_start, aeolus_index_end) = \
+        get_aeolus_index_window(time_aeolus, datetime_to_aeolus_time(aeolus_time_datetime))
+    aeolus_time_range = tuple(aeolus_time_to_datetime(time_aeolus[[aeolus_index_start, aeolus_index_end - 1]]))
+
+    (footprint_lat_aeolus, footprint_lon_aeolus, altitude_aeolus,
+     footprint_time_aeolus, beta_aeolus_mb, alpha_aeolus_mb,
+     qc_aeolus_mb, ber_aeolus_mb, lod_aeolus_mb) = \
+        extract_variables_from_aeolus_cached(aeolus_colocation_file, logger, time_range=aeolus_time_range,
+                                             lat_range=(lat_min, lat_max), return_ber_lod=True)
+
+    (footprint_lat_caliop, footprint_lon_caliop,
+     alt_caliop, beta_caliop, alpha_caliop,
+     aerosol_type_caliop, feature_type_caliop, caliop_Depolarization_Ratio_list,
+     caliop_tropopause_height) \
+        = extract_variables_from_caliop_cached(caliop_colocation_file, logger, lat_range=(lat_min, lat_max))
+
+    (lat_aeolus_cutoff, lon_aeolus_cutoff, alt_aeolus_cutoff,
+     beta_aeolus_cutoff, alpha_aeolus_cutoff,
+     qc_aeolus_cutoff, ber_aeolus_cutoff, lod_aeolus_cutoff,
+     lat_caliop_cutoff, lon_caliop_cutoff, beta_caliop_cutoff, alpha_caliop_cutoff,
+     aerosol_type_caliop_cutoff, feature_type_caliop_cutoff, depolarization_ratio_caliop_cutoff) = \
+        reproject_observations(lat_colocation, lon_colocation, aeolus_time_datetime,
+                               footprint_lat_aeolus, footprint_lon_aeolus, altitude_aeolus,
+                               footprint_time_aeolus, beta_aeolus_mb, alpha_aeolus_mb,
+                               qc_aeolus_mb, ber_aeolus_mb, lod_aeolus_mb,
+                               footprint_lat_caliop, footprint_lon_caliop, beta_caliop,
+                               alpha_caliop, aerosol_type_caliop,
+                               feature_type_caliop, caliop_Depolarization_Ratio_list,
+                               interval=10)
+
+    # the Aeolus fill values are saved as NaN
+    alt_aeolus_cutoff = np.where(alt_aeolus_cutoff == -1, np.nan, alt_aeolus_cutoff)
+    beta_aeolus_cutoff = np.where(beta_aeolus_cutoff == -1.e6, np.nan, beta_aeolus_cutoff)
+    alpha_aeolus_cutoff = np.where(alpha_aeolus_cutoff == -1.e6, np.nan, alpha_aeolus_cutoff)
+
+    saveFilenameNC = savenc_subdir + '/%s.nc' % aeolus_time_str
+
+    # the figure is rendered afterwards from the netcdf file, see render_colocation_figures.py
+    spa_dis = compute_colocation_metrics(lat_colocation, lon_colocation, lat_aeolus_cutoff,
+                                         lat_caliop_cutoff, lon_caliop_cutoff)[0]
+    tem_dis = abs_temportal_total_hours
+
+    save_file_atomic(saveFilenameNC, lambda saveFilenameNC_tmp: save_colocation_nc_compressed(
+        saveFilenameNC_tmp, lat_colocation, lon_colocation,
+        lat_aeolus_cutoff, lon_aeolus_cutoff, alt_aeolus_cutoff,
+        beta_aeolus_cutoff, alpha_aeolus_cutoff, qc_aeolus_cutoff,
+        ber_aeolus_cutoff, lod_aeolus_cutoff,
+        lat_caliop_cutoff, lon_caliop_cutoff, alt_caliop, beta_caliop_cutoff,
+        alpha_caliop_cutoff, aerosol_type_caliop_cutoff, feature_type_caliop_cutoff,
+        depolarization_ratio_caliop_cutoff, tem_dis, spa_dis))
+
+    return saveFilenameNC
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    produce_global_colocation_parallel.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 15:48
+
+"""
+Produce the global colocation database over a date range on a single node, without SLURM.
+
+The colocation events of all the days are fanned out over a local process pool, every worker decodes its own
+Aeolus and CALIOP files. The output paths only depend on the event (<savenc_dir>/<year>/<year>-<month>-<day>/
+<Aeolus time>.nc) and the failed events are retried.
+
+Every finished event is recorded in the manifest of its day (see get_manifest.py) with its CALIOP granule, the
+code version and the stamps of the input files. A rerun skips the finished events and only processes the new,
+failed or stale ones, so that an interrupted run is resumed. A fix is released by appending a version to
+COLOCATION_CODE_VERSIONS with the days it affects, a rerun then reprocesses the events of those days only.
+The colocation_ref csv files of the processed days are rebuilt from the manifests.
+
+usage: python produce_global_colocation_parallel.py 2021-06-01 2021-06-30 --workers 32
+"""
+
+# Import external libraries
+import os
+import sys
+import argparse
+import pathlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+
+# Import internal modules
+sys.path.append('../')
+from getColocationData.process_colocation_event import get_colocation_events, get_savenc_subdir, \
+    get_aeolus_daily_file, find_caliop_colocation_file, process_colocation_event
+from getColocationData.get_manifest import load_manifest, save_manifest, update_manifest, is_event_finished, \
+    get_file_stamp, save_colocation_ref
+from getColocationData.get_cache import aeolus_cache, caliop_cache
+from datetime import datetime, timedelta
+
+# Set up data directories
+# aeolus data mirror
+Aeolus_JASMIN_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/aeolus_archive'
+# caliop v-20 and v-21 data
+CALIOP_JASMIN_dir = '/gws/nopw/j04/eo_shared_data_vol1/satellite/calipso/APro5km'
+# colocation footprint data in csv files
+colocation_fp_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/Colocation/colocation_database'
+# dir to save graphs and netcdf
+savenc_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/Database_v2'
+
+temporal_wd = 10. # hours of temporal window
+aoi = (-90., 90., -180., 180.) # lat_down, lat_up, lon_left, lon_right
+
+
+def init_worker(cache_bytes):
+    """Every worker keeps its own decoded file caches, bounded so that all the workers fit in memory"""
+    aeolus_cache.max_bytes = cache_bytes
+    caliop_cache.max_bytes = cache_bytes
+
+
+def run_colocation_event(event):
+    """Process one event in a worker, event: (date_str, aeolus_time_str, lat, lon, caliop_filename)"""
+    (date_str, aeolus_time_str, lat_colocation, lon_colocation, caliop_filename) = event
+    date = datetime.strptime(date_str, '%Y-%m-%d')
+
+    return process_colocation_event(aeolus_time_str, lat_colocation, lon_colocation, caliop_filename, date,
+                                    Aeolus_JASMIN_dir, CALIOP_JASMIN_dir, get_savenc_subdir(savenc_dir, date),
+                                    logging.getLogger(), temporal_wd=temporal_wd, aoi=aoi)
+
+
+def run_events(events, workers, retries, cache_bytes, logger, on_result=None):
+    """
+    Run the events over a process pool, the failed events are retried up to retries times. The pool is
+    restarted with the remaining events if a worker dies, counting one attempt for the events in flight.
+    on_result(event, status, saveFilenameNC) is called in the main process when an event is finished,
+    status being 'done', 'skipped' or 'failed'.
+
+    Returns:
+        failed_events: list of the events still failing after the retries.
+    """
+    attempts = {event: 0 for event in events}
+    pending = deque(events)
+    failed_events = []
+
+    while pending:
+        in_flight = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(cache_bytes,)) as executor:
+
+                while pending or in_flight:
+
+                    # only a few events per worker are submitted at a time, a dying worker only affects them
+                    while pending and (len(in_flight) < 2 * workers):
+                        in_flight[executor.submit(run_colocation_event, pending[0])] = pending[0]
+                        pending.popleft()
+
+                    (done, _) = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        error = future.exception()
+                        if isinstance(error, BrokenProcessPool):
+                            raise error
+
+                        event = in_flight.pop(future)
+                        if error is None:
+                            saveFilenameNC = future.result()
+                            if on_result is not None:
+                                on_result(event, 'skipped' if saveFilenameNC is None else 'done', saveFilenameNC)
+                        else:
+                            attempts[event] += 1
+                            if attempts[event] <= retries:
+                                logger.warning('Event %s failed (%s), retry %d/%d'
+                                               % (event[1], error, attempts[event], retries))
+                                pending.append(event)
+                            else:
+                                logger.error('Event %s failed after %d retries: %s' % (event[1], retries, error))
+                                failed_events.append(event)
+                                if on_result is not None:
+                                    on_result(event, 'failed', None)
+
+        except BrokenProcessPool:
+            logger.error('A worker died, restarting the process pool')
+            for event in in_flight.values():
+                attempts[event] += 1
+                if attempts[event] <= retries:
+                    pending.append(event)
+                else:
+                    failed_events.append(event)
+                    if on_result is not None:
+                        on_result(event, 'failed', None)
+
+    return failed_events
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Produce the global colocation database over a date range.")
+    parser.add_argument("start_date", type=str, help="First day in the format YYYY-MM-DD.")
+    parser.add_argument("end_date", type=str, help="Last day in the format YYYY-MM-DD.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--retries", type=int, default=2, help="Number of retries of a failed event.")
+    parser.add_argument("--cache_mb", type=int, default=512, help="Decoded file cache per worker, in MB.")
+    parser.add_argument("--force", action='store_true', help="Process again the events already finished.")
+    args = parser.parse_args()
+
+    script_base, script_ext = os.path.splitext(sys.modules['__main__'].__file__)
+
+    logging.basicConfig(format='%(asctime)s %(process)d %(levelname)s %(message)s',
+                        filemode='w',
+                        filename=script_base + '.log',
+                        level=logging.INFO)
+
+    # Get a logger object
+    logger = logging.getLogger()
+
+    start_date_datetime = datetime.strptime(args.start_date, '%Y-%m-%d')
+    end_date_datetime = datetime.strptime(args.end_date, '%Y-%m-%d')
+
+    # collect the events of all the days, skipping the ones finished with the same code version and inputs
+    manifests = {}
+    event_stamps = {}
+    events = []
+    while start_date_datetime <= end_date_datetime:
+
+        date_str = start_date_datetime.strftime('%Y-%m-%d')
+        savenc_subdir = get_savenc_subdir(savenc_dir, start_date_datetime)
+        manifest = load_manifest(savenc_subdir)
+        aeolus_stamp = get_file_stamp(get_aeolus_daily_file(Aeolus_JASMIN_dir, start_date_datetime))
+
+        for (aeolus_time_str, lat_colocation, lon_colocation, caliop_filename) in \
+                get_colocation_events(colocation_fp_dir, start_date_datetime, logger):
+
+            caliop_stamp = get_file_stamp(find_caliop_colocation_file(CALIOP_JASMIN_dir, caliop_filename,
+                                                                      start_date_datetime))
+
+            if (not args.force) & is_event_finished(manifest, aeolus_time_str, caliop_filename,
+                                                    aeolus_stamp, caliop_stamp):
+                continue
+
+            event = (date_str, aeolus_time_str, lat_colocation, lon_colocation, caliop_filename)
+            events.append(event)
+            event_stamps[event] = (aeolus_stamp, caliop_stamp)
+            manifests[date_str] = manifest
+
+        start_date_datetime += timedelta(days=1)
+
+    # only the days with events to be processed are touched
+    for date_str in manifests:
+        pathlib.Path(get_savenc_subdir(savenc_dir, datetime.strptime(date_str, '%Y-%m-%d'))).mkdir(
+            parents=True, exist_ok=True)
+
+    def record_event(event, status, saveFilenameNC):
+        """Update the manifest of the day of the event, saved after every event so that a crash loses nothing"""
+        (date_str, aeolus_time_str, lat_colocation, lon_colocation, caliop_filename) = event
+        (aeolus_stamp, caliop_stamp) = event_stamps[event]
+
+        update_manifest(manifests[date_str], aeolus_time_str, caliop_filename, aeolus_stamp, caliop_stamp,
+                        status, saveFilenameNC)
+        save_manifest(get_savenc_subdir(savenc_dir, datetime.strptime(date_str, '%Y-%m-%d')), manifests[date_str])
+
+    logger.info('%d colocation events to be processed on %d days with %d workers'
+                % (len(events), len(manifests), args.workers))
+
+    failed_events = run_events(events, args.workers, args.retries, args.cache_mb * 1024 ** 2, logger,
+                               on_result=record_event)
+
+    for date_str in manifests:
+        savenc_subdir = get_savenc_subdir(savenc_dir, datetime.strptime(date_str, '%Y-%m-%d'))
+        save_colocation_ref(savenc_subdir + '/colocation_ref_%s-0000.csv' % date_str, manifests[date_str])
+
+    logger.info('%d events processed, %d failed' % (len(events) - len(failed_events), len(failed_events)))
+    for event in failed_events:
+        logger.error('Failed event: %s %s' % (event[1], event[4]))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    render_colocation_figures.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 17:05
+
+"""
+Render the colocation figures of a date range from the saved netcdf files.
+
+The colocation production only saves the netcdf files, the figures are an optional stage run afterwards
+over its own process pool. The saved events are listed from the daily manifests (see get_manifest.py),
+a figure is only rendered again if it is missing or older than its netcdf file.
+
+usage: python render_colocation_figures.py 2021-06-01 2021-06-30 --workers 8
+"""
+
+# Import external libraries
+import os
+import sys
+import argparse
+import logging
+import matplotlib
+matplotlib.use('Agg')
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Import internal modules
+sys.path.append('../')
+from getColocationData.process_colocation_event import get_savenc_subdir
+from getColocationData.get_manifest import load_manifest
+from getColocationData.get_basemap import plot_colocation_nc
+from datetime import datetime, timedelta
+
+# dir of the saved graphs and netcdf
+savenc_dir = '/gws/pw/j07/nceo_aerosolfire/rsong/project/global_aerosol/Database_v2'
+
+
+def get_figure_filename(ncFilename):
+    """Figure of a colocation file, saved next to it"""
+    return os.path.splitext(ncFilename)[0] + '.png'
+
+
+def render_colocation_figure(ncFilename):
+    """Render one colocation figure in a worker, written to a temporary file first"""
+    saveFilenamePNG = get_figure_filename(ncFilename)
+
+    plot_colocation_nc(ncFilename, saveFilenamePNG + '.tmp.png', logging.getLogger())
+    os.replace(saveFilenamePNG + '.tmp.png', saveFilenamePNG)
+
+    return saveFilenamePNG
+
+
+def get_figures_to_render(savenc_dir, start_date_datetime, end_date_datetime, overwrite=False):
+    """List the saved colocation files of the date range without an up-to-date figure"""
+    ncFile_list = []
+
+    while start_date_datetime <= end_date_datetime:
+
+        manifest = load_manifest(get_savenc_subdir(savenc_dir, start_date_datetime))
+
+        for aeolus_time in sorted(manifest):
+            ncFilename = manifest[aeolus_time]['nc_file']
+
+            if (manifest[aeolus_time]['status'] != 'done') or (not os.path.exists(ncFilename)):
+                continue
+
+            saveFilenamePNG = get_figure_filename(ncFilename)
+            if (not overwrite) and os.path.exists(saveFilenamePNG) and \
+                    (os.path.getmtime(saveFilenamePNG) >= os.path.getmtime(ncFilename)):
+                continue
+
+            ncFile_list.append(ncFilename)
+
+        start_date_datetime += timedelta(days=1)
+
+    return ncFile_list
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Render the colocation figures over a date range.")
+    parser.add_argument("start_date", type=str, help="First day in the format YYYY-MM-DD.")
+    parser.add_argument("end_date", type=str, help="Last day in the format YYYY-MM-DD.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--overwrite", action='store_true', help="Render again the existing figures.")
+    args = parser.parse_args()
+
+    script_base, script_ext = os.path.splitext(sys.modules['__main__'].__file__)
+
+    logging.basicConfig(format='%(asctime)s %(process)d %(levelname)s %(message)s',
+                        filemode='w',
+                        filename=script_base + '.log',
+                        level=logging.INFO)
+
+    # Get a logger object
+    logger = logging.getLogger()
+
+    ncFile_list = get_figures_to_render(savenc_dir, datetime.strptime(args.start_date, '%Y-%m-%d'),
+                                        datetime.strptime(args.end_date, '%Y-%m-%d'), overwrite=args.overwrite)
+
+    logger.info('%d colocation figures to be rendered with %d workers' % (len(ncFile_list), args.workers))
+
+    failed_figures = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(render_colocation_figure, ncFilename): ncFilename for ncFilename in ncFile_list}
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                logger.error('Figure of %s failed: %s' % (futures[future], future.exception()))
+                failed_figures += 1
+
+    logger.info('%d figures rendered, %d failed' % (len(ncFile_list) - failed_figures, failed_figures))
@@ -7,6 +7,7 @@
 
 from netCDF4 import Dataset
 import numpy as np
+from Aeolus.aeolus_qc import apply_qc_filter
 
 def save_colocation_nc(saveFilename, lat_colocation, lon_colocation,
                        lat_aeolus, lon_aeolus, alt_aeolus,
@@ -86,3 +87,177 @@ def save_colocation_nc(saveFilename, lat_colocation, lon_colocation,
 
     nc_alt_caliop = ncfile_caliop.createVariable('caliop_altitude', 'f4', ('y_caliop'))
     nc_alt_caliop[:] = alt_caliop
+
+    ncfile.close()
+
+
+# encoding of the colocation variables in save_colocation_nc_compressed: (dtype, scale_factor, add_offset, _FillValue),
+# the coordinates are packed in integers, the coefficients span several decades and are kept in float32
+# since a linear integer packing would lose the small values
+COLOCATION_NC_ENCODING = {
+    'latitude': ('i4', 1.e-5, 0., -2147483647),      # degree, ~1 m resolution
+    'longitude': ('i4', 1.e-5, 0., -2147483647),     # degree
+    'aeolus_altitude': ('i4', 1.e-2, 0., -2147483647),  # m
+    'caliop_altitude': ('i4', 1.e-5, 0., -2147483647),  # km
+    'coefficient': ('f4', None, None, np.float32(np.nan)),
+    'qc': ('u1', None, None, None),
+    'classification': ('i1', None, None, None),
+}
+
+
+def pack_values(values, encoding):
+    """NaN values are masked so that they are written as the fill value of a packed variable"""
+    values = np.asarray(values)
+
+    if (encoding[1] is not None) and np.issubdtype(values.dtype, np.floating):
+        invalid = ~np.isfinite(values)
+        return np.ma.masked_array(np.where(invalid, 0., values), mask=invalid)
+
+    return values
+
+
+def _create_compressed_variable(ncgroup, name, dimensions, values, encoding, chunk_profiles, complevel):
+    """Create a zlib/shuffle compressed variable, chunked by blocks of chunk_profiles profiles (last dimension)"""
+    (dtype, scale_factor, add_offset, fill_value) = encoding
+
+    chunksizes = None
+    if len(dimensions) > 0:
+        chunksizes = [max(ncgroup.dimensions[dim].size, 1) for dim in dimensions]
+        chunksizes[-1] = min(chunksizes[-1], chunk_profiles)
+
+    ncvariable = ncgroup.createVariable(name, dtype, dimensions, zlib=len(dimensions) > 0, complevel=complevel,
+                                        shuffle=True, chunksizes=chunksizes, fill_value=fill_value)
+    if scale_factor is not None:
+        ncvariable.scale_factor = scale_factor
+        ncvariable.add_offset = add_offset
+
+    ncvariable[:] = pack_values(values, encoding)
+
+    return ncvariable
+
+
+def save_colocation_nc_compressed(saveFilename, lat_colocation, lon_colocation,
+                                  lat_aeolus, lon_aeolus, alt_aeolus,
+                                  beta_aeolus, alpha_aeolus,
+                                  qc_aeolus, ber_aeolus, lod_aeolus,
+                                  lat_caliop, lon_caliop, alt_caliop,
+                                  beta_caliop, alpha_caliop,
+                                  aerosol_type_caliop, feature_type_caliop,
+                                  depolarization_ratio_caliop,
+                                  tem_dis, spa_dis, complevel=4, chunk_profiles=64):
+    """
+    Save a colocation event with the groups, variable names and layout of save_colocation_nc, so that the
+    readers are unchanged, but with zlib/shuffle compression, chunks of chunk_profiles profiles over the full
+    height (the readers take the profiles around the colocation), integer packing of the coordinates,
+    int8 CALIOP classifications and fill values (masked on reading) in place of NaN.
+
+    Parameters:
+        complevel: int, zlib compression level.
+        chunk_profiles: int, number of profiles per chunk.
+        The other parameters are those of save_colocation_nc.
+    """
+    ncfile = Dataset(saveFilename, mode='w', format='NETCDF4')
+    ncfile.Conventions = 'CF-1.8'
+
+    ncfile_colocation = ncfile.createGroup("colocation_info")
+    for (name, values) in (('tem_dis', tem_dis), ('spa_dis', spa_dis),
+                           ('latitude', lat_colocation), ('longitude', lon_colocation)):
+        ncfile_colocation.createVariable(name, 'f4', ())[:] = values
+    ncfile_colocation['tem_dis'].units = 'hours'
+    ncfile_colocation['spa_dis'].units = 'km'
+    ncfile_colocation['latitude'].units = 'degrees_north'
+    ncfile_colocation['longitude'].units = 'degrees_east'
+
+    ncfile_aeolus = ncfile.createGroup("aeolus_data")
+    ncfile_aeolus.createDimension('x_aeolus', beta_aeolus.shape[0])
+    ncfile_aeolus.createDimension('y_aeolus', beta_aeolus.shape[1])
+    ncfile_aeolus.createDimension('alt_mid_aeolus', beta_aeolus.shape[1] + 1)
+
+    for (name, dimensions, values, encoding, units) in (
+            ('aeolus_latitude', ('x_aeolus',), lat_aeolus, 'latitude', 'degrees_north'),
+            ('aeolus_longitude', ('x_aeolus',), lon_aeolus, 'longitude', 'degrees_east'),
+            ('aeolus_beta', ('y_aeolus', 'x_aeolus'), beta_aeolus.T, 'coefficient', None),
+            ('aeolus_alpha', ('y_aeolus', 'x_aeolus'), alpha_aeolus.T, 'coefficient', None),
+            ('aeolus_qc', ('y_aeolus', 'x_aeolus'), qc_aeolus.T, 'qc', None),
+            ('aeolus_ber', ('y_aeolus', 'x_aeolus'), ber_aeolus.T, 'coefficient', None),
+            ('aeolus_lod', ('y_aeolus', 'x_aeolus'), lod_aeolus.T, 'coefficient', None),
+            ('aeolus_altitude', ('alt_mid_aeolus', 'x_aeolus'), alt_aeolus.T, 'aeolus_altitude', 'm')):
+        ncvariable = _create_compressed_variable(ncfile_aeolus, name, dimensions, values,
+                                                 COLOCATION_NC_ENCODING[encoding], chunk_profiles, complevel)
+        if units is not None:
+            ncvariable.units = units
+
+    ncfile_caliop = ncfile.createGroup("caliop_data")
+    ncfile_caliop.createDimension('x_caliop', beta_caliop.shape[1])
+    ncfile_caliop.createDimension('y_caliop', beta_caliop.shape[0])
+
+    for (name, dimensions, values, encoding, units) in (
+            ('caliop_latitude', ('x_caliop',), lat_caliop, 'latitude', 'degrees_north'),
+            ('caliop_longitude', ('x_caliop',), lon_caliop, 'longitude', 'degrees_east'),
+            ('caliop_beta', ('y_caliop', 'x_caliop'), beta_caliop, 'coefficient', 'km-1 sr-1'),
+            ('caliop_alpha', ('y_caliop', 'x_caliop'), alpha_caliop, 'coefficient', 'km-1'),
+            ('aerosol_type_caliop', ('y_caliop', 'x_caliop'), aerosol_type_caliop, 'classification', None),
+            ('feature_type_caliop', ('y_caliop', 'x_caliop'), feature_type_caliop, 'classification', None),
+            ('caliop_depolarization', ('y_caliop', 'x_caliop'), depolarization_ratio_caliop, 'coefficient', '1'),
+            ('caliop_altitude', ('y_caliop',), alt_caliop, 'caliop_altitude', 'km')):
+        ncvariable = _create_compressed_variable(ncfile_caliop, name, dimensions, values,
+                                                 COLOCATION_NC_ENCODING[encoding], chunk_profiles, complevel)
+        if units is not None:
+            ncvariable.units = units
+
+    ncfile.close()
+
+
+def _fill_nan(values):
+    """Masked values of a float variable as NaN, integer variables are returned unchanged"""
+    if np.issubdtype(values.dtype, np.floating):
+        return np.ma.filled(values, np.nan)
+
+    return np.ma.getdata(values)
+
+
+def read_colocation_nc(saveFilename, qc_filter=None):
+    """
+    Read a colocation file saved by save_colocation_nc, the arrays are returned with the layout of its inputs
+    (Aeolus arrays with the profiles on the first axis, CALIOP arrays with the profiles on the last axis).
+
+    The fill values of save_colocation_nc_compressed are returned as NaN, the files of both writers read the same.
+
+    Parameters:
+        saveFilename: string, colocation file.
+        qc_filter: names of the Aeolus QC masks (e.g. ('backscatter', 'ber')), the Aeolus values flagged invalid
+        are returned as NaN, see Aeolus.aeolus_qc.apply_qc_filter.
+
+    Returns:
+        colocation_data: dict of numpy arrays keyed by the names of the save_colocation_nc arguments.
+    """
+    colocation_data = {}
+
+    with Dataset(saveFilename, mode='r') as ncfile:
+
+        ncfile_colocation = ncfile['colocation_info']
+        colocation_data['tem_dis'] = float(ncfile_colocation['tem_dis'][...])
+        colocation_data['spa_dis'] = float(ncfile_colocation['spa_dis'][...])
+        colocation_data['lat_colocation'] = float(ncfile_colocation['latitude'][...])
+        colocation_data['lon_colocation'] = float(ncfile_colocation['longitude'][...])
+
+        ncfile_aeolus = ncfile['aeolus_data']
+        colocation_data['lat_aeolus'] = _fill_nan(ncfile_aeolus['aeolus_latitude'][:])
+        colocation_data['lon_aeolus'] = _fill_nan(ncfile_aeolus['aeolus_longitude'][:])
+        for (key, variable) in (('alt_aeolus', 'aeolus_altitude'), ('beta_aeolus', 'aeolus_beta'),
+                                ('alpha_aeolus', 'aeolus_alpha'), ('qc_aeolus', 'aeolus_qc'),
+                                ('ber_aeolus', 'aeolus_ber'), ('lod_aeolus', 'aeolus_lod')):
+            colocation_data[key] = _fill_nan(ncfile_aeolus[variable][:]).T
+
+        ncfile_caliop = ncfile['caliop_data']
+        for (key, variable) in (('lat_caliop', 'caliop_latitude'), ('lon_caliop', 'caliop_longitude'),
+                                ('alt_caliop', 'caliop_altitude'), ('beta_caliop', 'caliop_beta'),
+                                ('alpha_caliop', 'caliop_alpha'), ('aerosol_type_caliop', 'aerosol_type_caliop'),
+                                ('feature_type_caliop', 'feature_type_caliop'),
+                                ('depolarization_ratio_caliop', 'caliop_depolarization')):
+            colocation_data[key] = _fill_nan(ncfile_caliop[variable][:])
+
+    if qc_filter is not None:
+        apply_qc_filter(colocation_data, qc_filter)
+
+    return colocation_data
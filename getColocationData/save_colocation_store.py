@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    save_colocation_store.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 17:41
+
+"""
+Consolidated monthly colocation store: all the colocation events of a month in a single netcdf file.
+
+The events are indexed along an unlimited 'event' dimension (Aeolus time, colocation location, tem_dis,
+spa_dis) and their profiles are saved as contiguous ragged arrays along the unlimited 'aeolus_profile' and
+'caliop_profile' dimensions: the profiles of an event start at aeolus_start/caliop_start, with
+aeolus_count/caliop_count profiles. The CALIOP altitudes are shared by all the events.
+
+The store is appendable: the numbers of committed events and profiles are global attributes updated once
+the data of an append are written, an interrupted append is overwritten by the next one and is never
+seen by the readers (see readColocationData/readColocationStore.py).
+"""
+
+from netCDF4 import Dataset
+from datetime import datetime
+import numpy as np
+import os
+from getColocationData.save_colocated_data import read_colocation_nc, pack_values, COLOCATION_NC_ENCODING
+
+# reference of the event times
+EVENT_TIME_UNITS = 'seconds since 1970-01-01 00:00:00'
+
+# ragged variables of the store: (name, key of read_colocation_nc, profile dimension, level dimension, encoding)
+STORE_PROFILE_VARIABLES = (
+    ('aeolus_latitude', 'lat_aeolus', 'aeolus_profile', None, 'latitude'),
+    ('aeolus_longitude', 'lon_aeolus', 'aeolus_profile', None, 'longitude'),
+    ('aeolus_altitude', 'alt_aeolus', 'aeolus_profile', 'alt_mid_aeolus', 'aeolus_altitude'),
+    ('aeolus_beta', 'beta_aeolus', 'aeolus_profile', 'y_aeolus', 'coefficient'),
+    ('aeolus_alpha', 'alpha_aeolus', 'aeolus_profile', 'y_aeolus', 'coefficient'),
+    ('aeolus_qc', 'qc_aeolus', 'aeolus_profile', 'y_aeolus', 'qc'),
+    ('aeolus_ber', 'ber_aeolus', 'aeolus_profile', 'y_aeolus', 'coefficient'),
+    ('aeolus_lod', 'lod_aeolus', 'aeolus_profile', 'y_aeolus', 'coefficient'),
+    ('caliop_latitude', 'lat_caliop', 'caliop_profile', None, 'latitude'),
+    ('caliop_longitude', 'lon_caliop', 'caliop_profile', None, 'longitude'),
+    ('caliop_beta', 'beta_caliop', 'caliop_profile', 'y_caliop', 'coefficient'),
+    ('caliop_alpha', 'alpha_caliop', 'caliop_profile', 'y_caliop', 'coefficient'),
+    ('aerosol_type_caliop', 'aerosol_type_caliop', 'caliop_profile', 'y_caliop', 'classification'),
+    ('feature_type_caliop', 'feature_type_caliop', 'caliop_profile', 'y_caliop', 'classification'),
+    ('caliop_depolarization', 'depolarization_ratio_caliop', 'caliop_profile', 'y_caliop', 'coefficient'),
+)
+
+# event index of the store: (name, dtype)
+STORE_EVENT_VARIABLES = (('event_time', 'f8'), ('latitude', 'f4'), ('longitude', 'f4'),
+                         ('tem_dis', 'f4'), ('spa_dis', 'f4'),
+                         ('aeolus_start', 'i8'), ('aeolus_count', 'i4'),
+                         ('caliop_start', 'i8'), ('caliop_count', 'i4'))
+
+
+def get_monthly_store_file(savenc_dir, date):
+    """Consolidated colocation store of the month of date, <savenc_dir>/<year>/colocation_<year>-<month>.nc"""
+    year = '{:04d}'.format(date.year)
+    month = '{:02d}'.format(date.month)
+
+    return savenc_dir + '/%s/colocation_%s-%s.nc' % (year, year, month)
+
+
+def aeolus_time_str_to_event_time(aeolus_time_str):
+    """Aeolus time string of an event (e.g. 20210601T003502) to seconds since 1970-01-01"""
+    return (datetime.strptime(aeolus_time_str, '%Y%m%dT%H%M%S') - datetime(1970, 1, 1)).total_seconds()
+
+
+def create_colocation_store(store_file, n_levels_aeolus, alt_caliop, chunk_events=1024, chunk_profiles=256,
+                            complevel=4):
+    """
+    Create an empty colocation store.
+
+    Parameters:
+        store_file: string, netcdf file of the store.
+        n_levels_aeolus: int, number of Aeolus range bins.
+        alt_caliop: numpy array, CALIOP altitudes shared by all the events, unit -> km.
+        chunk_events, chunk_profiles: int, chunk sizes along the event and the profile dimensions.
+        complevel: int, zlib compression level.
+    """
+    ncfile = Dataset(store_file, mode='w', format='NETCDF4')
+    ncfile.Conventions = 'CF-1.8'
+    ncfile.n_events = 0
+    ncfile.n_aeolus_profiles = 0
+    ncfile.n_caliop_profiles = 0
+
+    ncfile.createDimension('event', None)
+    ncfile.createDimension('aeolus_profile', None)
+    ncfile.createDimension('caliop_profile', None)
+    ncfile.createDimension('y_aeolus', n_levels_aeolus)
+    ncfile.createDimension('alt_mid_aeolus', n_levels_aeolus + 1)
+    ncfile.createDimension('y_caliop', np.size(alt_caliop))
+
+    ncfile.createVariable('aeolus_time', str, ('event',))
+    for (name, dtype) in STORE_EVENT_VARIABLES:
+        ncfile.createVariable(name, dtype, ('event',), zlib=True, complevel=complevel, chunksizes=(chunk_events,))
+    ncfile['event_time'].units = EVENT_TIME_UNITS
+    ncfile['aeolus_count'].sample_dimension = 'aeolus_profile'
+    ncfile['caliop_count'].sample_dimension = 'caliop_profile'
+
+    for (name, key, profile_dimension, level_dimension, encoding) in STORE_PROFILE_VARIABLES:
+        (dtype, scale_factor, add_offset, fill_value) = COLOCATION_NC_ENCODING[encoding]
+
+        if level_dimension is None:
+            (dimensions, chunksizes) = ((profile_dimension,), (chunk_profiles,))
+        else:
+            dimensions = (profile_dimension, level_dimension)
+            chunksizes = (chunk_profiles, ncfile.dimensions[level_dimension].size)
+
+        ncvariable = ncfile.createVariable(name, dtype, dimensions, zlib=True, complevel=complevel, shuffle=True,
+                                           chunksizes=chunksizes, fill_value=fill_value)
+        if scale_factor is not None:
+            ncvariable.scale_factor = scale_factor
+            ncvariable.add_offset = add_offset
+
+    (dtype, scale_factor, add_offset, fill_value) = COLOCATION_NC_ENCODING['caliop_altitude']
+    nc_alt_caliop = ncfile.createVariable('caliop_altitude', dtype, ('y_caliop',), fill_value=fill_value)
+    nc_alt_caliop.scale_factor = scale_factor
+    nc_alt_caliop.add_offset = add_offset
+    nc_alt_caliop.units = 'km'
+    nc_alt_caliop[:] = pack_values(alt_caliop, COLOCATION_NC_ENCODING['caliop_altitude'])
+
+    ncfile.close()
+
+
+def read_store_event_times(store_file):
+    """Aeolus time strings of the committed events of a store, empty if the store does not exist"""
+    if not os.path.exists(store_file):
+        return []
+
+    with Dataset(store_file, mode='r') as ncfile:
+        return list(ncfile['aeolus_time'][:int(ncfile.n_events)])
+
+
+def append_colocation_events(store_file, ncFile_list, logger):
+    """
+    Append colocation files (see save_colocation_nc) to a store, created from the first file if needed.
+    The events already in the store are skipped.
+
+    Parameters:
+        store_file: string, netcdf file of the store.
+        ncFile_list: list of colocation files, named <Aeolus time>.nc.
+        logger: logging object.
+
+    Returns:
+        n_appended: int, number of appended events.
+    """
+    event_times = set(read_store_event_times(store_file))
+    ncFile_list = [ncFilename for ncFilename in ncFile_list
+                   if os.path.basename(ncFilename)[:-3] not in event_times]
+
+    if len(ncFile_list) == 0:
+        return 0
+
+    if not os.path.exists(store_file):
+        colocation_data = read_colocation_nc(ncFile_list[0])
+        create_colocation_store(store_file, colocation_data['beta_aeolus'].shape[1], colocation_data['alt_caliop'])
+
+    n_appended = 0
+
+    with Dataset(store_file, mode='a') as ncfile:
+
+        (n_events, n_aeolus_profiles, n_caliop_profiles) = \
+            (int(ncfile.n_events), int(ncfile.n_aeolus_profiles), int(ncfile.n_caliop_profiles))
+        alt_caliop_store = ncfile['caliop_altitude'][:]
+
+        for ncFilename in sorted(ncFile_list):
+
+            try:
+                colocation_data = read_colocation_nc(ncFilename)
+            except Exception as error:
+                logger.error('Error reading colocation file %s: %s' % (ncFilename, error))
+                continue
+
+            if (colocation_data['beta_aeolus'].shape[1] != ncfile.dimensions['y_aeolus'].size) or \
+                    (not np.allclose(colocation_data['alt_caliop'], alt_caliop_store, atol=1.e-4)):
+                raise ValueError('Colocation file %s does not match the levels of the store %s'
+                                 % (ncFilename, store_file))
+
+            aeolus_count = np.size(colocation_data['lat_aeolus'])
+            caliop_count = np.size(colocation_data['lat_caliop'])
+
+            for (name, key, profile_dimension, level_dimension, encoding) in STORE_PROFILE_VARIABLES:
+                # the CALIOP arrays are saved with the profiles on the first axis, as the Aeolus arrays
+                values = colocation_data[key] if profile_dimension == 'aeolus_profile' else colocation_data[key].T
+
+                if profile_dimension == 'aeolus_profile':
+                    (row_start, row_count) = (n_aeolus_profiles, aeolus_count)
+                else:
+                    (row_start, row_count) = (n_caliop_profiles, caliop_count)
+
+                if row_count > 0:
+                    ncfile[name][row_start:row_start + row_count] = \
+                        pack_values(values, COLOCATION_NC_ENCODING[encoding])
+
+            aeolus_time_str = os.path.basename(ncFilename)[:-3]
+            ncfile['aeolus_time'][n_events] = aeolus_time_str
+            for (name, value) in (('event_time', aeolus_time_str_to_event_time(aeolus_time_str)),
+                                  ('latitude', colocation_data['lat_colocation']),
+                                  ('longitude', colocation_data['lon_colocation']),
+                                  ('tem_dis', colocation_data['tem_dis']),
+                                  ('spa_dis', colocation_data['spa_dis']),
+                                  ('aeolus_start', n_aeolus_profiles), ('aeolus_count', aeolus_count),
+                                  ('caliop_start', n_caliop_profiles), ('caliop_count', caliop_count)):
+                ncfile[name][n_events] = value
+
+            n_events += 1
+            n_aeolus_profiles += aeolus_count
+            n_caliop_profiles += caliop_count
+            n_appended += 1
+
+        # the appended events are only visible to the readers once all their data are written
+        ncfile.sync()
+        ncfile.n_events = n_events
+        ncfile.n_aeolus_profiles = n_aeolus_profiles
+        ncfile.n_caliop_profiles = n_caliop_profiles
+
+    logger.info('%d colocation events appended to %s' % (n_appended, store_file))
+
+    return n_appended
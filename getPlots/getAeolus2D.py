@@ -5,6 +5,7 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        18/03/2023 16:34
 
+from getColocationData.get_reprojection import resample_profiles
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 from scipy.interpolate import griddata
 import matplotlib.colors as colors
@@ -34,14 +35,19 @@ def getAeolus2Dbeta(lon, alt, beta, aeolus_mask, extent, save_str, vvmin=1.e-5,
     beta2D_proj[:] = np.nan
     index = np.where(aeolus_mask==1.)[0]
 
+    # resample all the profiles on the altitude grid at once
+    alt_index = np.asarray(alt)[index]
+    beta_index = np.asarray(beta)[index]
+    beta_resample = resample_profiles(alt_index, beta_index, altitude_range, inclusive=True)
+    beta_coverage = np.isfinite(resample_profiles(alt_index, np.ones(beta_index.shape), altitude_range, inclusive=True))
+
     for i in range(len(index)):
-        for j in range(len(alt[index[i]])-1):
-            try:
-                if (np.isnan(alt[index[i]][j]) == False) & (np.isnan(alt[index[i]][j+1]) == False):
-                    lon_range = (lon[index[i]-1] + lon[index[i]])/2., (lon[index[i]+1] + lon[index[i]])/2.
-                    beta2D_proj[(altitude_grid_regular <= alt[index[i]][j]) & (altitude_grid_regular >= alt[index[i]][j+1]) & (longitude_grid_regular <= np.max(lon_range)) & (longitude_grid_regular >= np.min(lon_range))] = beta[index[i]][j]
-            except:
-                pass
+        try:
+            lon_range = (lon[index[i]-1] + lon[index[i]])/2., (lon[index[i]+1] + lon[index[i]])/2.
+        except IndexError:
+            continue
+        longitude_mask = (longitude_range <= np.max(lon_range)) & (longitude_range >= np.min(lon_range))
+        beta2D_proj[np.ix_(beta_coverage[i], longitude_mask)] = beta_resample[i, beta_coverage[i]][:, None]
 
     fig, ax = plt.subplots(figsize=(35, 15))
     mappable = plt.pcolormesh(longitude_grid_regular, altitude_grid_regular, beta2D_proj, norm=colors.LogNorm(vmin=vvmin, vmax=vvmax), cmap='jet')
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    getDensity2D.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 19:20
+
+"""
+2-D density estimates of large samples of pairs (e.g. CALIOP vs Aeolus backscatter) for the density panels.
+
+getBinnedKDE2D is a drop-in replacement of
+
+    k = gaussian_kde([x, y])
+    xi, yi = np.mgrid[x.min():x.max():nbins * 1j, y.min():y.max():nbins * 1j]
+    zi = k(np.vstack([xi.flatten(), yi.flatten()])).reshape(xi.shape)
+
+the pairs are linearly binned on the grid and convolved with the Gaussian kernel of gaussian_kde (same
+bandwidth and covariance) by FFT, in O(N + nbins^2 log nbins) instead of O(N x nbins^2).
+"""
+
+from scipy.signal import fftconvolve
+import numpy as np
+
+
+def subsamplePairs(x, y, max_samples=None, seed=0):
+    """Random subsample of at most max_samples pairs, the pairs are returned unchanged if max_samples is None"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    if (max_samples is None) or (np.size(x) <= max_samples):
+        return x, y
+
+    sample_index = np.random.default_rng(seed).choice(np.size(x), size=max_samples, replace=False)
+
+    return x[sample_index], y[sample_index]
+
+
+def _get_grid(x, y, nbins, xlim, ylim):
+    """Grid points of the density, the sample range by default as in np.mgrid[x.min():x.max():nbins * 1j, ...]"""
+    (x_min, x_max) = (np.min(x), np.max(x)) if xlim is None else xlim
+    (y_min, y_max) = (np.min(y), np.max(y)) if ylim is None else ylim
+
+    return np.linspace(x_min, x_max, nbins), np.linspace(y_min, y_max, nbins)
+
+
+def getDensityHistogram2D(x, y, nbins=100, xlim=None, ylim=None, max_samples=None):
+    """
+    Probability density of the pairs from a 2-D histogram.
+
+    Parameters:
+        x, y: numpy array, pairs.
+        nbins: int, number of bins along each axis.
+        xlim, ylim: (float, float), range of the histogram, the sample range by default.
+        max_samples: int, random subsample of the pairs, all the pairs by default.
+
+    Returns:
+        xi, yi: numpy array with shape (nbins, nbins), bin centres.
+        zi: numpy array with shape (nbins, nbins), probability density.
+    """
+    (x, y) = subsamplePairs(x, y, max_samples)
+    (x_min, x_max) = (np.min(x), np.max(x)) if xlim is None else xlim
+    (y_min, y_max) = (np.min(y), np.max(y)) if ylim is None else ylim
+
+    (zi, x_edges, y_edges) = np.histogram2d(x, y, bins=nbins, range=[[x_min, x_max], [y_min, y_max]], density=True)
+    (xi, yi) = np.meshgrid((x_edges[1:] + x_edges[:-1]) / 2., (y_edges[1:] + y_edges[:-1]) / 2., indexing='ij')
+
+    return xi, yi, zi
+
+
+def _get_kde_covariance(x, y, bw_method):
+    """Kernel covariance of scipy.stats.gaussian_kde: data covariance scaled by the squared bandwidth factor"""
+    n_samples = np.size(x)
+
+    # factors of gaussian_kde for d = 2 dimensions
+    if bw_method == 'scott':
+        factor = n_samples ** (-1. / 6.)
+    elif bw_method == 'silverman':
+        factor = (n_samples * (2. + 2.) / 4.) ** (-1. / 6.)
+    else:
+        factor = float(bw_method)
+
+    return np.cov(np.vstack((x, y))) * factor ** 2
+
+
+def _get_linear_binning(x, y, x_grid, y_grid):
+    """Pairs distributed over their four neighbouring grid points with bilinear weights, the outside pairs are dropped"""
+    dx = x_grid[1] - x_grid[0]
+    dy = y_grid[1] - y_grid[0]
+    nx = np.size(x_grid)
+    ny = np.size(y_grid)
+
+    x_pos = (x - x_grid[0]) / dx
+    y_pos = (y - y_grid[0]) / dy
+    inside = (x_pos >= 0) & (x_pos <= nx - 1) & (y_pos >= 0) & (y_pos <= ny - 1)
+    (x_pos, y_pos) = (x_pos[inside], y_pos[inside])
+
+    x_index = np.minimum(np.floor(x_pos).astype(np.int64), nx - 2)
+    y_index = np.minimum(np.floor(y_pos).astype(np.int64), ny - 2)
+    x_weight = x_pos - x_index
+    y_weight = y_pos - y_index
+
+    counts = np.zeros(nx * ny)
+    for (x_shift, y_shift, weight) in ((0, 0, (1. - x_weight) * (1. - y_weight)),
+                                       (1, 0, x_weight * (1. - y_weight)),
+                                       (0, 1, (1. - x_weight) * y_weight),
+                                       (1, 1, x_weight * y_weight)):
+        counts += np.bincount((x_index + x_shift) * ny + (y_index + y_shift), weights=weight, minlength=nx * ny)
+
+    return counts.reshape(nx, ny)
+
+
+def getBinnedKDE2D(x, y, nbins=1000, xlim=None, ylim=None, bw_method='scott', max_samples=None, truncate=5.):
+    """
+    Gaussian kernel density estimate of the pairs on a regular grid, matching scipy.stats.gaussian_kde
+    evaluated on the same grid (the bandwidth is computed from all the pairs, before any subsampling).
+
+    Parameters:
+        x, y: numpy array, pairs.
+        nbins: int, number of grid points along each axis.
+        xlim, ylim: (float, float), range of the grid, the sample range by default.
+        bw_method: 'scott', 'silverman' or float, bandwidth factor as in gaussian_kde.
+        max_samples: int, random subsample of the pairs binned on the grid, all the pairs by default.
+        truncate: float, the kernel is truncated at truncate standard deviations.
+
+    Returns:
+        xi, yi: numpy array with shape (nbins, nbins), grid points, as np.mgrid.
+        zi: numpy array with shape (nbins, nbins), probability density.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    kernel_covariance = _get_kde_covariance(x, y, bw_method)
+    kernel_inv_covariance = np.linalg.inv(kernel_covariance)
+    kernel_norm = 2. * np.pi * np.sqrt(np.linalg.det(kernel_covariance))
+
+    (x_grid, y_grid) = _get_grid(x, y, nbins, xlim, ylim)
+    (x_sample, y_sample) = subsamplePairs(x, y, max_samples)
+    counts = _get_linear_binning(x_sample, y_sample, x_grid, y_grid)
+
+    # Gaussian kernel on the grid offsets, within truncate standard deviations and the grid size
+    dx = x_grid[1] - x_grid[0]
+    dy = y_grid[1] - y_grid[0]
+    x_half = int(min(np.ceil(truncate * np.sqrt(kernel_covariance[0, 0]) / dx), nbins - 1))
+    y_half = int(min(np.ceil(truncate * np.sqrt(kernel_covariance[1, 1]) / dy), nbins - 1))
+    (x_offset, y_offset) = np.meshgrid(np.arange(-x_half, x_half + 1) * dx, np.arange(-y_half, y_half + 1) * dy,
+                                       indexing='ij')
+    kernel = np.exp(-0.5 * (kernel_inv_covariance[0, 0] * x_offset ** 2 +
+                            2. * kernel_inv_covariance[0, 1] * x_offset * y_offset +
+                            kernel_inv_covariance[1, 1] * y_offset ** 2)) / kernel_norm
+
+    zi = np.clip(fftconvolve(counts, kernel, mode='same'), 0., None) / np.size(x_sample)
+    (xi, yi) = np.meshgrid(x_grid, y_grid, indexing='ij')
+
+    return xi, yi, zi
+
+
+def getDensityAtPoints(x, y, nbins=512, bw_method='scott', max_samples=None):
+    """
+    Kernel density estimate at the pairs themselves, as gaussian_kde(xy)(xy) to colour a scatter plot,
+    bilinearly interpolated from getBinnedKDE2D.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    (xi, yi, zi) = getBinnedKDE2D(x, y, nbins=nbins, bw_method=bw_method, max_samples=max_samples)
+    (x_grid, y_grid) = (xi[:, 0], yi[0, :])
+
+    x_pos = np.clip((x - x_grid[0]) / (x_grid[1] - x_grid[0]), 0, nbins - 1)
+    y_pos = np.clip((y - y_grid[0]) / (y_grid[1] - y_grid[0]), 0, nbins - 1)
+    x_index = np.minimum(np.floor(x_pos).astype(np.int64), nbins - 2)
+    y_index = np.minimum(np.floor(y_pos).astype(np.int64), nbins - 2)
+    x_weight = x_pos - x_index
+    y_weight = y_pos - y_index
+
+    return (zi[x_index, y_index] * (1. - x_weight) * (1. - y_weight) +
+            zi[x_index + 1, y_index] * x_weight * (1. - y_weight) +
+            zi[x_index, y_index + 1] * (1. - x_weight) * y_weight +
+            zi[x_index + 1, y_index + 1] * x_weight * y_weight)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    aggregateColocationStatistics.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 18:47
+
+"""
+Aggregate the per-bin colocation statistics (see extractColocationStatistics) over a date range.
+
+The days are processed over a process pool and the statistics of every day are cached in
+<cache_dir>/<year>-<month>-<day>.npz, keyed by the names, modification times and sizes of the colocation
+files of the day: running an analysis again, or over an extended date range, only processes the new or
+modified days. The statistics are returned as columns (dict of numpy arrays, one record per Aeolus bin):
+
+    statistics = aggregateColocationStatistics(colocationData_dir, start_date, end_date, cache_dir)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+import numpy as np
+import multiprocessing
+import logging
+import pathlib
+import os
+import sys
+sys.path.append('../')
+from readColocationData.readColocationNetCDF import extractColocationStatistics
+from getColocationData.save_colocated_data import read_colocation_nc
+from getColocationData.get_file_cache import get_files_cache_key, save_npz_atomic
+
+# columns of the statistics, in the order returned by extractColocationStatistics
+STATISTICS_COLUMNS = (('beta_aeolus', np.float64), ('beta_caliop', np.float64), ('aerosol_type_caliop', np.int64),
+                      ('alt_bottom', np.float64), ('alt_top', np.float64), ('time_str', 'U15'),
+                      ('qc_aeolus', np.uint8), ('ber_aeolus', np.float64), ('lod_aeolus', np.float64))
+
+
+def getColocationFilesDaily(colocationData_dir, date):
+    """Colocation files of one day, <colocationData_dir>/<year>/<year>-<month>-<day>/*.nc"""
+    colocationData_daily_dir = os.path.join(colocationData_dir, '{:04d}'.format(date.year), date.strftime('%Y-%m-%d'))
+
+    if not os.path.isdir(colocationData_daily_dir):
+        return []
+
+    return [os.path.join(colocationData_daily_dir, file) for file in sorted(os.listdir(colocationData_daily_dir))
+            if file.endswith('.nc')]
+
+
+def getDailyCacheKey(ncFile_list, tem_dis_max):
+    """Key of the cached statistics of a day, any new, removed or modified colocation file changes the key"""
+    return get_files_cache_key(ncFile_list, config='%.3f' % tem_dis_max)
+
+
+def _concatenate_statistics(statistics_list):
+    """Concatenate the statistics columns, empty columns of the right dtype if there is no statistics"""
+    return {key: np.concatenate([np.asarray(statistics[key], dtype=dtype) for statistics in statistics_list]
+                                + [np.zeros(0, dtype=dtype)])
+            for (key, dtype) in STATISTICS_COLUMNS}
+
+
+def extractDailyStatistics(colocationData_dir, date, cache_dir, tem_dis_max=5.):
+    """
+    Statistics of all the colocation files of one day, read from the cache if the files are unchanged.
+    The colocation events with a temporal distance above tem_dis_max and the unreadable files are skipped.
+
+    Returns:
+        statistics: dict of numpy arrays, see STATISTICS_COLUMNS.
+    """
+    ncFile_list = getColocationFilesDaily(colocationData_dir, date)
+    if len(ncFile_list) == 0:
+        return _concatenate_statistics([])
+
+    cache_file = os.path.join(cache_dir, date.strftime('%Y-%m-%d') + '.npz')
+    cache_key = getDailyCacheKey(ncFile_list, tem_dis_max)
+
+    if os.path.exists(cache_file):
+        with np.load(cache_file) as cache_data:
+            if str(cache_data['cache_key']) == cache_key:
+                return {key: cache_data[key] for (key, dtype) in STATISTICS_COLUMNS}
+
+    statistics_list = []
+    for ncFilename in ncFile_list:
+        try:
+            colocation_data = read_colocation_nc(ncFilename)
+        except Exception as error:
+            logging.getLogger().error('Error reading colocation file %s: %s' % (ncFilename, error))
+            continue
+
+        if colocation_data['tem_dis'] < tem_dis_max:
+            statistics_list.append(dict(zip([key for (key, dtype) in STATISTICS_COLUMNS],
+                                            extractColocationStatistics(colocation_data, ncFilename[-18:-3],
+                                                                        tem_dis_max=tem_dis_max))))
+
+    statistics = _concatenate_statistics(statistics_list)
+
+    pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    save_npz_atomic(cache_file, cache_key=cache_key, **statistics)
+
+    return statistics
+
+
+def aggregateColocationStatistics(colocationData_dir, start_date, end_date, cache_dir, tem_dis_max=5.,
+                                  workers=None):
+    """
+    Statistics of all the colocation files between start_date and end_date (included), see extractDailyStatistics.
+
+    Parameters:
+        colocationData_dir: string, colocation database, <colocationData_dir>/<year>/<year>-<month>-<day>/*.nc.
+        start_date, end_date: datetime, first and last day.
+        cache_dir: string, directory of the daily cached statistics.
+        tem_dis_max: float, maximum temporal distance, unit -> hours.
+        workers: int, number of worker processes, os.cpu_count() by default.
+
+    Returns:
+        statistics: dict of numpy arrays, see STATISTICS_COLUMNS, sorted by day.
+    """
+    date_list = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    # forked workers, the analysis scripts calling this function are not guarded by __main__
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        statistics_list = list(executor.map(extractDailyStatistics, [colocationData_dir] * len(date_list), date_list,
+                                            [cache_dir] * len(date_list), [tem_dis_max] * len(date_list)))
+
+    return _concatenate_statistics(statistics_list)
+
+
+def saveColocationStatistics(saveFilename, statistics):
+    """Save the statistics columns in a npz file"""
+    save_npz_atomic(saveFilename, **statistics)
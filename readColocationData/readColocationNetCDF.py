@@ -5,104 +5,114 @@
 # @Email:       rui.song@physics.ox.ac.uk
 # @Time:        29/01/2023 13:24
 
-from netCDF4 import Dataset
-import geopy.distance
 import numpy as np
+import sys
+sys.path.append('../')
+from getColocationData.save_colocated_data import read_colocation_nc
+from getColocationData.get_colocation import find_closest_footprint
+
+# half width of the CALIOP window around the closest CALIOP profile, number of profiles
+CALIOP_HALF_WINDOW = 8
+
+
+def _reduce_ranges(values, range_start, range_end):
+    """
+    Sum of values[range_start[k]:range_end[k]] along the first axis for every range k, with a single reduceat.
+    The ranges may be empty or overlap.
+    """
+    values = np.concatenate((values, np.zeros((1,) + values.shape[1:], dtype=values.dtype)), axis=0)
+    indices = np.stack((range_start, range_end), axis=-1).ravel()
+
+    range_sum = np.add.reduceat(values, indices, axis=0)[::2]
+    range_sum[range_start >= range_end] = 0
+
+    return range_sum
+
+
+def extractColocationStatistics(colocation_data, time_str, tem_dis_max=5.):
+    """
+    Compare the Aeolus bins of the profile closest to the colocation with the CALIOP profiles around the
+    closest CALIOP profile: mean CALIOP backscatter and most common CALIOP aerosol type within each Aeolus bin.
+
+    The CALIOP levels of every Aeolus bin are located with searchsorted and the statistics of all the bins are
+    computed at once with reduceat.
+
+    Parameters:
+        colocation_data: dict, colocation event, see getColocationData.save_colocated_data.read_colocation_nc.
+        time_str: string, Aeolus time of the colocation event.
+        tem_dis_max: float, maximum temporal distance, unit -> hours.
+
+    Returns:
+        beta_aeolus_stats: numpy array, Aeolus backscatter of the valid bins, unit -> km-1 sr-1.
+        beta_caliop_stats: numpy array, mean CALIOP backscatter within the bins (NaN if no CALIOP level).
+        aerosol_type_caliop_stats: numpy array, most common CALIOP aerosol type within the bins (0 if no aerosol).
+        alt_bottom_stats, alt_top_stats: numpy array, bottom and top of the bins, unit -> km.
+        time_str_stats: numpy array, time_str for each bin.
+        qc_aeolus_stats, ber_aeolus_stats, lod_aeolus_stats: numpy array, Aeolus QC, BER and LOD of the bins.
+        All the arrays are [-0.1] if the temporal distance exceeds tem_dis_max.
+    """
+    if not (colocation_data['tem_dis'] < tem_dis_max):
+        return tuple(np.asarray([-0.1]) for _ in range(9))
+
+    lat_colocation = colocation_data['lat_colocation']
+    lon_colocation = colocation_data['lon_colocation']
+
+    aeolus_index_x = np.argmin(abs(colocation_data['lat_aeolus'] - lat_colocation))
+    (caliop_index_x, _) = find_closest_footprint(lat_colocation, lon_colocation,
+                                                 colocation_data['lat_caliop'], colocation_data['lon_caliop'])
+
+    caliop_index_x_min = max(caliop_index_x - CALIOP_HALF_WINDOW, 0)
+    caliop_index_x_max = min(caliop_index_x + CALIOP_HALF_WINDOW, np.size(colocation_data['lat_caliop']))
+
+    # Aeolus bins of the closest profile with both edges above the ground
+    alt_aeolus_centre = colocation_data['alt_aeolus'][aeolus_index_x, :] * 1e-3
+    alt_top = alt_aeolus_centre[:-1]
+    alt_bottom = alt_aeolus_centre[1:]
+    bin_index = np.nonzero((alt_top > 0) & (alt_bottom > 0))[0]
+    (alt_top, alt_bottom) = (alt_top[bin_index], alt_bottom[bin_index])
+
+    # CALIOP levels strictly within each bin, as a range of the levels sorted by altitude
+    alt_caliop = colocation_data['alt_caliop']
+    level_order = np.argsort(alt_caliop, kind='stable')
+    alt_caliop_sorted = alt_caliop[level_order]
+    level_start = np.searchsorted(alt_caliop_sorted, alt_bottom, side='right')
+    level_end = np.searchsorted(alt_caliop_sorted, alt_top, side='left')
+
+    # mean CALIOP backscatter within each bin
+    beta_caliop_window = colocation_data['beta_caliop'][level_order, caliop_index_x_min:caliop_index_x_max]
+    beta_caliop_valid = ~np.isnan(beta_caliop_window)
+    beta_caliop_sum = _reduce_ranges(np.where(beta_caliop_valid, beta_caliop_window, 0.).sum(axis=1),
+                                     level_start, level_end)
+    beta_caliop_count = _reduce_ranges(beta_caliop_valid.sum(axis=1), level_start, level_end)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        beta_caliop_stats = np.where(beta_caliop_count > 0, beta_caliop_sum / beta_caliop_count, np.nan)
+
+    # most common aerosol type of the CALIOP aerosol features (feature type 3) within each bin
+    aerosol_type_window = colocation_data['aerosol_type_caliop'][level_order, caliop_index_x_min:caliop_index_x_max]
+    feature_type_window = colocation_data['feature_type_caliop'][level_order, caliop_index_x_min:caliop_index_x_max]
+    (aerosol_level, aerosol_profile) = np.nonzero(feature_type_window == 3)
+    aerosol_type = aerosol_type_window[aerosol_level, aerosol_profile].astype(np.int64)
+    n_types = int(np.max(aerosol_type)) + 1 if np.size(aerosol_type) > 0 else 1
+
+    aerosol_type_count = np.bincount(aerosol_level * n_types + aerosol_type,
+                                     minlength=np.size(alt_caliop) * n_types).reshape(np.size(alt_caliop), n_types)
+    # argmax returns the smallest type for the ties and 0 without aerosol
+    aerosol_type_caliop_stats = np.argmax(_reduce_ranges(aerosol_type_count, level_start, level_end), axis=1)
+
+    return colocation_data['beta_aeolus'][aeolus_index_x, bin_index] * 1.e-6 * 1.e3, \
+           beta_caliop_stats, aerosol_type_caliop_stats, alt_bottom, alt_top, \
+           np.full(np.size(bin_index), time_str), \
+           colocation_data['qc_aeolus'][aeolus_index_x, bin_index], \
+           colocation_data['ber_aeolus'][aeolus_index_x, bin_index], \
+           colocation_data['lod_aeolus'][aeolus_index_x, bin_index]
 
-def extractColocationParameters(inputNetCDF):
 
-    with Dataset(inputNetCDF, 'r') as nc_data:
-        lat_colocation = nc_data['colocation_info']['latitude'][:]
-        lon_colocation = nc_data['colocation_info']['longitude'][:]
-        tem_dis = nc_data['colocation_info']['tem_dis'][:]
-
-        lat_aeolus = nc_data['aeolus_data']['aeolus_latitude'][:]
-        lon_aeolus = nc_data['aeolus_data']['aeolus_longitude'][:]
-        alt_aeolus = nc_data['aeolus_data']['aeolus_altitude'][:]
-        beta_aeolus = nc_data['aeolus_data']['aeolus_beta'][:]
-        alpha_aeolus = nc_data['aeolus_data']['aeolus_alpha'][:]
-
-        lat_caliop = nc_data['caliop_data']['caliop_latitude'][:]
-        lon_caliop = nc_data['caliop_data']['caliop_longitude'][:]
-        alt_caliop = nc_data['caliop_data']['caliop_altitude'][:]
-        beta_caliop = nc_data['caliop_data']['caliop_beta'][:]
-
-        aerosol_type_caliop = nc_data['caliop_data']['aerosol_type_caliop'][:]
-        feature_type_caliop = nc_data['caliop_data']['feature_type_caliop'][:]
-
-        qc_aeolus = nc_data['aeolus_data']['aeolus_qc'][:]
-        ber_aeolus = nc_data['aeolus_data']['aeolus_ber'][:]
-        lod_aeolus = nc_data['aeolus_data']['aeolus_lod'][:]
-
-    if tem_dis < 5.:
-
-        aeolus_index_x = np.argmin(abs(lat_aeolus - lat_colocation))
-
-        # calculate and find the closest distance point
-
-        colocation_distance_list = [
-            geopy.distance.geodesic((lat_colocation, lon_colocation), (lat_caliop[s], lon_caliop[s])).km for s in
-            range(len(lat_caliop))]
-        colocation_distance_array = np.asarray(colocation_distance_list)
-        caliop_index_x = np.argmin(colocation_distance_array)
-
-        caliop_index_x_min = caliop_index_x - 8
-        caliop_index_x_max = caliop_index_x + 8
-
-        # If the start index is negative, set it to 0
-        if caliop_index_x_min < 0:
-            caliop_index_x_min = 0
-        # If the end index is greater than the length of the lat_aeolus array, set it to the length of the array
-        if caliop_index_x_max > len(colocation_distance_array):
-            caliop_index_x_max = len(colocation_distance_array)
-
-        alt_aeolus_centre = alt_aeolus[:, aeolus_index_x]
-        alt_aeolus_centre = alt_aeolus_centre * 1e-3
-
-        beta_aeolus_centre = beta_aeolus[:, aeolus_index_x]
-        qc_aeolus_centre = qc_aeolus[:, aeolus_index_x]
-        ber_aeolus_centre = ber_aeolus[:, aeolus_index_x]
-        lod_aeolus_centre = lod_aeolus[:, aeolus_index_x]
-
-        alt_bottom_stats = []
-        alt_top_stats = []
-        beta_aeolus_stats = []
-        beta_caliop_stats = []
-        aerosol_type_caliop_stats = []
-        time_str_stats = []
-        qc_aeolus_stats = []
-        ber_aeolus_stats = []
-        lod_aeolus_stats = []
-
-        for k in range(np.size(alt_aeolus_centre)):
-            if alt_aeolus_centre[k] > 0:
-                if (k + 1) < len(alt_aeolus_centre):
-                    if alt_aeolus_centre[k+1] > 0:
-
-                        beta_aeolus_stats.append(beta_aeolus_centre[k] * 1.e-6 * 1.e3) # scaling factor, and unit conversion
-                        beta_caliop_filter = beta_caliop[(alt_caliop < alt_aeolus_centre[k]) & (alt_caliop > alt_aeolus_centre[k+1]), caliop_index_x_min : caliop_index_x_max]
-                        beta_caliop_stats.append(np.nanmean(beta_caliop_filter))
-                        alt_bottom_stats.append(alt_aeolus_centre[k + 1])
-                        alt_top_stats.append(alt_aeolus_centre[k])
-                        time_str_stats.append(inputNetCDF[-18:-3])
-                        qc_aeolus_stats.append(qc_aeolus_centre[k])
-                        ber_aeolus_stats.append(ber_aeolus_centre[k])
-                        lod_aeolus_stats.append(lod_aeolus_centre[k])
-
-                        aerosol_type_mask_k = np.copy(aerosol_type_caliop[(alt_caliop < alt_aeolus_centre[k]) & (alt_caliop > alt_aeolus_centre[k+1]), caliop_index_x_min : caliop_index_x_max])
-                        feature_type_mask_k = np.copy(feature_type_caliop[(alt_caliop < alt_aeolus_centre[k]) & (alt_caliop > alt_aeolus_centre[k+1]), caliop_index_x_min : caliop_index_x_max])
-
-                        aerosol_type_mask_k = aerosol_type_mask_k[feature_type_mask_k == 3]
-
-                        if np.size(aerosol_type_mask_k) > 0:
-                            most_common_aerosol_type_k = np.argmax(np.bincount(aerosol_type_mask_k))
-                        else:
-                            most_common_aerosol_type_k = 0
-
-                        aerosol_type_caliop_stats.append(most_common_aerosol_type_k)
-
-        return beta_aeolus_stats, beta_caliop_stats, aerosol_type_caliop_stats, \
-               alt_bottom_stats, alt_top_stats, time_str_stats, qc_aeolus_stats, ber_aeolus_stats, lod_aeolus_stats
-
-    else:
-        return [-0.1], [-0.1], [-0.1], [-0.1], [-0.1], [-0.1], [-0.1], [-0.1], [-0.1]
\ No newline at end of file
+def extractColocationParameters(inputNetCDF):
+    """
+    Statistics of a colocation file, see extractColocationStatistics.
+
+    Returns:
+        beta_aeolus_stats, beta_caliop_stats, aerosol_type_caliop_stats, alt_bottom_stats, alt_top_stats,
+        time_str_stats, qc_aeolus_stats, ber_aeolus_stats, lod_aeolus_stats: numpy arrays.
+    """
+    return extractColocationStatistics(read_colocation_nc(inputNetCDF), inputNetCDF[-18:-3])
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# @Filename:    readColocationStore.py
+# @Author:      Dr. Rui Song
+# @Email:       rui.song@physics.ox.ac.uk
+# @Time:        18/10/2026 17:58
+
+"""
+Read the consolidated monthly colocation stores (see getColocationData/save_colocation_store.py).
+
+The events are selected from the event index only, the profiles of the selected events are then read
+from the ragged arrays of the store, without opening any per-event file:
+
+    with Dataset(store_file, 'r') as ncfile:
+        colocation_index = readColocationIndex(ncfile)
+        for event in selectColocationEvents(colocation_index, lat_range=(-60., 60.), max_tem_dis=5.):
+            colocation_data = readColocationEvent(ncfile, colocation_index, event)
+"""
+
+from netCDF4 import Dataset
+from datetime import datetime
+import numpy as np
+import glob
+import sys
+import os
+sys.path.append('../')
+from Aeolus.aeolus_qc import apply_qc_filter
+
+# ragged variables of the store: name -> (key of the returned dict, CALIOP profiles saved on the first axis)
+STORE_PROFILE_KEYS = {'aeolus_latitude': ('lat_aeolus', False),
+                      'aeolus_longitude': ('lon_aeolus', False),
+                      'aeolus_altitude': ('alt_aeolus', False),
+                      'aeolus_beta': ('beta_aeolus', False),
+                      'aeolus_alpha': ('alpha_aeolus', False),
+                      'aeolus_qc': ('qc_aeolus', False),
+                      'aeolus_ber': ('ber_aeolus', False),
+                      'aeolus_lod': ('lod_aeolus', False),
+                      'caliop_latitude': ('lat_caliop', True),
+                      'caliop_longitude': ('lon_caliop', True),
+                      'caliop_beta': ('beta_caliop', True),
+                      'caliop_alpha': ('alpha_caliop', True),
+                      'aerosol_type_caliop': ('aerosol_type_caliop', True),
+                      'feature_type_caliop': ('feature_type_caliop', True),
+                      'caliop_depolarization': ('depolarization_ratio_caliop', True)}
+
+
+def _fill_nan(values):
+    """Masked values of a float variable as NaN, integer variables are returned unchanged"""
+    if np.issubdtype(values.dtype, np.floating):
+        return np.ma.filled(values, np.nan)
+
+    return np.ma.getdata(values)
+
+
+def getColocationStores(colocationData_dir, start_date, end_date):
+    """Monthly colocation stores between two dates, <colocationData_dir>/<year>/colocation_<year>-<month>.nc"""
+    store_list = []
+
+    for store_file in sorted(glob.glob(colocationData_dir + '/*/colocation_*-*.nc')):
+        month = datetime.strptime(os.path.basename(store_file)[11:18], '%Y-%m')
+        if start_date.replace(day=1) <= month <= end_date:
+            store_list.append(store_file)
+
+    return store_list
+
+
+def readColocationIndex(ncfile):
+    """
+    Read the event index of an open store.
+
+    Returns:
+        colocation_index: dict of numpy arrays over the committed events: aeolus_time (strings), event_time
+        (seconds since 1970-01-01), latitude, longitude, tem_dis (hours), spa_dis (km), aeolus_start,
+        aeolus_count, caliop_start and caliop_count.
+    """
+    n_events = int(ncfile.n_events)
+
+    colocation_index = {'aeolus_time': np.asarray(ncfile['aeolus_time'][:n_events], dtype=str)}
+    for name in ('event_time', 'latitude', 'longitude', 'tem_dis', 'spa_dis',
+                 'aeolus_start', 'aeolus_count', 'caliop_start', 'caliop_count'):
+        colocation_index[name] = _fill_nan(ncfile[name][:n_events])
+
+    return colocation_index
+
+
+def selectColocationEvents(colocation_index, time_range=None, lat_range=None, lon_range=None,
+                           max_tem_dis=None, max_spa_dis=None):
+    """
+    Select events from the index of a store.
+
+    Parameters:
+        colocation_index: dict, see readColocationIndex.
+        time_range: (datetime, datetime), first and last Aeolus time.
+        lat_range: (float, float), minimum and maximum colocation latitude, unit -> degree.
+        lon_range: (float, float), minimum and maximum colocation longitude, may cross the dateline, unit -> degree.
+        max_tem_dis: float, maximum temporal distance, unit -> hours.
+        max_spa_dis: float, maximum spatial distance, unit -> km.
+
+    Returns:
+        events: numpy array, indices of the selected events.
+    """
+    event_mask = np.ones(np.size(colocation_index['event_time']), dtype=bool)
+
+    if time_range is not None:
+        (time_start, time_end) = [(time_i - datetime(1970, 1, 1)).total_seconds() for time_i in time_range]
+        event_mask &= (colocation_index['event_time'] >= time_start) & (colocation_index['event_time'] <= time_end)
+
+    if lat_range is not None:
+        event_mask &= (colocation_index['latitude'] >= lat_range[0]) & (colocation_index['latitude'] <= lat_range[1])
+
+    if lon_range is not None:
+        event_mask &= np.mod(colocation_index['longitude'] - lon_range[0], 360.) <= (lon_range[1] - lon_range[0])
+
+    if max_tem_dis is not None:
+        event_mask &= colocation_index['tem_dis'] < max_tem_dis
+
+    if max_spa_dis is not None:
+        event_mask &= colocation_index['spa_dis'] < max_spa_dis
+
+    return np.nonzero(event_mask)[0]
+
+
+def readColocationEvent(ncfile, colocation_index, event, qc_filter=None):
+    """
+    Read the profiles of one event of an open store, the Aeolus values flagged invalid by the QC bits of
+    qc_filter (e.g. ('backscatter', 'ber')) are set to NaN, see Aeolus.aeolus_qc.apply_qc_filter.
+
+    Returns:
+        colocation_data: dict of numpy arrays with the keys and layout of read_colocation_nc (Aeolus arrays with
+        the profiles on the first axis, CALIOP arrays with the profiles on the last axis), fill values as NaN.
+    """
+    colocation_data = {'tem_dis': float(colocation_index['tem_dis'][event]),
+                       'spa_dis': float(colocation_index['spa_dis'][event]),
+                       'lat_colocation': float(colocation_index['latitude'][event]),
+                       'lon_colocation': float(colocation_index['longitude'][event]),
+                       'alt_caliop': _fill_nan(ncfile['caliop_altitude'][:])}
+
+    aeolus_start = int(colocation_index['aeolus_start'][event])
+    aeolus_end = aeolus_start + int(colocation_index['aeolus_count'][event])
+    caliop_start = int(colocation_index['caliop_start'][event])
+    caliop_end = caliop_start + int(colocation_index['caliop_count'][event])
+
+    for (name, (key, caliop_variable)) in STORE_PROFILE_KEYS.items():
+        if caliop_variable:
+            colocation_data[key] = _fill_nan(ncfile[name][caliop_start:caliop_end]).T
+        else:
+            colocation_data[key] = _fill_nan(ncfile[name][aeolus_start:aeolus_end])
+
+    if qc_filter is not None:
+        apply_qc_filter(colocation_data, qc_filter)
+
+    return colocation_data
+
+
+def readColocationStore(store_file, qc_filter=None, **selection):
+    """
+    Read all the selected events of a store, see selectColocationEvents for the selection keywords and
+    readColocationEvent for qc_filter.
+
+    Returns:
+        aeolus_time_list: list of the Aeolus time strings of the selected events.
+        colocation_data_list: list of dict, see readColocationEvent.
+    """
+    with Dataset(store_file, 'r') as ncfile:
+        colocation_index = readColocationIndex(ncfile)
+        events = selectColocationEvents(colocation_index, **selection)
+
+        aeolus_time_list = [colocation_index['aeolus_time'][event] for event in events]
+        colocation_data_list = [readColocationEvent(ncfile, colocation_index, event, qc_filter=qc_filter)
+                                for event in events]
+
+    return aeolus_time_list, colocation_data_list